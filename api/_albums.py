@@ -0,0 +1,75 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from psycopg2.extras import RealDictCursor
+
+# Columns of the public Album model (internal hash columns are left out)
+ALBUM_FIELDS = """
+    a.id, a.title, a.artist_id, a.rank, a.release_date, a.rating, a.ratings_count,
+    a.image_path, a.spotify_link, a.youtube_link, a.apple_music_link,
+    a.blurhash, a.dominant_color, a.cover_variants
+"""
+
+def format_album_images(album_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn stored cover fields into public URLs and drop internal columns."""
+    img_path = album_dict.get('image_path')
+    if img_path and img_path.startswith('covers/'):
+        img_path = img_path.replace('covers/', '')
+    album_dict['image_path'] = f"/covers/{img_path}" if img_path else None
+
+    # cover_variants is {"webp": {"160": "covers/variants/..."}, ...} as written by scripts/process_covers.py
+    variants = album_dict.pop('cover_variants', None)
+    album_dict['image_variants'] = {
+        fmt: {width: f"/{path}" for width, path in sizes.items()}
+        for fmt, sizes in variants.items()
+    } if variants else None
+
+    album_dict.pop('cover_hash', None)
+    album_dict.pop('content_hash', None)
+    return album_dict
+
+def hydrate_albums(conn, album_ids: Sequence[int], user_id: Optional[int] = None) -> Tuple[List[Dict[str, Any]], List[int]]:
+    """Load full albums for a list of ids in the order given.
+
+    One query for the albums, one for their genres and, with a user, one for
+    their likes. Returns (albums, missing_ids); duplicate ids are returned once.
+    """
+    ids = list(dict.fromkeys(album_ids))
+    if not ids:
+        return [], []
+
+    c = conn.cursor(cursor_factory=RealDictCursor)
+    c.execute(f"""
+        SELECT {ALBUM_FIELDS}, ar.name AS artist_name
+        FROM albums a
+        JOIN artists ar ON a.artist_id = ar.id
+        WHERE a.id = ANY(%s)
+    """, (ids,))
+    albums = {row['id']: dict(row) for row in c.fetchall()}
+
+    album_genres_map = {}
+    liked_ids = set()
+    if albums:
+        c.execute("""
+            SELECT ag.album_id, g.name
+            FROM album_genres ag
+            JOIN genres g ON g.id = ag.genre_id
+            WHERE ag.album_id = ANY(%s)
+        """, (list(albums),))
+        for row in c.fetchall():
+            album_genres_map.setdefault(row['album_id'], []).append(row['name'])
+
+        if user_id:
+            c.execute("SELECT album_id FROM likes WHERE user_id = %s AND album_id = ANY(%s)",
+                      (user_id, list(albums)))
+            liked_ids = {row['album_id'] for row in c.fetchall()}
+
+    results, missing = [], []
+    for album_id in ids:
+        album = albums.get(album_id)
+        if album is None:
+            missing.append(album_id)
+            continue
+        album['genres'] = album_genres_map.get(album_id, [])
+        album['is_liked'] = album_id in liked_ids
+        results.append(format_album_images(album))
+    return results, missing
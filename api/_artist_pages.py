@@ -0,0 +1,179 @@
+import json
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import psycopg2
+from psycopg2.extras import RealDictCursor, execute_values
+
+from _albums import ALBUM_FIELDS, format_album_images
+from _http import body_etag
+
+# Materialized artist pages.
+#
+# artist_pages holds the finished JSON body of GET /api/artists/{id} (artist,
+# ranked discography with genres and cover URLs) plus its ETag, so serving a
+# page is one primary-key lookup. Triggers on artists, albums and album_genres
+# blank the body of every artist they touch; the scraper rebuilds the artists
+# it wrote, and the API rebuilds any other blank page on its next view.
+#
+# A rebuild locks the page rows before reading, and the triggers need the same
+# row locks, so a page can't be rebuilt from data that an in-flight write is
+# about to change without that write blanking it again afterwards.
+
+ARTIST_PAGES_DDL = """
+    CREATE TABLE IF NOT EXISTS artist_pages (
+        artist_id INTEGER PRIMARY KEY,
+        body TEXT,
+        etag TEXT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE OR REPLACE FUNCTION invalidate_artist_page() RETURNS trigger AS $$
+    DECLARE
+        affected INTEGER[];
+    BEGIN
+        IF TG_TABLE_NAME = 'artists' THEN
+            affected := ARRAY[NEW.id];
+        ELSIF TG_TABLE_NAME = 'albums' THEN
+            IF TG_OP = 'INSERT' THEN
+                affected := ARRAY[NEW.artist_id];
+            ELSIF TG_OP = 'DELETE' THEN
+                affected := ARRAY[OLD.artist_id];
+            ELSE
+                affected := ARRAY[OLD.artist_id, NEW.artist_id];
+            END IF;
+        ELSE
+            IF TG_OP = 'DELETE' THEN
+                SELECT ARRAY_AGG(artist_id) INTO affected FROM albums WHERE id = OLD.album_id;
+            ELSE
+                SELECT ARRAY_AGG(artist_id) INTO affected FROM albums WHERE id = NEW.album_id;
+            END IF;
+        END IF;
+
+        INSERT INTO artist_pages (artist_id, body, etag, updated_at)
+        SELECT DISTINCT a, NULL::TEXT, NULL::TEXT, NOW() FROM unnest(affected) AS a
+        WHERE a IS NOT NULL
+        ORDER BY 1
+        ON CONFLICT (artist_id) DO UPDATE SET body = NULL, etag = NULL, updated_at = NOW();
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS artist_page_artists ON artists;
+    CREATE TRIGGER artist_page_artists
+        AFTER UPDATE OF name, slug, bio, image_path, location ON artists
+        FOR EACH ROW EXECUTE PROCEDURE invalidate_artist_page();
+
+    DROP TRIGGER IF EXISTS artist_page_albums ON albums;
+    CREATE TRIGGER artist_page_albums
+        AFTER INSERT OR DELETE OR UPDATE OF title, artist_id, rank, release_date, rating, ratings_count,
+            image_path, spotify_link, youtube_link, apple_music_link, blurhash, dominant_color, cover_variants
+        ON albums
+        FOR EACH ROW EXECUTE PROCEDURE invalidate_artist_page();
+
+    DROP TRIGGER IF EXISTS artist_page_album_genres ON album_genres;
+    CREATE TRIGGER artist_page_album_genres
+        AFTER INSERT OR UPDATE OR DELETE ON album_genres
+        FOR EACH ROW EXECUTE PROCEDURE invalidate_artist_page();
+"""
+
+def get_artist_page(c, artist_id: int) -> Tuple[bool, Optional[Tuple[str, str]]]:
+    """(whether the artist exists, (body, etag) of their built page or None if it
+    is missing or was invalidated)."""
+    c.execute("""
+        SELECT p.body, p.etag FROM artists a
+        LEFT JOIN artist_pages p ON p.artist_id = a.id AND p.body IS NOT NULL
+        WHERE a.id = %s
+    """, (artist_id,))
+    row = c.fetchone()
+    if row is None:
+        return False, None
+    return True, ((row[0], row[1]) if row[0] is not None else None)
+
+def build_artist_documents(conn, artist_ids: List[int]) -> Dict[int, dict]:
+    """The GET /api/artists/{id} document for each existing artist, in three queries."""
+    c = conn.cursor(cursor_factory=RealDictCursor)
+    c.execute("""
+        SELECT id, name, slug, bio, image_path, location
+        FROM artists WHERE id = ANY(%s)
+    """, (artist_ids,))
+    documents = {row['id']: dict(row, albums=[]) for row in c.fetchall()}
+    if not documents:
+        return {}
+
+    # Only ranked albums from the Top 5000 chart
+    c.execute(f"""
+        SELECT {ALBUM_FIELDS}
+        FROM albums a
+        WHERE a.artist_id = ANY(%s) AND a.rank IS NOT NULL
+        ORDER BY a.artist_id, a.release_date DESC
+    """, (list(documents),))
+    albums = c.fetchall()
+
+    album_genres_map = {}
+    if albums:
+        c.execute("""
+            SELECT ag.album_id, g.name
+            FROM album_genres ag
+            JOIN genres g ON g.id = ag.genre_id
+            WHERE ag.album_id = ANY(%s)
+        """, ([a['id'] for a in albums],))
+        for row in c.fetchall():
+            album_genres_map.setdefault(row['album_id'], []).append(row['name'])
+
+    for album in albums:
+        album_dict = dict(album)
+        artist = documents[album_dict['artist_id']]
+        album_dict['artist_name'] = artist['name']
+        album_dict['genres'] = album_genres_map.get(album_dict['id'], [])
+        format_album_images(album_dict)
+        artist['albums'].append(album_dict)
+    return documents
+
+def render_pages(conn, artist_ids: List[int]) -> Dict[int, Tuple[str, str]]:
+    pages = {}
+    for artist_id, document in build_artist_documents(conn, artist_ids).items():
+        body = json.dumps(document, ensure_ascii=False, separators=(',', ':'))
+        pages[artist_id] = (body, body_etag(body))
+    return pages
+
+def rebuild_artist_pages(conn, artist_ids: Iterable[int], lock_timeout_ms: Optional[int] = None) -> Dict[int, Tuple[str, str]]:
+    """Rebuild and store the pages of the given artists. Returns {artist_id: (body, etag)}
+    for the artists that exist. Commits.
+
+    With `lock_timeout_ms`, a page that is locked by an in-flight write is
+    rendered but not stored rather than waited for."""
+    artist_ids = sorted(set(artist_ids))
+    if not artist_ids:
+        return {}
+    c = conn.cursor()
+    try:
+        if lock_timeout_ms is not None:
+            c.execute("SET LOCAL lock_timeout = %s", (f"{int(lock_timeout_ms)}ms",))
+        # Lock the page rows (creating them if needed) before reading any data
+        execute_values(c, "INSERT INTO artist_pages (artist_id) VALUES %s ON CONFLICT DO NOTHING",
+                       [(i,) for i in artist_ids])
+        c.execute("SELECT artist_id FROM artist_pages WHERE artist_id = ANY(%s) ORDER BY artist_id FOR UPDATE",
+                  (artist_ids,))
+
+        pages = render_pages(conn, artist_ids)
+        if pages:
+            execute_values(c, """
+                UPDATE artist_pages AS p
+                SET body = v.body, etag = v.etag, updated_at = NOW()
+                FROM (VALUES %s) AS v(artist_id, body, etag)
+                WHERE p.artist_id = v.artist_id
+            """, [(artist_id, body, etag) for artist_id, (body, etag) in pages.items()])
+        # Ids that aren't artists don't get a placeholder row
+        missing = [i for i in artist_ids if i not in pages]
+        if missing:
+            c.execute("DELETE FROM artist_pages WHERE artist_id = ANY(%s)", (missing,))
+        conn.commit()
+        return pages
+    except psycopg2.errors.LockNotAvailable:
+        conn.rollback()
+        pages = render_pages(conn, artist_ids)
+        conn.rollback()
+        return pages
+    except Exception:
+        conn.rollback()
+        raise
@@ -0,0 +1,265 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from _albums import format_album_images
+
+# Read-only SQLite copy of the catalog, shipped alongside the API.
+#
+# scripts/export_catalog_sqlite.py copies artists, albums, genres, album genres
+# and the rendered artist pages out of Postgres into one file, with trigram FTS5
+# indexes for search, and renames it into place. When the file is present the
+# catalog endpoints read it locally instead of going over the network;
+# Postgres still holds everything user-specific (sessions, likes, collections).
+#
+# The file is opened immutable (it is never written once published), with one
+# connection per thread. A newly published file (a new inode) is picked up
+# within CATALOG_DB_CHECK_INTERVAL seconds.
+#
+# Deploying: the file is generated, not committed (api/data/ is gitignored),
+# so run scripts/export_catalog_sqlite.py and deploy the API from that
+# checkout (`vercel deploy --prod` in api/). A git-triggered deploy has no
+# file and reads the catalog from Postgres; in production (or with
+# CATALOG_DB_EXPECTED=1) that is logged as an error at startup, since it is
+# slower, but the API still serves.
+#
+# Artist pages rebuilt in Postgres after the export (see _artist_pages) win
+# over the exported copy: the ids of pages updated since the export are
+# re-read every ARTIST_PAGE_CHECK_INTERVAL seconds and served from Postgres.
+
+# Kept under api/ so the API deployment (api/vercel.json) bundles it
+CATALOG_DB_PATH = os.environ.get(
+    "CATALOG_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "catalog.sqlite")
+)
+CATALOG_DB_CHECK_INTERVAL = 10
+CATALOG_DB_EXPECTED = os.environ.get(
+    "CATALOG_DB_EXPECTED", "1" if os.environ.get("VERCEL_ENV") == "production" else "0"
+) == "1"
+ARTIST_PAGE_CHECK_INTERVAL = 60
+# Page writes are stamped with their transaction's start, which can precede the
+# export's snapshot even when the export didn't see them
+EXPORT_CLOCK_MARGIN = timedelta(minutes=10)
+
+CATALOG_DB_SCHEMA = """
+    CREATE TABLE artists (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        slug TEXT,
+        bio TEXT,
+        image_path TEXT,
+        location TEXT
+    );
+    CREATE TABLE albums (
+        id INTEGER PRIMARY KEY,
+        title TEXT NOT NULL,
+        artist_id INTEGER NOT NULL REFERENCES artists(id),
+        rank INTEGER,
+        release_date TEXT,
+        rating REAL,
+        ratings_count TEXT,
+        image_path TEXT,
+        spotify_link TEXT,
+        youtube_link TEXT,
+        apple_music_link TEXT,
+        blurhash TEXT,
+        dominant_color TEXT,
+        cover_variants TEXT
+    );
+    CREATE INDEX idx_albums_artist ON albums(artist_id);
+    CREATE TABLE genres (
+        id INTEGER PRIMARY KEY,
+        name TEXT UNIQUE NOT NULL
+    );
+    CREATE TABLE album_genres (
+        album_id INTEGER NOT NULL,
+        genre_id INTEGER NOT NULL,
+        is_primary INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (album_id, genre_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX idx_album_genres_genre ON album_genres(genre_id, album_id);
+    CREATE TABLE artist_pages (
+        artist_id INTEGER PRIMARY KEY,
+        body TEXT NOT NULL,
+        etag TEXT NOT NULL
+    );
+    CREATE TABLE meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    );
+
+    -- Trigram indexes keep the substring semantics of the Postgres ILIKE search
+    CREATE VIRTUAL TABLE artist_search USING fts5(
+        name, content='artists', content_rowid='id', tokenize='trigram'
+    );
+    CREATE VIRTUAL TABLE album_search USING fts5(
+        title, content='albums', content_rowid='id', tokenize='trigram'
+    );
+"""
+
+ALBUM_COLUMNS = """
+    a.id, a.title, a.artist_id, a.rank, a.release_date, a.rating, a.ratings_count,
+    a.image_path, a.spotify_link, a.youtube_link, a.apple_music_link,
+    a.blurhash, a.dominant_color, a.cover_variants, ar.name AS artist_name
+"""
+
+# Trigram matching needs at least three characters; shorter queries use LIKE
+MIN_FTS_QUERY = 3
+
+def _placeholders(count: int) -> str:
+    return ",".join("?" * count)
+
+def _fts_phrase(query: str) -> str:
+    return '"' + query.replace('"', '""') + '"'
+
+class CatalogDB:
+    def __init__(self, path: str):
+        stat = os.stat(path)
+        self.path = path
+        self.file_id = (stat.st_dev, stat.st_ino)
+        self.local = threading.local()
+        # Fail now rather than on the first request if the file is bad
+        self.connection().execute("SELECT 1 FROM artist_pages LIMIT 1")
+        self.exported_at = self._exported_at()
+        self.changed_lock = threading.Lock()
+        self.changed_ids: Set[int] = set()
+        self.changed_checked_at = float('-inf')
+
+    def _exported_at(self) -> Optional[datetime]:
+        try:
+            row = self.connection().execute("SELECT value FROM meta WHERE key = 'exported_at'").fetchone()
+        except sqlite3.OperationalError:
+            # Exported before the meta table existed
+            return None
+        return datetime.fromisoformat(row['value']) if row else None
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            self.local.conn = conn
+        return conn
+
+    def hydrate_albums(self, album_ids: Sequence[int]) -> Tuple[List[Dict[str, Any]], List[int]]:
+        """Albums in the order given, like _albums.hydrate_albums but without likes
+        (is_liked is False). Returns (albums, missing_ids)."""
+        ids = list(dict.fromkeys(album_ids))
+        if not ids:
+            return [], []
+        conn = self.connection()
+        rows = conn.execute(f"""
+            SELECT {ALBUM_COLUMNS}
+            FROM albums a JOIN artists ar ON ar.id = a.artist_id
+            WHERE a.id IN ({_placeholders(len(ids))})
+        """, ids).fetchall()
+        albums = {row['id']: dict(row) for row in rows}
+
+        album_genres_map = {}
+        if albums:
+            for album_id, name in conn.execute(f"""
+                SELECT ag.album_id, g.name
+                FROM album_genres ag JOIN genres g ON g.id = ag.genre_id
+                WHERE ag.album_id IN ({_placeholders(len(albums))})
+            """, list(albums)):
+                album_genres_map.setdefault(album_id, []).append(name)
+
+        results, missing = [], []
+        for album_id in ids:
+            album = albums.get(album_id)
+            if album is None:
+                missing.append(album_id)
+                continue
+            if album['cover_variants']:
+                album['cover_variants'] = json.loads(album['cover_variants'])
+            album['genres'] = album_genres_map.get(album_id, [])
+            album['is_liked'] = False
+            results.append(format_album_images(album))
+        return results, missing
+
+    def changed_artist_ids(self, get_connection: Callable) -> Optional[Set[int]]:
+        """Artists whose page in Postgres changed (or may have) since the export, or
+        None if the file doesn't record when it was exported."""
+        if self.exported_at is None:
+            return None
+        with self.changed_lock:
+            if time.monotonic() - self.changed_checked_at < ARTIST_PAGE_CHECK_INTERVAL:
+                return self.changed_ids
+            with get_connection() as conn:
+                c = conn.cursor()
+                c.execute("SELECT artist_id FROM artist_pages WHERE updated_at > %s",
+                          (self.exported_at - EXPORT_CLOCK_MARGIN,))
+                self.changed_ids = {row[0] for row in c.fetchall()}
+            self.changed_checked_at = time.monotonic()
+            return self.changed_ids
+
+    def artist_page(self, artist_id: int) -> Optional[Tuple[str, str]]:
+        """(body, etag) of the artist page as rendered at export time."""
+        row = self.connection().execute(
+            "SELECT body, etag FROM artist_pages WHERE artist_id = ?", (artist_id,)
+        ).fetchone()
+        return (row['body'], row['etag']) if row else None
+
+    def search(self, query: str, artist_limit: int = 5, album_limit: int = 10) -> Dict[str, List[Dict[str, Any]]]:
+        """Same results as the Postgres ILIKE search in index.py."""
+        conn = self.connection()
+        if len(query) >= MIN_FTS_QUERY:
+            phrase = _fts_phrase(query)
+            artists = conn.execute("""
+                SELECT ar.id, ar.name, ar.image_path, ar.location
+                FROM artist_search s JOIN artists ar ON ar.id = s.rowid
+                WHERE artist_search MATCH ? ORDER BY s.rank LIMIT ?
+            """, (phrase, artist_limit)).fetchall()
+            albums = conn.execute("""
+                SELECT a.id, a.title, a.artist_id, a.release_date, a.image_path, a.rating, ar.name AS artist_name
+                FROM album_search s
+                JOIN albums a ON a.id = s.rowid
+                JOIN artists ar ON ar.id = a.artist_id
+                WHERE album_search MATCH ? ORDER BY s.rank LIMIT ?
+            """, (phrase, album_limit)).fetchall()
+        else:
+            pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            artists = conn.execute("""
+                SELECT id, name, image_path, location FROM artists
+                WHERE name LIKE ? ESCAPE '\\' LIMIT ?
+            """, (pattern, artist_limit)).fetchall()
+            albums = conn.execute("""
+                SELECT a.id, a.title, a.artist_id, a.release_date, a.image_path, a.rating, ar.name AS artist_name
+                FROM albums a JOIN artists ar ON ar.id = a.artist_id
+                WHERE a.title LIKE ? ESCAPE '\\' LIMIT ?
+            """, (pattern, album_limit)).fetchall()
+        return {"artists": [dict(row) for row in artists], "albums": [dict(row) for row in albums]}
+
+_current: Optional[CatalogDB] = None
+_checked_at = float('-inf')
+_catalog_db_lock = threading.Lock()
+
+def get_catalog_db(path: str = CATALOG_DB_PATH) -> Optional[CatalogDB]:
+    """The latest exported catalog database, or None if there is none."""
+    global _current, _checked_at
+    if time.monotonic() - _checked_at < CATALOG_DB_CHECK_INTERVAL:
+        return _current
+    with _catalog_db_lock:
+        if time.monotonic() - _checked_at < CATALOG_DB_CHECK_INTERVAL:
+            return _current
+        _checked_at = time.monotonic()
+        try:
+            stat = os.stat(path)
+            if _current is None or _current.file_id != (stat.st_dev, stat.st_ino):
+                _current = CatalogDB(path)
+                print(f"DEBUG: Opened catalog database {path}")
+        except FileNotFoundError:
+            pass
+        except (OSError, sqlite3.Error) as e:
+            print(f"ERROR: Failed to open catalog database {path}: {e}")
+    return _current
+
+def check_catalog_db(path: str = CATALOG_DB_PATH):
+    """Log an error if the catalog database is expected here (see CATALOG_DB_EXPECTED) but missing."""
+    if CATALOG_DB_EXPECTED and get_catalog_db(path) is None:
+        print(f"ERROR: Catalog database {path} is missing, reading the catalog from Postgres. "
+              "Run scripts/export_catalog_sqlite.py and deploy from that checkout.")
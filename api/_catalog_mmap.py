@@ -0,0 +1,258 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+# Memory-mapped catalog file.
+#
+# scripts/publish_catalog.py writes albums, artists and genres into one file of
+# fixed-width column arrays plus a string table, and swaps it into place with
+# a rename. Every worker maps the file read-only, so the catalog is held once
+# in the page cache however many workers run. get_catalog() notices a newly
+# published file (a different inode) within CATALOG_CHECK_INTERVAL seconds and
+# maps it; readers still holding the old mapping keep a consistent view until
+# they drop it.
+#
+# Layout: header, section table, then each section 8-byte aligned. Rows are
+# sorted by id so lookups are a binary search over the id column. String
+# columns hold indexes into the string table, where 0 means NULL. Arrays are
+# in native byte order; the header records it and other orders are rejected.
+
+CATALOG_PATH = os.environ.get(
+    "CATALOG_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "catalog.bin")
+)
+CATALOG_CHECK_INTERVAL = 10
+
+MAGIC = b"SDCATLG1"
+HEADER = struct.Struct("<8s8sIIIIQ")   # magic, byte order, album/artist/genre/string counts, built_at
+SECTION = struct.Struct("<QQ")         # offset, length in bytes
+
+ALBUM_STRINGS = ("title", "release_date", "ratings_count", "image_path", "spotify_link",
+                 "youtube_link", "apple_music_link", "blurhash", "dominant_color", "cover_variants")
+ARTIST_STRINGS = ("name", "slug", "bio", "image_path", "location")
+
+# (name, array typecode) in file order
+SECTIONS = (
+    ("album_id", "i"), ("album_artist_id", "i"), ("album_rank", "i"), ("album_rating", "d"),
+    ("album_strings", "I"), ("album_genre_offsets", "I"), ("album_genre_ids", "i"),
+    ("album_genre_primary", "B"),
+    ("artist_id", "i"), ("artist_strings", "I"),
+    ("genre_id", "i"), ("genre_name", "I"),
+    ("string_offsets", "I"), ("string_data", "B"),
+)
+
+NULL_RANK = -1
+
+class CatalogFile:
+    """Read-only view of one published catalog file."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self.buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.path = path
+        self.file_id = (stat.st_dev, stat.st_ino)
+
+        magic, byteorder, self.album_count, self.artist_count, self.genre_count, self.string_count, \
+            self.built_at = HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a catalog file")
+        if byteorder.rstrip(b"\0").decode() != sys.byteorder:
+            raise ValueError(f"{path} was written on a {byteorder.decode()}-endian machine")
+
+        view = memoryview(self.buf)
+        self.columns = {}
+        for i, (name, typecode) in enumerate(SECTIONS):
+            offset, length = SECTION.unpack_from(self.buf, HEADER.size + i * SECTION.size)
+            self.columns[name] = view[offset:offset + length].cast(typecode)
+        self._genre_names = None
+
+    def __getattr__(self, name):
+        # Columns by name: catalog.album_id, catalog.string_data, ...
+        columns = self.__dict__.get("columns")
+        if columns is not None and name in columns:
+            return columns[name]
+        raise AttributeError(name)
+
+    def string(self, index: int) -> Optional[str]:
+        if index == 0:
+            return None
+        start, end = self.string_offsets[index], self.string_offsets[index + 1]
+        return bytes(self.string_data[start:end]).decode("utf-8")
+
+    def _find(self, ids: Sequence[int], item_id: int) -> Optional[int]:
+        i = bisect_left(ids, item_id)
+        return i if i < len(ids) and ids[i] == item_id else None
+
+    def album_row(self, album_id: int) -> Optional[int]:
+        return self._find(self.album_id, album_id)
+
+    def artist_row(self, artist_id: int) -> Optional[int]:
+        return self._find(self.artist_id, artist_id)
+
+    def genre_names(self) -> Dict[int, str]:
+        if self._genre_names is None:
+            self._genre_names = {self.genre_id[i]: self.string(self.genre_name[i]) for i in range(self.genre_count)}
+        return self._genre_names
+
+    def genre_ids_of(self, row: int) -> List[int]:
+        return list(self.album_genre_ids[self.album_genre_offsets[row]:self.album_genre_offsets[row + 1]])
+
+    def album_genres(self, row: int) -> List[str]:
+        names = self.genre_names()
+        return [names[g] for g in self.genre_ids_of(row)]
+
+    def album(self, row: int) -> Dict[str, Any]:
+        """The album at a row, with the columns of `albums` plus artist_name."""
+        width = len(ALBUM_STRINGS)
+        strings = self.album_strings[row * width:(row + 1) * width]
+        album = {name: self.string(index) for name, index in zip(ALBUM_STRINGS, strings)}
+        rank, rating = self.album_rank[row], self.album_rating[row]
+        album.update(
+            id=self.album_id[row],
+            artist_id=self.album_artist_id[row],
+            rank=None if rank == NULL_RANK else rank,
+            rating=None if rating != rating else rating,   # NaN is NULL
+        )
+        if album['cover_variants']:
+            album['cover_variants'] = json.loads(album['cover_variants'])
+        artist_row = self.artist_row(album['artist_id'])
+        album['artist_name'] = self.string(self.artist_strings[artist_row * len(ARTIST_STRINGS)]) \
+            if artist_row is not None else None
+        return album
+
+    def albums(self, genre: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Albums in id order, optionally only those tagged with a genre."""
+        if genre is None:
+            rows = range(self.album_count)
+        else:
+            genre_id = next((g for g, name in self.genre_names().items() if name == genre), None)
+            if genre_id is None:
+                return
+            rows = (row for row in range(self.album_count) if genre_id in self.genre_ids_of(row))
+        for row in rows:
+            yield self.album(row)
+
+    def artist(self, artist_id: int) -> Optional[Dict[str, Any]]:
+        row = self.artist_row(artist_id)
+        if row is None:
+            return None
+        width = len(ARTIST_STRINGS)
+        strings = self.artist_strings[row * width:(row + 1) * width]
+        artist = {name: self.string(index) for name, index in zip(ARTIST_STRINGS, strings)}
+        artist['id'] = artist_id
+        return artist
+
+_current: Optional[CatalogFile] = None
+_checked_at = float('-inf')
+_catalog_lock = threading.Lock()
+
+def get_catalog(path: str = CATALOG_PATH) -> Optional[CatalogFile]:
+    """The latest published catalog, or None if none has been published."""
+    global _current, _checked_at
+    if time.monotonic() - _checked_at < CATALOG_CHECK_INTERVAL:
+        return _current
+    with _catalog_lock:
+        if time.monotonic() - _checked_at < CATALOG_CHECK_INTERVAL:
+            return _current
+        _checked_at = time.monotonic()
+        try:
+            stat = os.stat(path)
+            if _current is None or _current.file_id != (stat.st_dev, stat.st_ino):
+                # The old mapping is released once the last reader drops it
+                _current = CatalogFile(path)
+                print(f"DEBUG: Mapped catalog {path} ({_current.album_count} albums)")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"ERROR: Failed to map catalog {path}: {e}")
+    return _current
+
+class StringTable:
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.offsets = array("I", [0, 0])   # index 0 is NULL
+        self.data = bytearray()
+
+    def add(self, value: Optional[str]) -> int:
+        if value is None:
+            return 0
+        i = self.index.get(value)
+        if i is None:
+            self.data += value.encode("utf-8")
+            i = len(self.offsets) - 1
+            self.offsets.append(len(self.data))
+            self.index[value] = i
+        return i
+
+def write_catalog(path: str, albums: List[Dict[str, Any]], artists: List[Dict[str, Any]],
+                  genres: List[Dict[str, Any]], album_genres: List[Dict[str, Any]]):
+    """Write a catalog file and atomically replace `path` with it.
+
+    `albums` need the columns in ALBUM_STRINGS plus id, artist_id, rank and
+    rating; `album_genres` rows are (album_id, genre_id, is_primary) dicts."""
+    strings = StringTable()
+    columns = {name: array(typecode) for name, typecode in SECTIONS}
+
+    genres_by_album: Dict[int, List[Dict[str, Any]]] = {}
+    for row in album_genres:
+        genres_by_album.setdefault(row['album_id'], []).append(row)
+
+    columns['album_genre_offsets'].append(0)
+    for album in sorted(albums, key=lambda a: a['id']):
+        columns['album_id'].append(album['id'])
+        columns['album_artist_id'].append(album['artist_id'])
+        columns['album_rank'].append(NULL_RANK if album['rank'] is None else album['rank'])
+        columns['album_rating'].append(float('nan') if album['rating'] is None else album['rating'])
+        for name in ALBUM_STRINGS:
+            value = album[name]
+            if name == 'cover_variants' and value is not None and not isinstance(value, str):
+                value = json.dumps(value, separators=(',', ':'))
+            columns['album_strings'].append(strings.add(value))
+        for row in sorted(genres_by_album.get(album['id'], []), key=lambda r: r['genre_id']):
+            columns['album_genre_ids'].append(row['genre_id'])
+            columns['album_genre_primary'].append(1 if row['is_primary'] else 0)
+        columns['album_genre_offsets'].append(len(columns['album_genre_ids']))
+
+    for artist in sorted(artists, key=lambda a: a['id']):
+        columns['artist_id'].append(artist['id'])
+        for name in ARTIST_STRINGS:
+            columns['artist_strings'].append(strings.add(artist[name]))
+
+    for genre in sorted(genres, key=lambda g: g['id']):
+        columns['genre_id'].append(genre['id'])
+        columns['genre_name'].append(strings.add(genre['name']))
+
+    columns['string_offsets'] = strings.offsets
+    columns['string_data'] = array("B", strings.data)
+
+    header_size = HEADER.size + len(SECTIONS) * SECTION.size
+    offset = (header_size + 7) & ~7
+    table, payloads = [], []
+    for name, _ in SECTIONS:
+        data = columns[name].tobytes()
+        table.append(SECTION.pack(offset, len(data)))
+        padding = -len(data) % 8
+        payloads.append(data + b"\0" * padding)
+        offset += len(data) + padding
+
+    header = HEADER.pack(MAGIC, sys.byteorder.encode(), len(columns['album_id']), len(columns['artist_id']),
+                         len(columns['genre_id']), len(strings.offsets) - 1, int(time.time()))
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(b"".join(table))
+        f.write(b"\0" * (((header_size + 7) & ~7) - header_size))
+        for payload in payloads:
+            f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    # Readers see either the old file or the new one, never a partial write
+    os.replace(tmp_path, path)
@@ -0,0 +1,84 @@
+from typing import Any, Dict, Iterable, List, Optional
+
+from psycopg2.extras import execute_values
+
+from _valuation import adjust_collection_value
+
+COLLECTION_COLUMNS = ("discogs_id", "master_id", "title", "artist", "format", "label", "year", "thumb_url", "notes")
+
+def upsert_collection_items(cursor, user_id: int, items: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+    """Insert or refresh collection items in a single statement.
+
+    Items already in the collection are updated from `items`; notes are only
+    overwritten when the new value has some. New items are added to the user's
+    running collection value. Returns added/updated/unchanged counts.
+    """
+    # ON CONFLICT can't touch the same row twice in one statement: last occurrence wins
+    unique_items = {item['discogs_id']: item for item in items}
+    rows = [
+        (user_id, *(item.get(col) for col in COLLECTION_COLUMNS))
+        for item in unique_items.values()
+    ]
+    if not rows:
+        return {"added": 0, "updated": 0, "unchanged": 0}
+
+    # Rows whose values didn't change are skipped by the WHERE and not returned;
+    # xmax = 0 tells a freshly inserted row from an updated one
+    results = execute_values(cursor, """
+        INSERT INTO collection_items
+        (user_id, discogs_id, master_id, title, artist, format, label, year, thumb_url, notes)
+        VALUES %s
+        ON CONFLICT (user_id, discogs_id) DO UPDATE SET
+            master_id = EXCLUDED.master_id,
+            title = EXCLUDED.title,
+            artist = EXCLUDED.artist,
+            format = EXCLUDED.format,
+            label = EXCLUDED.label,
+            year = EXCLUDED.year,
+            thumb_url = EXCLUDED.thumb_url,
+            notes = COALESCE(EXCLUDED.notes, collection_items.notes)
+        WHERE (collection_items.master_id, collection_items.title, collection_items.artist,
+               collection_items.format, collection_items.label, collection_items.year,
+               collection_items.thumb_url, collection_items.notes)
+            IS DISTINCT FROM
+              (EXCLUDED.master_id, EXCLUDED.title, EXCLUDED.artist,
+               EXCLUDED.format, EXCLUDED.label, EXCLUDED.year,
+               EXCLUDED.thumb_url, COALESCE(EXCLUDED.notes, collection_items.notes))
+        RETURNING discogs_id, (xmax = 0) AS inserted
+    """, rows, page_size=len(rows), fetch=True)
+
+    added_ids = [discogs_id for discogs_id, inserted in results if inserted]
+    adjust_collection_value(cursor, user_id, added_ids, 1)
+    added = len(added_ids)
+    return {"added": added, "updated": len(results) - added, "unchanged": len(rows) - len(results)}
+
+def _artist_names(artists: List[Dict[str, Any]]) -> str:
+    # Discogs disambiguates homonyms as "Name (2)"
+    names = []
+    for artist in artists:
+        name = artist.get('name', '')
+        if name.endswith(')') and ' (' in name and name.rsplit(' (', 1)[1][:-1].isdigit():
+            name = name.rsplit(' (', 1)[0]
+        names.append(name)
+    return ", ".join(n for n in names if n) or "Unknown Artist"
+
+def item_from_discogs_release(release: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Map one entry of a Discogs collection page to a collection_items row."""
+    info = release.get('basic_information') or {}
+    discogs_id = info.get('id') or release.get('id')
+    if not discogs_id:
+        return None
+
+    formats = info.get('formats') or []
+    labels = info.get('labels') or []
+    return {
+        'discogs_id': discogs_id,
+        'master_id': info.get('master_id') or None,
+        'title': info.get('title') or 'Unknown Title',
+        'artist': _artist_names(info.get('artists') or []),
+        'format': ", ".join(f['name'] for f in formats if f.get('name')) or 'Unknown Format',
+        'label': labels[0].get('name') if labels else None,
+        'year': str(info['year']) if info.get('year') else None,
+        'thumb_url': info.get('thumb') or None,
+        'notes': None,
+    }
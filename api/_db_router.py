@@ -0,0 +1,165 @@
+import contextvars
+import itertools
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import psycopg2
+from psycopg2 import pool
+
+# Read/write connection routing.
+#
+# Writes always go to the primary. Reads go round-robin to the replicas listed
+# in POSTGRES_REPLICA_HOSTS ("host[:port],..."; same user, password and
+# database as the primary) while they are healthy, and to the primary when
+# none are. A daemon thread checks each replica every few seconds and takes it
+# out of rotation if it is unreachable, not in recovery, or lagging more than
+# POSTGRES_REPLICA_MAX_LAG seconds.
+#
+# Read-your-writes: a client that just wrote gets a short-lived cookie (set by
+# the middleware in index.py), and while prefer_primary is set for its
+# requests their reads go to the primary too, on whichever worker serves them.
+#
+# Pools are ThreadedConnectionPools: sync endpoints run on a thread pool, and
+# SimpleConnectionPool isn't safe to share between threads. A pool keeps
+# `minconn` idle connections; any beyond that are closed when returned.
+
+POOL_MIN_CONNECTIONS = int(os.environ.get("POSTGRES_POOL_MIN", "1"))
+POOL_MAX_CONNECTIONS = int(os.environ.get("POSTGRES_POOL_MAX", "20"))
+REPLICA_MAX_LAG = float(os.environ.get("POSTGRES_REPLICA_MAX_LAG", "5"))
+REPLICA_CHECK_INTERVAL = 5
+REPLICA_CONNECT_TIMEOUT = 3
+READ_YOUR_WRITES_SECONDS = 5
+STICKY_COOKIE = "db_primary"
+
+prefer_primary: contextvars.ContextVar = contextvars.ContextVar("prefer_primary", default=False)
+
+# Replay lag in seconds; 0 when everything received has been replayed (an idle
+# primary sends nothing, so the last replay timestamp alone would look stale)
+REPLICA_STATUS_SQL = """
+    SELECT pg_is_in_recovery(),
+        CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+             ELSE EXTRACT(EPOCH FROM NOW() - pg_last_xact_replay_timestamp())
+        END
+"""
+
+class PooledConnection:
+    def __init__(self, pool, conn):
+        self.pool = pool
+        self.conn = conn
+
+    def close(self):
+        if self.pool and self.conn:
+            # Broken connections are dropped instead of going back into the pool
+            self.pool.putconn(self.conn, close=bool(self.conn.closed))
+            self.conn = None
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    def cursor(self, *args, **kwargs):
+        return self.conn.cursor(*args, **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+def replica_settings_from_env(primary: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Connection settings for each host in POSTGRES_REPLICA_HOSTS."""
+    replicas = []
+    for entry in os.environ.get("POSTGRES_REPLICA_HOSTS", "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        host, _, port = entry.partition(":")
+        replicas.append(dict(primary, host=host, port=port or primary.get("port", "5432")))
+    return replicas
+
+class Replica:
+    def __init__(self, settings: Dict[str, Any]):
+        self.settings = settings
+        self.name = f"{settings['host']}:{settings['port']}"
+        self.pool: Optional[pool.ThreadedConnectionPool] = None
+        self.healthy = False
+        self.lag: Optional[float] = None
+
+    def check(self, max_lag: float):
+        healthy, reason = False, None
+        try:
+            if self.pool is None:
+                self.pool = pool.ThreadedConnectionPool(
+                    POOL_MIN_CONNECTIONS, POOL_MAX_CONNECTIONS,
+                    connect_timeout=REPLICA_CONNECT_TIMEOUT, **self.settings
+                )
+            conn = self.pool.getconn()
+            try:
+                c = conn.cursor()
+                c.execute(REPLICA_STATUS_SQL)
+                in_recovery, lag = c.fetchone()
+                conn.rollback()
+            finally:
+                self.pool.putconn(conn, close=bool(conn.closed))
+            self.lag = float(lag) if lag is not None else None
+            if not in_recovery:
+                reason = "not a standby"
+            elif self.lag is None or self.lag > max_lag:
+                reason = f"lagging ({self.lag}s)"
+            else:
+                healthy = True
+        except pool.PoolError:
+            # Every connection is busy serving reads: check again next round
+            return
+        except psycopg2.Error as e:
+            reason = str(e).strip()
+        self.set_healthy(healthy, reason)
+
+    def set_healthy(self, healthy: bool, reason: Optional[str] = None):
+        if healthy and not self.healthy:
+            print(f"DEBUG: Replica {self.name} is back in rotation")
+        elif not healthy and self.healthy:
+            print(f"ERROR: Replica {self.name} taken out of rotation: {reason}")
+        self.healthy = healthy
+
+class DatabaseRouter:
+    def __init__(self, primary: Dict[str, Any], replicas: List[Dict[str, Any]],
+                 max_lag: float = REPLICA_MAX_LAG):
+        self.primary = pool.ThreadedConnectionPool(POOL_MIN_CONNECTIONS, POOL_MAX_CONNECTIONS, **primary)
+        self.replicas = [Replica(settings) for settings in replicas]
+        self.max_lag = max_lag
+        self.turn = itertools.count()
+        if self.replicas:
+            self.check_replicas()
+            threading.Thread(target=self._check_loop, name="replica-health", daemon=True).start()
+
+    def check_replicas(self):
+        for replica in self.replicas:
+            replica.check(self.max_lag)
+
+    def _check_loop(self):
+        while True:
+            time.sleep(REPLICA_CHECK_INTERVAL)
+            self.check_replicas()
+
+    def connect_primary(self) -> PooledConnection:
+        return PooledConnection(self.primary, self.primary.getconn())
+
+    def connect_read(self) -> PooledConnection:
+        """A replica connection, or the primary if none is healthy or this client just wrote."""
+        if not prefer_primary.get():
+            healthy = [r for r in self.replicas if r.healthy]
+            if healthy:
+                replica = healthy[next(self.turn) % len(healthy)]
+                try:
+                    return PooledConnection(replica.pool, replica.pool.getconn())
+                except pool.PoolError:
+                    # Replica pool exhausted: borrow from the primary
+                    pass
+                except psycopg2.Error as e:
+                    replica.set_healthy(False, str(e).strip())
+        return self.connect_primary()
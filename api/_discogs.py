@@ -7,6 +7,8 @@ class DiscogsClient:
     
     def __init__(self):
         self.token = os.environ.get("DISCOGS_TOKEN")
+        # Point at scripts/mock_discogs.py for local testing
+        self.base_url = os.environ.get("DISCOGS_API_URL", self.BASE_URL).rstrip("/")
         self.headers = {
             "User-Agent": "SlowdiveApp/1.0",
             "Authorization": f"Discogs token={self.token}"
@@ -18,7 +20,7 @@ class DiscogsClient:
             
         async with httpx.AsyncClient() as client:
             response = await client.get(
-                f"{self.BASE_URL}/database/search",
+                f"{self.base_url}/database/search",
                 params={"q": query, "type": type},
                 headers=self.headers
             )
@@ -30,7 +32,7 @@ class DiscogsClient:
             
         async with httpx.AsyncClient() as client:
             response = await client.get(
-                f"{self.BASE_URL}/releases/{release_id}",
+                f"{self.base_url}/releases/{release_id}",
                 headers=self.headers
             )
             return response.json()
@@ -41,8 +43,52 @@ class DiscogsClient:
             
         async with httpx.AsyncClient() as client:
             response = await client.get(
-                f"{self.BASE_URL}/masters/{master_id}/versions",
+                f"{self.base_url}/masters/{master_id}/versions",
                 params={"page": page, "per_page": per_page},
                 headers=self.headers
             )
             return response.json()
+
+    async def get_user_collection(self, username: str, page: int = 1, per_page: int = 100) -> Dict[str, Any]:
+        """One page of a user's whole collection (folder 0), oldest additions first so
+        page numbers stay stable while the user keeps adding records.
+        Raises httpx.HTTPStatusError so callers can back off on 429s."""
+        if not self.token:
+            return {"error": "Discogs token not configured"}
+
+        async with httpx.AsyncClient(timeout=30) as client:
+            response = await client.get(
+                f"{self.base_url}/users/{username}/collection/folders/0/releases",
+                params={"page": page, "per_page": per_page, "sort": "added", "sort_order": "asc"},
+                headers=self.headers
+            )
+            response.raise_for_status()
+            return response.json()
+
+    async def get_marketplace_stats(self, release_id: int, currency: str = "USD") -> Dict[str, Any]:
+        """Lowest listed price and number for sale. Raises httpx.HTTPStatusError on failure."""
+        if not self.token:
+            return {"error": "Discogs token not configured"}
+
+        async with httpx.AsyncClient(timeout=30) as client:
+            response = await client.get(
+                f"{self.base_url}/marketplace/stats/{release_id}",
+                params={"curr_abbr": currency},
+                headers=self.headers
+            )
+            response.raise_for_status()
+            return response.json()
+
+    async def get_price_suggestions(self, release_id: int) -> Dict[str, Any]:
+        """Suggested price per media condition, in the token owner's seller currency.
+        Discogs refuses this for accounts without seller settings (raises httpx.HTTPStatusError)."""
+        if not self.token:
+            return {"error": "Discogs token not configured"}
+
+        async with httpx.AsyncClient(timeout=30) as client:
+            response = await client.get(
+                f"{self.base_url}/marketplace/price_suggestions/{release_id}",
+                headers=self.headers
+            )
+            response.raise_for_status()
+            return response.json()
@@ -0,0 +1,294 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from psycopg2.extras import RealDictCursor
+
+from _catalog_mmap import ALBUM_STRINGS, get_catalog
+
+# Faceted browse over the catalog with bitmap indexes.
+#
+# Every album gets a row number, in chart order (rank, then id), and each facet
+# value is a Python int used as a bitmap over the rows: bit i is set when row i
+# has the value. Filters then combine with & | ~ on those ints, which run in C
+# over machine words, and a facet count is a popcount of the result ANDed with
+# the value's bitmap. Because rows are in chart order, the first set bits of a
+# result are already its best-ranked albums.
+#
+# Numeric filters (year, rating, ratings count) use a ThresholdIndex: rows
+# sorted by value and cut into buckets, with a bitmap of "this bucket and every
+# later one" per bucket. A ">= x" filter is one of those bitmaps plus the few
+# rows of the bucket x falls in.
+#
+# Rating and year sorts walk a row order computed once per index, keeping the
+# matching rows, so a page costs about offset + limit steps rather than a sort
+# of every match; results too sparse for that are sorted by position instead.
+#
+# The index is built from the memory-mapped catalog when one is published
+# (and rebuilt when a new one is), otherwise from Postgres every
+# FACET_INDEX_TTL seconds.
+
+FACET_INDEX_TTL = 600
+THRESHOLD_BUCKETS = 256
+FACET_GENRE_LIMIT = 50
+
+YEAR_PATTERN = re.compile(r"\b(1[89]\d\d|20\d\d)\b")
+
+def parse_year(release_date: Optional[str]) -> Optional[int]:
+    match = YEAR_PATTERN.search(release_date or "")
+    return int(match.group(1)) if match else None
+
+def parse_count(ratings_count: Optional[str]) -> Optional[int]:
+    try:
+        return int(ratings_count.replace(',', '')) if ratings_count else None
+    except ValueError:
+        return None
+
+def bitmap_from_rows(rows: Iterable[int]) -> int:
+    # Setting bits in a bytearray and converting once avoids a new big int per row
+    rows = list(rows)
+    if not rows:
+        return 0
+    data = bytearray(max(rows) // 8 + 1)
+    for row in rows:
+        data[row >> 3] |= 1 << (row & 7)
+    return int.from_bytes(data, "little")
+
+def rows_from_bitmap(bitmap: int, limit: Optional[int] = None) -> List[int]:
+    """Set bits in ascending order, stopping after `limit`."""
+    rows = []
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+    for byte_index, byte in enumerate(data):
+        while byte:
+            low = byte & -byte
+            rows.append(byte_index * 8 + low.bit_length() - 1)
+            if limit is not None and len(rows) >= limit:
+                return rows
+            byte ^= low
+    return rows
+
+class ThresholdIndex:
+    """Answers "value >= x" over one numeric column as a bitmap. Rows without a value never match."""
+
+    def __init__(self, values: List[Optional[float]], buckets: int = THRESHOLD_BUCKETS):
+        pairs = sorted((value, row) for row, value in enumerate(values) if value is not None)
+        self.values = [value for value, _ in pairs]
+        self.rows = [row for _, row in pairs]
+        self.step = max(1, -(-len(pairs) // buckets))
+        # suffix[b] has every row from sorted position b * step on
+        self.suffix = [0] * (len(range(0, len(pairs), self.step)) + 1)
+        for b in range(len(self.suffix) - 2, -1, -1):
+            start = b * self.step
+            self.suffix[b] = self.suffix[b + 1] | bitmap_from_rows(self.rows[start:start + self.step])
+
+    def at_least(self, threshold: float) -> int:
+        position = bisect_left(self.values, threshold)
+        bucket = -(-position // self.step)
+        return self.suffix[bucket] | bitmap_from_rows(self.rows[position:bucket * self.step])
+
+    def between(self, low: Optional[float], high_exclusive: Optional[float]) -> int:
+        bitmap = self.at_least(low) if low is not None else self.suffix[0]
+        if high_exclusive is not None:
+            bitmap &= ~self.at_least(high_exclusive)
+        return bitmap
+
+class FacetIndex:
+    def __init__(self, albums: List[Dict[str, Any]], genre_names: Dict[int, str], source_id: Any):
+        """`albums` need id, artist_id, rank, rating, ratings_count, release_date and
+        genres as a list of (genre_id, is_primary)."""
+        self.source_id = source_id
+        self.built_at = time.monotonic()
+        albums = sorted(albums, key=lambda a: (a['rank'] is None, a['rank'] or 0, a['id']))
+        self.album_ids = [album['id'] for album in albums]
+        self.all_rows = (1 << len(albums)) - 1
+        self.genre_names = genre_names
+        self.genre_ids = {name: genre_id for genre_id, name in genre_names.items()}
+
+        genre_rows: Dict[int, List[int]] = {}
+        primary_rows: Dict[int, List[int]] = {}
+        decade_rows: Dict[int, List[int]] = {}
+        self.artist_rows: Dict[int, List[int]] = {}
+        years, ratings, counts = [], [], []
+        self.row_genres = [[genre_id for genre_id, _ in album['genres']] for album in albums]
+        self.row_primary_genres = [[genre_id for genre_id, is_primary in album['genres'] if is_primary]
+                                   for album in albums]
+        for row, album in enumerate(albums):
+            for genre_id, is_primary in album['genres']:
+                genre_rows.setdefault(genre_id, []).append(row)
+                if is_primary:
+                    primary_rows.setdefault(genre_id, []).append(row)
+            year = parse_year(album['release_date'])
+            if year is not None:
+                decade_rows.setdefault(year // 10 * 10, []).append(row)
+            self.artist_rows.setdefault(album['artist_id'], []).append(row)
+            years.append(year)
+            ratings.append(album['rating'])
+            counts.append(parse_count(album['ratings_count']))
+        # Best first, rows without a value last, ties in chart order
+        self.sort_orders: Dict[str, List[int]] = {
+            sort: sorted(range(len(albums)), key=lambda row: (values[row] is None, -(values[row] or 0), row))
+            for sort, values in (("rating", ratings), ("year", years))
+        }
+        self.sort_positions: Dict[str, List[int]] = {}
+        for sort, order in self.sort_orders.items():
+            positions = [0] * len(order)
+            for position, row in enumerate(order):
+                positions[row] = position
+            self.sort_positions[sort] = positions
+
+        self.genres = {g: bitmap_from_rows(rows) for g, rows in genre_rows.items()}
+        self.primary_genres = {g: bitmap_from_rows(rows) for g, rows in primary_rows.items()}
+        self.decades = {d: bitmap_from_rows(rows) for d, rows in sorted(decade_rows.items())}
+        self.year_index = ThresholdIndex(years)
+        self.rating_index = ThresholdIndex(ratings)
+        self.count_index = ThresholdIndex(counts)
+        self._unfiltered_counts: Dict[bool, Dict[str, List[Dict[str, Any]]]] = {}
+
+    def query(self, genres: Optional[List[str]] = None, genre_mode: str = "all", primary_only: bool = False,
+              year_min: Optional[int] = None, year_max: Optional[int] = None,
+              min_rating: Optional[float] = None, min_ratings_count: Optional[int] = None,
+              artist_id: Optional[int] = None) -> int:
+        """Bitmap of the rows matching every filter given."""
+        result = self.all_rows
+        if genres:
+            bitmaps = self.primary_genres if primary_only else self.genres
+            genre_bitmaps = [bitmaps.get(self.genre_ids.get(name), 0) for name in genres]
+            if genre_mode == "any":
+                combined = 0
+                for bitmap in genre_bitmaps:
+                    combined |= bitmap
+            else:
+                combined = self.all_rows
+                for bitmap in genre_bitmaps:
+                    combined &= bitmap
+            result &= combined
+        if year_min is not None or year_max is not None:
+            result &= self.year_index.between(year_min, year_max + 1 if year_max is not None else None)
+        if min_rating is not None:
+            result &= self.rating_index.at_least(min_rating)
+        if min_ratings_count is not None:
+            result &= self.count_index.at_least(min_ratings_count)
+        if artist_id is not None:
+            result &= bitmap_from_rows(self.artist_rows.get(artist_id, ()))
+        return result
+
+    def facet_counts(self, result: int, primary_only: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+        """How many of the matching albums each genre and decade would keep."""
+        if result == self.all_rows:
+            # The unfiltered landing view is the most common request and the most expensive
+            if primary_only not in self._unfiltered_counts:
+                self._unfiltered_counts[primary_only] = self._facet_counts(result, primary_only)
+            return self._unfiltered_counts[primary_only]
+        return self._facet_counts(result, primary_only)
+
+    def _facet_counts(self, result: int, primary_only: bool) -> Dict[str, List[Dict[str, Any]]]:
+        bitmaps = self.primary_genres if primary_only else self.genres
+        total = result.bit_count()
+        if total * 4 < len(bitmaps):
+            # Few matches: tallying their genres beats an AND per genre
+            counter = Counter()
+            row_genres = self.row_primary_genres if primary_only else self.row_genres
+            for row in rows_from_bitmap(result):
+                counter.update(row_genres[row])
+            genre_counts = list(counter.items())
+        else:
+            genre_counts = [(genre_id, (result & bitmap).bit_count()) for genre_id, bitmap in bitmaps.items()]
+        genre_counts = sorted((gc for gc in genre_counts if gc[1]), key=lambda gc: (-gc[1], gc[0]))
+        return {
+            "genres": [{"name": self.genre_names[genre_id], "count": count}
+                       for genre_id, count in genre_counts[:FACET_GENRE_LIMIT]],
+            "decades": [{"decade": decade, "count": count}
+                        for decade, bitmap in self.decades.items()
+                        if (count := (result & bitmap).bit_count())],
+        }
+
+    def page(self, result: int, sort: str, offset: int, limit: int) -> Tuple[List[int], int]:
+        """(album ids of the page, total matches). sort is rank, rating or year."""
+        total = result.bit_count()
+        if sort == "rank":
+            # Rows are in chart order already
+            rows = rows_from_bitmap(result, offset + limit)[offset:]
+        elif total * 8 < len(self.album_ids):
+            # Sparse: sorting the few matches beats walking the whole order
+            rows = sorted(rows_from_bitmap(result), key=self.sort_positions[sort].__getitem__)
+            rows = rows[offset:offset + limit]
+        else:
+            data = result.to_bytes((result.bit_length() + 7) // 8, "little")
+            rows = []
+            for row in self.sort_orders[sort]:
+                if row >> 3 < len(data) and data[row >> 3] >> (row & 7) & 1:
+                    rows.append(row)
+                    if len(rows) >= offset + limit:
+                        break
+            rows = rows[offset:]
+        return [self.album_ids[row] for row in rows], total
+
+def _catalog_albums(catalog) -> List[Dict[str, Any]]:
+    width = len(ALBUM_STRINGS)
+    release_date, ratings_count = ALBUM_STRINGS.index('release_date'), ALBUM_STRINGS.index('ratings_count')
+    albums = []
+    for row in range(catalog.album_count):
+        rank, rating = catalog.album_rank[row], catalog.album_rating[row]
+        start, end = catalog.album_genre_offsets[row], catalog.album_genre_offsets[row + 1]
+        strings = catalog.album_strings[row * width:(row + 1) * width]
+        albums.append({
+            'id': catalog.album_id[row],
+            'artist_id': catalog.album_artist_id[row],
+            'rank': None if rank < 0 else rank,
+            'rating': None if rating != rating else rating,
+            'release_date': catalog.string(strings[release_date]),
+            'ratings_count': catalog.string(strings[ratings_count]),
+            'genres': list(zip(catalog.album_genre_ids[start:end], catalog.album_genre_primary[start:end])),
+        })
+    return albums
+
+def _postgres_albums(conn) -> Tuple[List[Dict[str, Any]], Dict[int, str]]:
+    c = conn.cursor(cursor_factory=RealDictCursor)
+    c.execute("""
+        SELECT a.id, a.artist_id, a.rank, a.rating, a.release_date, a.ratings_count,
+            COALESCE(ARRAY_AGG(ag.genre_id) FILTER (WHERE ag.genre_id IS NOT NULL), '{}') AS genre_ids,
+            COALESCE(ARRAY_AGG(COALESCE(ag.is_primary, FALSE)) FILTER (WHERE ag.genre_id IS NOT NULL), '{}') AS primary_flags
+        FROM albums a
+        JOIN artists ar ON ar.id = a.artist_id
+        LEFT JOIN album_genres ag ON ag.album_id = a.id
+        GROUP BY a.id
+    """)
+    albums = []
+    for row in c.fetchall():
+        album = dict(row)
+        album['genres'] = list(zip(album.pop('genre_ids'), album.pop('primary_flags')))
+        albums.append(album)
+    c.execute("SELECT id, name FROM genres")
+    genre_names = {row['id']: row['name'] for row in c.fetchall()}
+    conn.commit()
+    return albums, genre_names
+
+_index: Optional[FacetIndex] = None
+_index_lock = threading.Lock()
+
+def get_facet_index(get_connection) -> FacetIndex:
+    """The current index, rebuilt when a new catalog is published or the Postgres-built one expires."""
+    global _index
+    catalog = get_catalog()
+    source_id = catalog.file_id if catalog is not None else None
+    index = _index
+    if index is not None and index.source_id == source_id and \
+            (source_id is not None or time.monotonic() - index.built_at < FACET_INDEX_TTL):
+        return index
+
+    with _index_lock:
+        index = _index
+        if index is not None and index.source_id == source_id and \
+                (source_id is not None or time.monotonic() - index.built_at < FACET_INDEX_TTL):
+            return index
+        if catalog is not None:
+            index = FacetIndex(_catalog_albums(catalog), dict(catalog.genre_names()), source_id)
+        else:
+            with get_connection() as conn:
+                albums, genre_names = _postgres_albums(conn)
+            index = FacetIndex(albums, genre_names, None)
+        _index = index
+    return index
@@ -0,0 +1,32 @@
+import hashlib
+import json
+from typing import Any, Optional
+
+from fastapi import Response
+
+def body_etag(body: str) -> str:
+    return '"' + hashlib.sha256(body.encode('utf-8')).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True if an If-None-Match header names `etag` (weak or strong) or is '*'."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag == etag or tag == '*':
+            return True
+    return False
+
+def json_response(body: str, etag: str, if_none_match: Optional[str], cache_control: str) -> Response:
+    """Serve pre-serialized JSON with an ETag, or a 304 when the client already has it."""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def cacheable_json(data: Any, if_none_match: Optional[str], cache_control: str) -> Response:
+    """Serialize `data` and serve it with an ETag derived from the body."""
+    body = json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=str)
+    return json_response(body, body_etag(body), if_none_match, cache_control)
@@ -0,0 +1,190 @@
+import asyncio
+import secrets
+import time
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+from psycopg2.extras import RealDictCursor
+
+from _collection import item_from_discogs_release, upsert_collection_items
+
+# Discogs collection imports, advanced a chunk at a time by API requests.
+#
+# The API runs as a serverless function that is frozen once it has responded,
+# so nothing runs between requests: starting an import and every progress poll
+# each import pages for up to REQUEST_BUDGET_SECONDS before answering. The
+# client polls until the job finishes; a job left half done (the user closed
+# the page) carries on when they start the import again.
+#
+# A job row in import_jobs is the source of truth: each page's items are
+# committed together with the job's next_page, so a request that dies
+# mid-import loses at most that page. A request holds the job through
+# worker_token while it works and releases it when its budget is spent; a
+# token whose heartbeat_at is STALE_AFTER_SECONDS old (its request was killed)
+# can be taken over. Overlapping polls don't wait: the one without the token
+# just reports progress.
+
+IMPORT_PER_PAGE = 100
+PAGE_INTERVAL = 1.0        # Discogs allows 60 authenticated requests a minute
+REQUEST_BUDGET_SECONDS = 5.0
+STALE_AFTER_SECONDS = 60   # longer than any request holds a job
+MAX_PAGE_ATTEMPTS = 5
+
+JOB_COLUMNS = """
+    id, discogs_username, status, next_page, total_pages, total_items,
+    items_imported, items_added, items_updated, error, created_at, updated_at, finished_at
+"""
+
+def create_import_job(conn, user_id: int, username: str) -> Dict[str, Any]:
+    """Queue an import for the user, or return the one already in progress."""
+    c = conn.cursor(cursor_factory=RealDictCursor)
+    c.execute(f"""
+        INSERT INTO import_jobs (user_id, discogs_username)
+        VALUES (%s, %s)
+        ON CONFLICT (user_id) WHERE status IN ('queued', 'running') DO NOTHING
+        RETURNING {JOB_COLUMNS}
+    """, (user_id, username))
+    job = c.fetchone()
+    if job is None:
+        c.execute(f"""
+            SELECT {JOB_COLUMNS} FROM import_jobs
+            WHERE user_id = %s AND status IN ('queued', 'running')
+        """, (user_id,))
+        job = c.fetchone()
+    conn.commit()
+    return job
+
+def get_import_job(conn, job_id: int, user_id: int) -> Optional[Dict[str, Any]]:
+    c = conn.cursor(cursor_factory=RealDictCursor)
+    c.execute(f"SELECT {JOB_COLUMNS} FROM import_jobs WHERE id = %s AND user_id = %s", (job_id, user_id))
+    return c.fetchone()
+
+def claim_import_job(conn, job_id: int) -> Optional[str]:
+    """Take over a queued or unfinished job. Returns the worker token, or None if
+    another request holds it."""
+    token = secrets.token_hex(8)
+    c = conn.cursor()
+    c.execute("""
+        UPDATE import_jobs
+        SET status = 'running', worker_token = %s, heartbeat_at = NOW(), updated_at = NOW()
+        WHERE id = %s AND status IN ('queued', 'running')
+          AND (worker_token IS NULL OR heartbeat_at < NOW() - %s * INTERVAL '1 second')
+        RETURNING id
+    """, (token, job_id, STALE_AFTER_SECONDS))
+    claimed = c.fetchone() is not None
+    conn.commit()
+    return token if claimed else None
+
+def advance_import_job(job_id: int, get_connection: Callable, client,
+                       budget: float = REQUEST_BUDGET_SECONDS) -> bool:
+    """Import pages of the job for about `budget` seconds, in this request.
+    Returns False if another request holds the job."""
+    with get_connection() as conn:
+        token = claim_import_job(conn, job_id)
+    if token is None:
+        return False
+    try:
+        run_import_job(job_id, token, get_connection, client, time.monotonic() + budget)
+    finally:
+        with get_connection() as conn:
+            c = conn.cursor()
+            c.execute("UPDATE import_jobs SET worker_token = NULL WHERE id = %s AND worker_token = %s",
+                      (job_id, token))
+            conn.commit()
+    return True
+
+class PageDeferred(Exception):
+    """A page's retry would run past the request's budget; the next request retries it."""
+
+def _fetch_page(client, username: str, page: int, deadline: float) -> Dict[str, Any]:
+    last_error = None
+    for attempt in range(MAX_PAGE_ATTEMPTS):
+        try:
+            data = asyncio.run(client.get_user_collection(username, page, IMPORT_PER_PAGE))
+            if 'error' in data:
+                raise RuntimeError(data['error'])
+            return data
+        except httpx.HTTPStatusError as e:
+            status = e.response.status_code
+            if status == 404:
+                raise RuntimeError(f"Discogs user '{username}' not found or collection is private")
+            if status != 429 and status < 500:
+                raise RuntimeError(f"Discogs returned {status}")
+            last_error = e
+            retry_after = e.response.headers.get('Retry-After')
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else 2 ** attempt * 5
+        except httpx.TransportError as e:
+            last_error = e
+            delay = 2 ** attempt
+        if time.monotonic() + delay > deadline:
+            raise PageDeferred(f"page {page}: {last_error}")
+        time.sleep(delay)
+    raise RuntimeError(f"Giving up on page {page}: {last_error}")
+
+def run_import_job(job_id: int, token: str, get_connection: Callable, client, deadline: float):
+    """Import pages from next_page on until the job is done or `deadline` (a
+    time.monotonic() value) passes, committing progress per page."""
+    with get_connection() as conn:
+        c = conn.cursor(cursor_factory=RealDictCursor)
+        c.execute("SELECT user_id, discogs_username, next_page FROM import_jobs WHERE id = %s", (job_id,))
+        job = c.fetchone()
+    user_id, username, page = job['user_id'], job['discogs_username'], job['next_page']
+    print(f"DEBUG: Import job {job_id} for {username} continuing at page {page}")
+
+    try:
+        while True:
+            started = time.monotonic()
+            data = _fetch_page(client, username, page, deadline)
+            pagination = data.get('pagination') or {}
+            total_pages = pagination.get('pages') or 1
+            items = [item for item in map(item_from_discogs_release, data.get('releases') or []) if item]
+
+            with get_connection() as conn:
+                c = conn.cursor()
+                try:
+                    counts = upsert_collection_items(c, user_id, items)
+                except Exception:
+                    conn.rollback()
+                    raise
+                done = page >= total_pages
+                c.execute("""
+                    UPDATE import_jobs
+                    SET next_page = %s, total_pages = %s, total_items = %s,
+                        items_imported = items_imported + %s,
+                        items_added = items_added + %s, items_updated = items_updated + %s,
+                        status = %s, finished_at = CASE WHEN %s THEN NOW() END,
+                        heartbeat_at = NOW(), updated_at = NOW()
+                    WHERE id = %s AND worker_token = %s
+                """, (
+                    page + 1, total_pages, pagination.get('items'),
+                    len(items), counts['added'], counts['updated'],
+                    'completed' if done else 'running', done,
+                    job_id, token
+                ))
+                if c.rowcount == 0:
+                    # Another request took the job over: drop this page, it will redo it
+                    conn.rollback()
+                    print(f"DEBUG: Import job {job_id} was taken over, stopping")
+                    return
+                conn.commit()
+
+            if done:
+                print(f"DEBUG: Import job {job_id} completed")
+                return
+            page += 1
+            pause = max(0.0, PAGE_INTERVAL - (time.monotonic() - started))
+            if time.monotonic() + pause >= deadline:
+                return
+            time.sleep(pause)
+    except PageDeferred as e:
+        print(f"DEBUG: Import job {job_id} deferred {e}")
+    except Exception as e:
+        print(f"ERROR: Import job {job_id} failed: {e}")
+        with get_connection() as conn:
+            c = conn.cursor()
+            c.execute("""
+                UPDATE import_jobs
+                SET status = 'failed', error = %s, finished_at = NOW(), updated_at = NOW()
+                WHERE id = %s AND worker_token = %s
+            """, (str(e), job_id, token))
+            conn.commit()
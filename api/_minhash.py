@@ -0,0 +1,167 @@
+import hashlib
+import random
+from array import array
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# MinHash signatures and LSH buckets for finding users with similar likes.
+#
+# A user's signature is, for each of NUM_HASHES hash functions, the smallest
+# hash of any album they liked. Two users agree on a position with probability
+# equal to the Jaccard similarity of their like sets, so the fraction of
+# matching positions estimates it. Signatures are stored as NUM_HASHES uint32s
+# (one bytea per user) and cut into LSH_BANDS bands of LSH_ROWS positions; each
+# band hashes to a bucket in user_lsh_buckets, and users sharing any bucket are
+# the candidates. With 32 bands of 2 rows a pair with Jaccard 0.2 shares a
+# bucket ~73% of the time and a pair at 0.05 ~8%, so finding similar users
+# reads a handful of index ranges instead of every like of every album the user
+# liked.
+#
+# Likes update the signature in the same transaction (an element-wise min); an
+# unlike only recomputes it from the user's likes when the removed album held
+# one of the minimums. scripts/build_minhash.py backfills users who have none.
+# Updates for one user are serialized with an advisory lock rather than FOR
+# UPDATE, which locks nothing while the user has no row yet: two first likes
+# would each rebuild from likes missing the other's album, and the last write
+# would drop one of them.
+
+NUM_HASHES = 64
+LSH_BANDS = 32
+LSH_ROWS = NUM_HASHES // LSH_BANDS
+SIMILAR_USERS = 10
+MAX_CANDIDATES = 200
+MINHASH_LOCK_NAMESPACE = 3604
+
+# Largest prime below 2**32, so every hash fits a uint32
+HASH_PRIME = 4294967291
+EMPTY = HASH_PRIME
+
+# Fixed seed: signatures must agree across processes and deploys
+_coefficients = random.Random(0x5eed_4a11).sample(range(1, HASH_PRIME), 2 * NUM_HASHES)
+HASH_A = _coefficients[:NUM_HASHES]
+HASH_B = _coefficients[NUM_HASHES:]
+
+USER_MINHASH_DDL = """
+    CREATE TABLE IF NOT EXISTS user_minhash (
+        user_id INTEGER PRIMARY KEY REFERENCES users (id) ON DELETE CASCADE,
+        signature BYTEA NOT NULL,
+        updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+    );
+
+    CREATE TABLE IF NOT EXISTS user_lsh_buckets (
+        band SMALLINT NOT NULL,
+        bucket BIGINT NOT NULL,
+        user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+        PRIMARY KEY (band, bucket, user_id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_user_lsh_buckets_user ON user_lsh_buckets (user_id);
+"""
+
+def album_hashes(album_id: int) -> List[int]:
+    return [(a * album_id + b) % HASH_PRIME for a, b in zip(HASH_A, HASH_B)]
+
+def signature_of(album_ids: Iterable[int]) -> List[int]:
+    signature = [EMPTY] * NUM_HASHES
+    for album_id in album_ids:
+        signature = [min(s, h) for s, h in zip(signature, album_hashes(album_id))]
+    return signature
+
+def pack(signature: List[int]) -> bytes:
+    return array("I", signature).tobytes()
+
+def unpack(data) -> List[int]:
+    signature = array("I")
+    signature.frombytes(bytes(data))
+    return signature.tolist()
+
+def band_buckets(signature: List[int]) -> List[Optional[int]]:
+    """The bucket of each band; None for every band of an empty signature."""
+    if signature[0] == EMPTY:
+        return [None] * LSH_BANDS
+    buckets = []
+    for band in range(LSH_BANDS):
+        digest = hashlib.blake2b(pack(signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]), digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, "big", signed=True))
+    return buckets
+
+def estimated_similarity(a: List[int], b: List[int]) -> float:
+    return sum(x == y for x, y in zip(a, b)) / NUM_HASHES
+
+def _store(c, user_id: int, old: Optional[List[int]], new: List[int]):
+    c.execute("""
+        INSERT INTO user_minhash (user_id, signature) VALUES (%s, %s)
+        ON CONFLICT (user_id) DO UPDATE SET signature = EXCLUDED.signature, updated_at = NOW()
+    """, (user_id, pack(new)))
+    old_buckets = band_buckets(old) if old is not None else [None] * LSH_BANDS
+    new_buckets = band_buckets(new)
+    moved = [band for band in range(LSH_BANDS) if old is None or old_buckets[band] != new_buckets[band]]
+    if not moved:
+        return
+    c.execute("DELETE FROM user_lsh_buckets WHERE user_id = %s AND band = ANY(%s)", (user_id, moved))
+    rows = [(band, new_buckets[band], user_id) for band in moved if new_buckets[band] is not None]
+    if rows:
+        c.executemany("INSERT INTO user_lsh_buckets (band, bucket, user_id) VALUES (%s, %s, %s)", rows)
+
+def update_user_signature(c, user_id: int, album_id: int, liked: bool):
+    """Apply one like or unlike to the user's signature. Call after writing the
+    like, in the same transaction; the caller commits. `c` is a RealDictCursor."""
+    # Held until commit, so the next update reads this one's signature and like
+    c.execute("SELECT pg_advisory_xact_lock(%s, %s)", (MINHASH_LOCK_NAMESPACE, user_id))
+    c.execute("SELECT signature FROM user_minhash WHERE user_id = %s", (user_id,))
+    row = c.fetchone()
+    old = unpack(row['signature']) if row else None
+
+    if old is not None and liked:
+        new = [min(s, h) for s, h in zip(old, album_hashes(album_id))]
+    elif old is not None and not any(s == h for s, h in zip(old, album_hashes(album_id))):
+        # The removed album held none of the minimums
+        return
+    else:
+        # Unlike of a minimum, or a user not backfilled yet: rebuild from their likes
+        c.execute("SELECT album_id FROM likes WHERE user_id = %s", (user_id,))
+        new = signature_of(r['album_id'] for r in c.fetchall())
+    if new != old:
+        _store(c, user_id, old, new)
+
+def similar_users(c, user_id: int, limit: int = SIMILAR_USERS) -> Optional[List[Tuple[int, float]]]:
+    """[(user_id, estimated Jaccard similarity)], most similar first, from the
+    users sharing an LSH bucket with this one. None if the user has no
+    signature yet. `c` is a RealDictCursor."""
+    c.execute("SELECT signature FROM user_minhash WHERE user_id = %s", (user_id,))
+    row = c.fetchone()
+    if row is None:
+        return None
+    signature = unpack(row['signature'])
+    buckets = band_buckets(signature)
+    if buckets[0] is None:
+        return []
+
+    # Users sharing more bands are likelier to be similar: score those first
+    c.execute("""
+        SELECT m.user_id, m.signature
+        FROM (
+            SELECT b.user_id, COUNT(*) AS shared_bands
+            FROM unnest(%s::SMALLINT[], %s::BIGINT[]) AS mine(band, bucket)
+            JOIN user_lsh_buckets b ON b.band = mine.band AND b.bucket = mine.bucket
+            WHERE b.user_id != %s
+            GROUP BY b.user_id
+            ORDER BY shared_bands DESC
+            LIMIT %s
+        ) candidates
+        JOIN user_minhash m ON m.user_id = candidates.user_id
+    """, (list(range(LSH_BANDS)), buckets, user_id, MAX_CANDIDATES))
+    scored = [(r['user_id'], estimated_similarity(signature, unpack(r['signature']))) for r in c.fetchall()]
+    scored = [pair for pair in scored if pair[1] > 0]
+    scored.sort(key=lambda pair: (-pair[1], pair[0]))
+    return scored[:limit]
+
+def iter_signatures(likes: Iterable[Tuple[int, int]]) -> Iterator[Tuple[int, List[int]]]:
+    """(user_id, signature) for (user_id, album_id) pairs sorted by user_id."""
+    current_user, album_ids = None, []
+    for user_id, album_id in likes:
+        if user_id != current_user:
+            if current_user is not None:
+                yield current_user, signature_of(album_ids)
+            current_user, album_ids = user_id, []
+        album_ids.append(album_id)
+    if current_user is not None:
+        yield current_user, signature_of(album_ids)
@@ -0,0 +1,415 @@
+import hashlib
+import os
+import random
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from psycopg2.extras import RealDictCursor
+
+from _albums import format_album_images
+from _catalog_mmap import get_catalog
+from _minhash import similar_users
+from _trending import trending_boosts
+
+# Home feed ranking (GET /api/albums).
+#
+# Every visitor gets a daily ordering: scores mix quality, personal affinity and
+# seeded randomness, and the seed is a keyed digest of the user (or
+# "anonymous") and the date so it is the same in every worker process.
+#
+# Anonymous visitors all share one ordering per day and genre. It is built once
+# by whichever request gets there first (an advisory lock makes the others wait
+# for it rather than build their own), stored in feed_cache for the other
+# workers, and kept in process memory, so an anonymous request only hydrates
+# its slice of album ids.
+#
+# Candidates come from the memory-mapped catalog (see _catalog_mmap) when one
+# has been published, and from Postgres otherwise.
+#
+# Signed-in users' feeds are precomputed nightly by scripts/precompute_feeds.py
+# into user_feeds (top FEED_TOP_N ids plus the likes they were scored with).
+# The request path serves that list and only patches in likes made since.
+#
+# Every ordering also gets up to FEED_TRENDING_BOOST points for albums that are
+# trending (see _trending), scaled by their share of the top trending score.
+
+FEED_TOP_N = 500
+# Points added for the most-trending album, scaled down for the rest (0 turns it off)
+FEED_TRENDING_BOOST = float(os.environ.get("FEED_TRENDING_BOOST", "8"))
+FEED_SEED_KEY = os.environ.get("FEED_SEED_KEY", "serendipity-feed").encode("utf-8")
+FEED_LOCK_NAMESPACE = 3602
+
+FEED_CACHE_DDL = """
+    CREATE TABLE IF NOT EXISTS feed_cache (
+        day DATE NOT NULL,
+        genre TEXT NOT NULL DEFAULT '',
+        album_ids INTEGER[] NOT NULL,
+        built_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (day, genre)
+    );
+"""
+
+USER_FEEDS_DDL = """
+    CREATE TABLE IF NOT EXISTS user_feeds (
+        user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+        day DATE NOT NULL,
+        album_ids INTEGER[] NOT NULL,
+        liked_album_ids INTEGER[] NOT NULL,
+        total INTEGER NOT NULL,
+        built_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+
+def daily_seed(subject: str, day: date) -> int:
+    """Seed for a user's (or "anonymous") ordering on a given day, stable across processes."""
+    digest = hashlib.blake2b(f"{subject}_{day.isoformat()}".encode("utf-8"),
+                             key=FEED_SEED_KEY, digest_size=8).digest()
+    return int.from_bytes(digest, "big") % (2**31)
+
+def load_candidates(c, genre: Optional[str] = None) -> List[Dict[str, Any]]:
+    catalog = get_catalog()
+    if catalog is not None:
+        return list(catalog.albums(genre))
+    # Ordered so the seeded random draws land on the same albums in every process
+    if genre:
+        c.execute('''
+            SELECT DISTINCT a.*, ar.name as artist_name
+            FROM albums a
+            JOIN artists ar ON a.artist_id = ar.id
+            JOIN album_genres ag ON a.id = ag.album_id
+            JOIN genres g ON ag.genre_id = g.id
+            WHERE g.name = %s
+            ORDER BY a.id
+        ''', (genre,))
+    else:
+        c.execute('''
+            SELECT a.*, ar.name as artist_name
+            FROM albums a
+            JOIN artists ar ON a.artist_id = ar.id
+            ORDER BY a.id
+        ''')
+    return c.fetchall()
+
+def load_album_genres(c) -> Dict[int, List[str]]:
+    catalog = get_catalog()
+    if catalog is not None:
+        return {catalog.album_id[row]: catalog.album_genres(row) for row in range(catalog.album_count)
+                if catalog.album_genre_offsets[row] != catalog.album_genre_offsets[row + 1]}
+    c.execute('''
+        SELECT ag.album_id, g.name
+        FROM genres g
+        JOIN album_genres ag ON g.id = ag.genre_id
+    ''')
+    album_genres_map = {}
+    for row in c.fetchall():
+        album_genres_map.setdefault(row['album_id'], []).append(row['name'])
+    return album_genres_map
+
+def load_user_profile(c, user_id: int, album_genres_map: Dict[int, List[str]]) -> Dict[str, Any]:
+    """Likes, liked artists, genre counts and what similar users liked."""
+    profile = {
+        'liked_album_ids': set(),
+        'liked_artist_ids': set(),
+        'user_genre_counts': Counter(),
+        'similar_user_likes': set(),
+    }
+
+    # Get user's likes
+    c.execute("SELECT album_id FROM likes WHERE user_id = %s", (user_id,))
+    liked_album_ids = {row['album_id'] for row in c.fetchall()}
+    profile['liked_album_ids'] = liked_album_ids
+    if not liked_album_ids:
+        return profile
+
+    # Get liked artists
+    c.execute("SELECT DISTINCT artist_id FROM albums WHERE id = ANY(%s)", (list(liked_album_ids),))
+    profile['liked_artist_ids'] = {row['artist_id'] for row in c.fetchall()}
+
+    # Build genre preference profile
+    for aid in liked_album_ids:
+        for g in album_genres_map.get(aid, []):
+            profile['user_genre_counts'][g] += 1
+
+    # Collaborative filtering: the nearest users by MinHash (see _minhash)
+    neighbours = similar_users(c, user_id)
+    if neighbours is not None:
+        similar_user_ids = [similar_id for similar_id, _ in neighbours]
+    else:
+        # No signature yet (not backfilled): users who liked at least 2 of the same albums
+        c.execute('''
+            SELECT user_id, COUNT(*) as common_likes
+            FROM likes
+            WHERE album_id = ANY(%s) AND user_id != %s
+            GROUP BY user_id
+            HAVING COUNT(*) >= 2
+            ORDER BY common_likes DESC
+            LIMIT 10
+        ''', (list(liked_album_ids), user_id))
+        similar_user_ids = [row['user_id'] for row in c.fetchall()]
+
+    # Get what similar users liked
+    if similar_user_ids:
+        c.execute("SELECT DISTINCT album_id FROM likes WHERE user_id = ANY(%s)", (similar_user_ids,))
+        profile['similar_user_likes'] = {row['album_id'] for row in c.fetchall()}
+    return profile
+
+def load_trending_boosts(c) -> Dict[int, float]:
+    """{album_id: 0-1} trending weights for score_albums, or nothing when the boost is off."""
+    return trending_boosts(c) if FEED_TRENDING_BOOST > 0 else {}
+
+def score_albums(albums_data, album_genres_map: Dict[int, List[str]], profile: Optional[Dict[str, Any]],
+                 rng: random.Random, diversify: bool = True,
+                 trending: Optional[Dict[int, float]] = None) -> List[Dict[str, Any]]:
+    """Score and order the candidates. Returns public album dicts, best first."""
+    trending = trending or {}
+    liked_album_ids = profile['liked_album_ids'] if profile else set()
+    liked_artist_ids = profile['liked_artist_ids'] if profile else set()
+    user_genre_counts = profile['user_genre_counts'] if profile else Counter()
+    similar_user_likes = profile['similar_user_likes'] if profile else set()
+
+    results = []
+    for album in albums_data:
+        album_dict = dict(album)
+        aid = album['id']
+
+        album_dict['genres'] = album_genres_map.get(aid, [])
+        album_dict['is_liked'] = aid in liked_album_ids
+
+        format_album_images(album_dict)
+
+        # === SCORING ALGORITHM ===
+
+        # 1. BASE SCORE (30%): Quality and popularity
+        base_score = 0
+        # Rank score (lower rank = better)
+        rank_score = max(0, 1 - (album['rank'] / 10000.0))
+        # Rating score
+        rating_score = (album['rating'] or 3.0) / 5.0 if album['rating'] else 0.6
+        # Popularity score (normalized ratings count)
+        try:
+            ratings_count = int(album['ratings_count'].replace(',', '')) if album['ratings_count'] else 0
+            popularity_score = min(1.0, ratings_count / 50000.0)
+        except:
+            popularity_score = 0
+
+        base_score = (rank_score * 0.5 + rating_score * 0.3 + popularity_score * 0.2) * 30
+
+        # 2. PERSONALIZATION SCORE (40%)
+        personalization_score = 0
+        if profile:
+            # Genre affinity
+            genre_match = 0
+            for g in album_dict['genres']:
+                if g in user_genre_counts:
+                    genre_match += user_genre_counts[g]
+            personalization_score += min(genre_match * 3, 20)  # Cap at 20
+
+            # Artist affinity
+            if album['artist_id'] in liked_artist_ids:
+                personalization_score += 10
+
+            # Collaborative filtering boost
+            if aid in similar_user_likes and aid not in liked_album_ids:
+                personalization_score += 8
+
+            # Already liked albums get top priority
+            if album_dict['is_liked']:
+                personalization_score += 15
+
+        # 3. EXPLORATION SCORE (20%): Controlled randomness for discovery
+        exploration_score = 0
+        if profile:
+            # Boost albums from genres user hasn't explored much
+            unexplored_boost = 0
+            for g in album_dict['genres']:
+                if g not in user_genre_counts or user_genre_counts[g] < 2:
+                    unexplored_boost += 1
+            exploration_score += min(unexplored_boost * 3, 10)
+
+            # Add controlled randomness
+            exploration_score += rng.uniform(0, 10)
+        else:
+            # For anonymous users, more randomness
+            exploration_score = rng.uniform(0, 20)
+
+        # 4. TRENDING BOOST: what people are liking right now
+        trending_score = trending.get(aid, 0) * FEED_TRENDING_BOOST
+
+        # 5. DIVERSITY PENALTY (10%): Will be applied after initial sorting
+        # (Applied later to avoid clustering)
+
+        # Combine scores
+        total_score = base_score + personalization_score + exploration_score + trending_score
+        album_dict['_score'] = total_score
+        album_dict['_artist_id'] = album['artist_id']
+
+        results.append(album_dict)
+
+    # Sort by score
+    results.sort(key=lambda x: x['_score'], reverse=True)
+
+    # Apply diversity optimization: penalize albums that cluster by artist/genre
+    if diversify:
+        seen_artists = Counter()
+        seen_genres = Counter()
+
+        for album in results:
+            # Penalize if we've seen this artist too much in top results
+            artist_penalty = seen_artists[album['_artist_id']] * 2
+
+            # Penalize if genres are over-represented
+            genre_penalty = sum(seen_genres[g] for g in album['genres']) * 0.5
+
+            # Apply penalties
+            diversity_penalty = (artist_penalty + genre_penalty) * 0.1
+            album['_score'] -= diversity_penalty
+
+            # Update counters
+            seen_artists[album['_artist_id']] += 1
+            for g in album['genres']:
+                seen_genres[g] += 1
+
+        # Re-sort after diversity adjustment
+        results.sort(key=lambda x: x['_score'], reverse=True)
+
+    # Clean up internal fields
+    for album in results:
+        album.pop('_score', None)
+        album.pop('_artist_id', None)
+    return results
+
+def rank_albums(c, user_id: Optional[int], genre: Optional[str], day: date) -> List[Dict[str, Any]]:
+    """The full ordered feed of a user (or anonymous visitors) on a day. `c` is a RealDictCursor."""
+    albums_data = load_candidates(c, genre)
+    if not albums_data:
+        return []
+    album_genres_map = load_album_genres(c)
+    profile = load_user_profile(c, user_id, album_genres_map) if user_id else None
+    rng = random.Random(daily_seed(str(user_id or 'anonymous'), day))
+    # Only apply diversity when not filtering by genre
+    return score_albums(albums_data, album_genres_map, profile, rng, diversify=not genre,
+                        trending=load_trending_boosts(c))
+
+def precomputed_feed(conn, user_id: int, day: date) -> Optional[Tuple[List[int], int]]:
+    """(album ids, total) of the user's precomputed feed for the day, or None.
+
+    Albums liked since the feed was built are moved to the front, where the
+    liked-album boost would have put them; unlikes keep their place until the
+    next rebuild (the hydrated albums show them as not liked). Only likes made
+    after built_at are read, through the (user_id, created_at) index."""
+    c = conn.cursor()
+    c.execute("""
+        SELECT album_ids, liked_album_ids, total, built_at FROM user_feeds
+        WHERE user_id = %s AND day = %s
+    """, (user_id, day))
+    row = c.fetchone()
+    if row is None:
+        return None
+    album_ids, snapshot, total, built_at = row
+
+    c.execute("""
+        SELECT album_id FROM likes
+        WHERE user_id = %s AND created_at >= %s
+        ORDER BY created_at DESC
+    """, (user_id, built_at))
+    snapshot = set(snapshot)
+    added = [album_id for (album_id,) in c.fetchall() if album_id not in snapshot]
+    if added:
+        added_set = set(added)
+        rest = [album_id for album_id in album_ids if album_id not in added_set]
+        # Albums that weren't in the list lengthen the feed
+        total += len(added) - (len(album_ids) - len(rest))
+        album_ids = added + rest
+    return album_ids, total
+
+_anonymous_rankings: Dict[tuple, List[int]] = {}
+_build_locks: Dict[tuple, threading.Lock] = {}
+_rankings_lock = threading.Lock()
+
+# Genre names, so a ?genre= that matches nothing is answered without a build,
+# a lock entry or a query. Reloaded at most this often to pick up new genres.
+GENRE_REFRESH_SECONDS = 300
+_known_genres: Set[str] = set()
+_genres_loaded_at: Optional[float] = None
+
+def is_known_genre(get_connection, genre: str) -> bool:
+    global _known_genres, _genres_loaded_at
+    with _rankings_lock:
+        if genre in _known_genres:
+            return True
+        now = time.monotonic()
+        if _genres_loaded_at is not None and now - _genres_loaded_at < GENRE_REFRESH_SECONDS:
+            return False
+        # Claim the reload so concurrent misses don't all query
+        _genres_loaded_at = now
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT name FROM genres")
+        names = {row[0] for row in c.fetchall()}
+        conn.commit()
+    with _rankings_lock:
+        _known_genres = names
+    return genre in names
+
+def load_anonymous_ranking(conn, day: date, genre: str = '') -> List[int]:
+    """Read the day's anonymous ranking from feed_cache, building and storing it if needed."""
+    c = conn.cursor()
+    query = "SELECT album_ids FROM feed_cache WHERE day = %s AND genre = %s"
+    try:
+        c.execute(query, (day, genre))
+        row = c.fetchone()
+        if row is None:
+            # Single flight across workers: wait for whoever is building, then re-read
+            c.execute("SELECT pg_advisory_xact_lock(%s, hashtext(%s))",
+                      (FEED_LOCK_NAMESPACE, f"{day.isoformat()}:{genre}"))
+            c.execute(query, (day, genre))
+            row = c.fetchone()
+        if row is not None:
+            conn.commit()
+            return row[0]
+
+        results = rank_albums(conn.cursor(cursor_factory=RealDictCursor), None, genre or None, day)
+        album_ids = [album['id'] for album in results]
+        if album_ids:
+            # Unknown genres aren't stored, so arbitrary ?genre= values can't fill the table
+            c.execute("""
+                INSERT INTO feed_cache (day, genre, album_ids) VALUES (%s, %s, %s)
+                ON CONFLICT (day, genre) DO UPDATE SET album_ids = EXCLUDED.album_ids, built_at = NOW()
+            """, (day, genre, album_ids))
+            c.execute("DELETE FROM feed_cache WHERE day < %s", (day - timedelta(days=1),))
+        conn.commit()
+        return album_ids
+    except Exception:
+        conn.rollback()
+        raise
+
+def anonymous_ranking(get_connection, genre: Optional[str] = None, day: Optional[date] = None) -> List[int]:
+    """Album ids of today's anonymous feed (for a genre), best first."""
+    day = day or date.today()
+    key = (day, genre or '')
+    album_ids = _anonymous_rankings.get(key)
+    if album_ids is not None:
+        return album_ids
+    if genre and not is_known_genre(get_connection, genre):
+        return []
+
+    with _rankings_lock:
+        build_lock = _build_locks.setdefault(key, threading.Lock())
+    # Single flight within the process: one thread builds or loads, the rest wait for it
+    with build_lock:
+        album_ids = _anonymous_rankings.get(key)
+        if album_ids is None:
+            with get_connection() as conn:
+                album_ids = load_anonymous_ranking(conn, day, key[1])
+            with _rankings_lock:
+                # Yesterday's rankings are never read again
+                for old in [k for k in _anonymous_rankings if k[0] != day]:
+                    del _anonymous_rankings[old]
+                for old in [k for k in _build_locks if k[0] != day]:
+                    del _build_locks[old]
+                # Keys are real genres by now, so empty rankings are kept too
+                _anonymous_rankings[key] = album_ids
+    return album_ids
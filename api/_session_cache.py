@@ -0,0 +1,131 @@
+import select
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+# Per-process cache of session lookups: token -> user id, username and settings.
+#
+# Processes don't share memory, so a logout or settings change is announced on
+# the SESSION_CHANNEL Postgres channel (NOTIFY, sent in the transaction that
+# makes the change, so it is only delivered if that commits). Every process
+# LISTENs on a dedicated primary connection and drops the user's cached
+# sessions. Replicas may still serve the old row for a moment after that, so
+# sessions of users changed in the last RECENT_CHANGE_SECONDS are read from the
+# primary. The short TTL remains as a backstop for notifications missed while
+# the listener was reconnecting (or the process was frozen, as serverless
+# instances are between requests).
+
+SESSION_CACHE_TTL = 30
+SESSION_CACHE_MAX_ENTRIES = 10000
+SESSION_CHANNEL = "session_changes"
+RECENT_CHANGE_SECONDS = 10
+LISTEN_POLL_SECONDS = 30
+LISTEN_RECONNECT_SECONDS = 5
+
+def notify_session_change(c, user_id: int):
+    """Tell every process to drop the user's cached sessions once this transaction commits."""
+    c.execute("SELECT pg_notify(%s, %s)", (SESSION_CHANNEL, str(user_id)))
+
+class SessionCache:
+    def __init__(self, ttl: float = SESSION_CACHE_TTL, max_entries: int = SESSION_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.tokens_by_user: Dict[int, set] = {}
+        self.changed_users: Dict[int, float] = {}
+        self.listener: Optional[threading.Thread] = None
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            entry = self.entries.get(token)
+            if entry is None:
+                return None
+            if time.monotonic() - entry['_cached_at'] > self.ttl:
+                self._remove(token)
+                return None
+            return entry
+
+    def put(self, token: str, entry: Dict[str, Any]):
+        with self.lock:
+            if token not in self.entries and len(self.entries) >= self.max_entries:
+                # Dicts keep insertion order: drop the oldest entry
+                self._remove(next(iter(self.entries)))
+            entry['_cached_at'] = time.monotonic()
+            self.entries[token] = entry
+            self.tokens_by_user.setdefault(entry['user_id'], set()).add(token)
+
+    def invalidate(self, token: str):
+        with self.lock:
+            self._remove(token)
+
+    def invalidate_user(self, user_id: int):
+        """Drop every cached session of the user, and remember the change for a while."""
+        with self.lock:
+            for token in list(self.tokens_by_user.get(user_id, ())):
+                self._remove(token)
+            now = time.monotonic()
+            self.changed_users[user_id] = now
+            # Forget changes old enough that every replica has them
+            for uid, changed_at in list(self.changed_users.items()):
+                if now - changed_at > RECENT_CHANGE_SECONDS:
+                    del self.changed_users[uid]
+
+    def changed_recently(self, user_id: int) -> bool:
+        """Whether a replica might still return the user's session as it was before a change."""
+        with self.lock:
+            changed_at = self.changed_users.get(user_id)
+            return changed_at is not None and time.monotonic() - changed_at <= RECENT_CHANGE_SECONDS
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.tokens_by_user.clear()
+
+    def listen(self, connect: Callable):
+        """Start the daemon thread that applies SESSION_CHANNEL notifications.
+        `connect` opens a new connection to the primary."""
+        if self.listener is None:
+            self.listener = threading.Thread(target=self._listen_loop, args=(connect,),
+                                             name="session-listener", daemon=True)
+            self.listener.start()
+
+    def _listen_loop(self, connect: Callable):
+        while True:
+            conn = None
+            try:
+                conn = connect()
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {SESSION_CHANNEL}")
+                # Anything that changed while nobody was listening is unknown
+                self.clear()
+                while True:
+                    if select.select([conn], [], [], LISTEN_POLL_SECONDS) == ([], [], []):
+                        # Quiet channel: make sure the connection is still alive
+                        conn.cursor().execute("SELECT 1")
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self.invalidate_user(int(conn.notifies.pop(0).payload))
+            except Exception as e:
+                print(f"ERROR: Session listener disconnected: {e}")
+            finally:
+                if conn is not None:
+                    conn.close()
+            time.sleep(LISTEN_RECONNECT_SECONDS)
+
+    def update_settings(self, user_id: int, settings: Dict[str, Any]):
+        """Write-through: refresh the settings of every cached session of the user."""
+        with self.lock:
+            for token in self.tokens_by_user.get(user_id, ()):
+                self.entries[token]['settings'] = dict(settings)
+
+    def _remove(self, token: str):
+        entry = self.entries.pop(token, None)
+        if entry is None:
+            return
+        tokens = self.tokens_by_user.get(entry['user_id'])
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self.tokens_by_user[entry['user_id']]
@@ -0,0 +1,68 @@
+from typing import Any, Dict, List, Optional
+
+from psycopg2.extras import RealDictCursor
+
+# Precomputed "more like this" neighbours.
+#
+# scripts/build_neighbors.py gives every album a vector of its genres, TF-IDF
+# weighted so rare genres count for more than ubiquitous ones and primary
+# genres count PRIMARY_GENRE_WEIGHT times a secondary one, and scores album
+# pairs by the cosine of those vectors blended with the cosine of their like
+# vectors (users who liked both), CO_LIKE_WEIGHT of the way. The NEIGHBORS_K
+# best neighbours of each album are stored as one row of parallel arrays, so
+# serving them is a primary-key lookup and never touches album_genres or likes.
+#
+# Related artists work the same way one level up: an artist's genre vector sums
+# the weights over all of their albums, and two artists are co-liked when a user
+# liked albums by both. scripts/build_related_artists.py builds the whole graph;
+# the scraper calls its update_related_artists() once a run for the artists it
+# wrote, which rescores them against everyone and patches their neighbours'
+# lists, so artist pages never compute any of this.
+
+NEIGHBORS_K = 24
+PRIMARY_GENRE_WEIGHT = 2.0
+CO_LIKE_WEIGHT = 0.3
+RELATED_K = 12
+ARTIST_CO_LIKE_WEIGHT = 0.4
+
+ALBUM_NEIGHBORS_DDL = """
+    CREATE TABLE IF NOT EXISTS album_neighbors (
+        album_id INTEGER PRIMARY KEY REFERENCES albums (id) ON DELETE CASCADE,
+        neighbor_ids INTEGER[] NOT NULL,
+        scores REAL[] NOT NULL,
+        built_at TIMESTAMP NOT NULL DEFAULT NOW()
+    );
+"""
+
+ARTIST_RELATED_DDL = """
+    CREATE TABLE IF NOT EXISTS artist_related (
+        artist_id INTEGER PRIMARY KEY REFERENCES artists (id) ON DELETE CASCADE,
+        related_ids INTEGER[] NOT NULL,
+        weights REAL[] NOT NULL,
+        built_at TIMESTAMP NOT NULL DEFAULT NOW()
+    );
+"""
+
+def similar_album_ids(conn, album_id: int, limit: int = NEIGHBORS_K) -> Optional[List[int]]:
+    """Up to `limit` neighbour ids, best first; None if the album has none built."""
+    c = conn.cursor()
+    c.execute("SELECT neighbor_ids[1:%s] FROM album_neighbors WHERE album_id = %s", (limit, album_id))
+    row = c.fetchone()
+    conn.commit()
+    return row[0] if row else None
+
+def related_artists(conn, artist_id: int, limit: int = RELATED_K) -> List[Dict[str, Any]]:
+    """The artist's related artists, strongest first, with their weight."""
+    c = conn.cursor(cursor_factory=RealDictCursor)
+    c.execute("""
+        SELECT ar.id, ar.name, ar.image_path, ar.location, r.weight
+        FROM artist_related rel
+        CROSS JOIN unnest(rel.related_ids, rel.weights) WITH ORDINALITY AS r(artist_id, weight, position)
+        JOIN artists ar ON ar.id = r.artist_id
+        WHERE rel.artist_id = %s
+        ORDER BY r.position
+        LIMIT %s
+    """, (artist_id, limit))
+    rows = c.fetchall()
+    conn.commit()
+    return rows
@@ -0,0 +1,134 @@
+import math
+import os
+from typing import Dict, List, Optional, Tuple
+
+# Trending albums: like counts with exponential time decay.
+#
+# An album's trending score is the sum over its likes of
+# 2 ** -(age / TRENDING_HALF_LIFE_HOURS), so a like counts 1 when it is made
+# and half as much every half-life after. Decaying every row continuously
+# would mean rewriting the table all the time, so scores are kept relative to
+# a landmark time instead (forward decay): a like made at t adds
+# exp(rate * (t - landmark)), and the score now is the stored sum times
+# exp(-rate * (now - landmark)). That factor is the same for every album, so
+# ordering by the stored score is ordering by the decayed one and the index on
+# it serves the top-N directly.
+#
+# POST /api/likes adds (or, for an unlike, subtracts) the like's term in the
+# same transaction. An unlike only updates an existing row: one compacted away
+# already decayed below MIN_TRENDING_SCORE, and recreating it would list the
+# album at zero. scripts/compact_trending.py periodically moves the
+# landmark to now, rescaling every score so the stored numbers stay small, and
+# drops albums whose score decayed below MIN_TRENDING_SCORE. Likes take a
+# shared advisory lock and compaction an exclusive one, so no like is applied
+# against a landmark that is being moved.
+
+TRENDING_HALF_LIFE_HOURS = float(os.environ.get("TRENDING_HALF_LIFE_HOURS", "72"))
+DECAY_RATE = math.log(2) / (TRENDING_HALF_LIFE_HOURS * 3600)   # per second
+MIN_TRENDING_SCORE = 0.05
+TRENDING_LOCK_NAMESPACE = 3603
+
+TRENDING_DDL = """
+    CREATE TABLE IF NOT EXISTS album_trending (
+        album_id INTEGER PRIMARY KEY REFERENCES albums (id) ON DELETE CASCADE,
+        score DOUBLE PRECISION NOT NULL,
+        updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+    );
+    CREATE INDEX IF NOT EXISTS idx_album_trending_score ON album_trending (score DESC);
+
+    CREATE TABLE IF NOT EXISTS trending_landmark (
+        id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+        landmark TIMESTAMP NOT NULL
+    );
+    INSERT INTO trending_landmark (landmark) VALUES (NOW()) ON CONFLICT DO NOTHING;
+"""
+
+def record_like(c, album_id: int, liked_at, liked: bool):
+    """Add (liked) or remove (unliked) the term of a like made at `liked_at`.
+    The caller commits. `c` is a RealDictCursor."""
+    c.execute("SELECT pg_advisory_xact_lock_shared(%s, 0)", (TRENDING_LOCK_NAMESPACE,))
+    c.execute("SELECT landmark FROM trending_landmark")
+    row = c.fetchone()
+    if row is None:
+        raise RuntimeError("trending_landmark is empty; run scripts/add_trending_tables.py")
+    value = math.exp(DECAY_RATE * (liked_at - row['landmark']).total_seconds())
+    if liked:
+        c.execute("""
+            INSERT INTO album_trending (album_id, score) VALUES (%s, %s)
+            ON CONFLICT (album_id) DO UPDATE SET
+                score = album_trending.score + EXCLUDED.score,
+                updated_at = NOW()
+        """, (album_id, value))
+    else:
+        c.execute("""
+            UPDATE album_trending SET score = GREATEST(score - %s, 0), updated_at = NOW()
+            WHERE album_id = %s
+        """, (value, album_id))
+
+def trending_albums(c, genre: Optional[str], limit: int, offset: int = 0) -> List[Tuple[int, float]]:
+    """[(album_id, decayed score)] best first, optionally only albums tagged with
+    `genre`. `c` is a RealDictCursor."""
+    genre_join = ""
+    genre_params: tuple = ()
+    if genre:
+        genre_join = """
+            JOIN album_genres ag ON ag.album_id = t.album_id
+            JOIN genres g ON g.id = ag.genre_id AND g.name = %s
+        """
+        genre_params = (genre,)
+    c.execute(f"""
+        SELECT t.album_id, t.score * EXP(-%s * EXTRACT(EPOCH FROM (NOW() - l.landmark))) AS score
+        FROM album_trending t
+        CROSS JOIN trending_landmark l
+        {genre_join}
+        WHERE t.score >= %s * EXP(%s * EXTRACT(EPOCH FROM (NOW() - l.landmark)))
+        ORDER BY t.score DESC
+        LIMIT %s OFFSET %s
+    """, (DECAY_RATE, *genre_params, MIN_TRENDING_SCORE, DECAY_RATE, limit, offset))
+    return [(row['album_id'], row['score']) for row in c.fetchall()]
+
+def trending_boosts(c, top_n: int = 500) -> Dict[int, float]:
+    """{album_id: score / best score} for the top trending albums, for the home
+    ranking. `c` is a RealDictCursor."""
+    trending = trending_albums(c, None, top_n)
+    if not trending:
+        return {}
+    best = trending[0][1]
+    return {album_id: score / best for album_id, score in trending}
+
+def compact_trending(conn) -> Tuple[int, int]:
+    """Move the landmark to now and drop decayed albums. Returns (kept, dropped). Commits."""
+    c = conn.cursor()
+    c.execute("SELECT pg_advisory_xact_lock(%s, 0)", (TRENDING_LOCK_NAMESPACE,))
+    c.execute("""
+        UPDATE album_trending t
+        SET score = t.score * EXP(-%s * EXTRACT(EPOCH FROM (NOW() - l.landmark)))
+        FROM trending_landmark l
+    """, (DECAY_RATE,))
+    c.execute("DELETE FROM album_trending WHERE score < %s", (MIN_TRENDING_SCORE,))
+    dropped = c.rowcount
+    c.execute("UPDATE trending_landmark SET landmark = NOW()")
+    c.execute("SELECT COUNT(*) FROM album_trending")
+    kept = c.fetchone()[0]
+    conn.commit()
+    return kept, dropped
+
+def rebuild_trending(conn) -> int:
+    """Recompute every score from likes recent enough to still count. Commits."""
+    # A like older than this weighs less than MIN_TRENDING_SCORE on its own
+    horizon_hours = TRENDING_HALF_LIFE_HOURS * math.log2(1 / MIN_TRENDING_SCORE)
+    c = conn.cursor()
+    c.execute("SELECT pg_advisory_xact_lock(%s, 0)", (TRENDING_LOCK_NAMESPACE,))
+    c.execute("UPDATE trending_landmark SET landmark = NOW()")
+    c.execute("DELETE FROM album_trending")
+    c.execute("""
+        INSERT INTO album_trending (album_id, score)
+        SELECT l.album_id, SUM(EXP(%s * EXTRACT(EPOCH FROM (l.created_at - NOW()))))
+        FROM likes l
+        WHERE l.created_at > NOW() - %s * INTERVAL '1 hour'
+        GROUP BY l.album_id
+        HAVING SUM(EXP(%s * EXTRACT(EPOCH FROM (l.created_at - NOW())))) >= %s
+    """, (DECAY_RATE, horizon_hours, DECAY_RATE, MIN_TRENDING_SCORE))
+    rebuilt = c.rowcount
+    conn.commit()
+    return rebuilt
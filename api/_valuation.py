@@ -0,0 +1,285 @@
+import asyncio
+import os
+import time
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+from psycopg2.extras import RealDictCursor, execute_values
+
+# Collection valuation.
+#
+# discogs_prices caches one market value per release (the VG+ price suggestion,
+# falling back to the lowest listing). collection_values keeps a running total
+# per user that is adjusted in the same transaction as every collection add or
+# remove, and by the difference whenever a cached price changes, so reading a
+# collection's value never sums over its items.
+#
+# Adding an item inserts an empty discogs_prices row for it, which doubles as
+# the refresh queue: rows with no fetched_at (or an old one) are refreshed in
+# rate-limited batches by scripts/refresh_prices.py (cron), and a user's own
+# ones for up to REQUEST_BUDGET_SECONDS whenever their collection value is
+# read. The API is a serverless function frozen after each response, so that
+# happens inside the request, not on a thread; the client polls while
+# `refreshing`. A failed lookup leaves fetched_at alone and sets failed_at, so
+# the release is retried FAILED_RETRY_MINUTES later rather than a whole
+# PRICE_TTL_DAYS.
+#
+# Every Discogs request takes a slot from the 'discogs' row of
+# scrape_rate_limits (as the artist scraper does for RYM), so the API workers
+# and scripts/refresh_prices.py share one request budget between them.
+#
+# Locking: collection writes read prices FOR SHARE and refreshes lock them FOR
+# UPDATE (both in discogs_id order), so a price can't change between an item
+# being counted at its old value and the refresh applying its delta.
+
+VALUATION_CURRENCY = os.environ.get("DISCOGS_CURRENCY", "USD")
+SUGGESTION_CONDITION = "Very Good Plus (VG+)"
+PRICE_TTL_DAYS = 7
+FAILED_RETRY_MINUTES = 30
+REFRESH_BATCH_SIZE = 25
+REQUEST_BUDGET_SECONDS = 5.0
+REQUEST_INTERVAL = 1.1     # two requests per release, under Discogs' 60/min
+RATE_LIMIT_NAME = "discogs"
+VALUE_LOCK_NAMESPACE = 3601
+
+# A price (alias p) is due for a refresh when it is missing or old, unless its last lookup failed recently
+STALE_PRICE_CONDITION = f"""
+    (p.fetched_at IS NULL OR p.fetched_at < NOW() - {PRICE_TTL_DAYS:d} * INTERVAL '1 day')
+    AND (p.failed_at IS NULL OR p.failed_at < NOW() - {FAILED_RETRY_MINUTES:d} * INTERVAL '1 minute')
+"""
+
+def wait_for_request_slot(get_connection: Callable):
+    """Reserve the next free Discogs request slot and sleep until it starts."""
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("""
+            INSERT INTO scrape_rate_limits AS r (name, next_slot)
+            VALUES (%s, clock_timestamp() + make_interval(secs => %s))
+            ON CONFLICT (name) DO UPDATE
+            SET next_slot = GREATEST(r.next_slot, clock_timestamp()) + make_interval(secs => %s)
+            RETURNING EXTRACT(EPOCH FROM (next_slot - make_interval(secs => %s) - clock_timestamp()))
+        """, (RATE_LIMIT_NAME, REQUEST_INTERVAL, REQUEST_INTERVAL, REQUEST_INTERVAL))
+        delay = float(c.fetchone()[0])
+        conn.commit()
+    if delay > 0:
+        time.sleep(delay)
+
+def _lock_user_value(c, user_id: int):
+    c.execute("SELECT pg_advisory_xact_lock(%s, %s)", (VALUE_LOCK_NAMESPACE, user_id))
+
+def adjust_collection_value(c, user_id: int, discogs_ids: List[Optional[int]], sign: int):
+    """Add (sign=1) or subtract (sign=-1) items from the user's running total.
+    Must run in the transaction that inserts or deletes the collection rows."""
+    if not discogs_ids:
+        return
+    price_ids = sorted({i for i in discogs_ids if i is not None})
+    _lock_user_value(c, user_id)
+
+    total, priced = Decimal(0), 0
+    if price_ids:
+        if sign > 0:
+            # Queue unseen releases for a price refresh
+            execute_values(c, "INSERT INTO discogs_prices (discogs_id) VALUES %s ON CONFLICT DO NOTHING",
+                           [(i,) for i in price_ids])
+        c.execute("""
+            SELECT COALESCE(SUM(value), 0), COUNT(value) FROM (
+                SELECT value FROM discogs_prices
+                WHERE discogs_id = ANY(%s)
+                ORDER BY discogs_id
+                FOR SHARE
+            ) p
+        """, (price_ids,))
+        total, priced = c.fetchone()
+
+    c.execute("""
+        UPDATE collection_values
+        SET total = total + %s, priced_items = priced_items + %s,
+            item_count = item_count + %s, updated_at = NOW()
+        WHERE user_id = %s
+    """, (sign * total, sign * priced, sign * len(discogs_ids), user_id))
+
+def rebuild_collection_value(c, user_id: int):
+    """Compute the user's total from scratch (first read, or to repair drift)."""
+    _lock_user_value(c, user_id)
+    c.execute("""
+        INSERT INTO discogs_prices (discogs_id)
+        SELECT DISTINCT discogs_id FROM collection_items
+        WHERE user_id = %s AND discogs_id IS NOT NULL
+        ON CONFLICT DO NOTHING
+    """, (user_id,))
+    c.execute("""
+        SELECT 1 FROM discogs_prices
+        WHERE discogs_id IN (SELECT discogs_id FROM collection_items WHERE user_id = %s)
+        ORDER BY discogs_id
+        FOR SHARE
+    """, (user_id,))
+    c.execute("""
+        INSERT INTO collection_values (user_id, total, priced_items, item_count, currency, updated_at)
+        SELECT %s, COALESCE(SUM(p.value), 0), COUNT(p.value), COUNT(*), %s, NOW()
+        FROM collection_items ci
+        LEFT JOIN discogs_prices p ON p.discogs_id = ci.discogs_id
+        WHERE ci.user_id = %s
+        ON CONFLICT (user_id) DO UPDATE
+        SET total = EXCLUDED.total, priced_items = EXCLUDED.priced_items,
+            item_count = EXCLUDED.item_count, updated_at = NOW()
+    """, (user_id, VALUATION_CURRENCY, user_id))
+
+def get_collection_value(conn, user_id: int) -> Dict[str, Any]:
+    c = conn.cursor(cursor_factory=RealDictCursor)
+    query = f"""
+        SELECT cv.total, cv.priced_items, cv.item_count, cv.currency, cv.updated_at,
+            EXISTS (
+                SELECT 1 FROM collection_items ci
+                JOIN discogs_prices p ON p.discogs_id = ci.discogs_id
+                WHERE ci.user_id = cv.user_id AND {STALE_PRICE_CONDITION}
+            ) AS stale
+        FROM collection_values cv WHERE cv.user_id = %s
+    """
+    c.execute(query, (user_id,))
+    value = c.fetchone()
+    if value is None:
+        rebuild_collection_value(c, user_id)
+        conn.commit()
+        c.execute(query, (user_id,))
+        value = c.fetchone()
+    value['total'] = float(value['total'])
+    return value
+
+def _call(wait: Callable, coro_factory):
+    wait()
+    return asyncio.run(coro_factory())
+
+def fetch_release_price(client, discogs_id: int, wait: Callable) -> Dict[str, Any]:
+    """Look up one release, calling `wait` before each request.
+    Returns the discogs_prices columns to store."""
+    price = {'discogs_id': discogs_id, 'suggested_price': None, 'lowest_price': None,
+             'num_for_sale': None, 'error': None}
+    try:
+        stats = _call(wait, lambda: client.get_marketplace_stats(discogs_id, VALUATION_CURRENCY))
+        if 'error' in stats:
+            raise RuntimeError(stats['error'])
+        lowest = stats.get('lowest_price') or {}
+        if lowest.get('value') is not None and lowest.get('currency') == VALUATION_CURRENCY:
+            price['lowest_price'] = Decimal(str(lowest['value']))
+        price['num_for_sale'] = stats.get('num_for_sale')
+    except (httpx.HTTPError, RuntimeError) as e:
+        price['error'] = str(e)
+        return price
+
+    try:
+        suggestions = _call(wait, lambda: client.get_price_suggestions(discogs_id))
+        suggestion = suggestions.get(SUGGESTION_CONDITION) or {}
+        if suggestion.get('value') is not None and suggestion.get('currency') == VALUATION_CURRENCY:
+            price['suggested_price'] = Decimal(str(suggestion['value'])).quantize(Decimal('0.01'))
+    except httpx.HTTPError:
+        # No seller settings on the token's account: the lowest listing will do
+        pass
+    return price
+
+def save_prices(conn, prices: List[Dict[str, Any]]):
+    """Store fetched prices and move every owner's running total by the change."""
+    if not prices:
+        return
+    prices = sorted(prices, key=lambda p: p['discogs_id'])
+    ids = [p['discogs_id'] for p in prices]
+    c = conn.cursor()
+    try:
+        c.execute("""
+            SELECT discogs_id, value FROM discogs_prices
+            WHERE discogs_id = ANY(%s)
+            ORDER BY discogs_id
+            FOR UPDATE
+        """, (ids,))
+        old_values = dict(c.fetchall())
+
+        rows, failures, deltas = [], [], []
+        for p in prices:
+            if p['error']:
+                # Keep serving the last good price, and retry soon rather than after the TTL
+                failures.append((p['discogs_id'], p['error']))
+                continue
+            new_value = p['suggested_price'] if p['suggested_price'] is not None else p['lowest_price']
+            rows.append((p['discogs_id'], new_value, p['suggested_price'], p['lowest_price'],
+                         p['num_for_sale'], VALUATION_CURRENCY))
+            old_value = old_values.get(p['discogs_id'])
+            if new_value != old_value:
+                deltas.append((p['discogs_id'], (new_value or 0) - (old_value or 0),
+                               (new_value is not None) - (old_value is not None)))
+
+        if rows:
+            execute_values(c, """
+                INSERT INTO discogs_prices
+                (discogs_id, value, suggested_price, lowest_price, num_for_sale, currency, error, fetched_at, failed_at)
+                VALUES %s
+                ON CONFLICT (discogs_id) DO UPDATE SET
+                    value = EXCLUDED.value, suggested_price = EXCLUDED.suggested_price,
+                    lowest_price = EXCLUDED.lowest_price, num_for_sale = EXCLUDED.num_for_sale,
+                    currency = EXCLUDED.currency, error = NULL, fetched_at = NOW(), failed_at = NULL
+            """, rows, template="(%s, %s, %s, %s, %s, %s, NULL, NOW(), NULL)")
+        if failures:
+            execute_values(c, """
+                UPDATE discogs_prices p
+                SET error = v.error, failed_at = NOW()
+                FROM (VALUES %s) AS v(discogs_id, error)
+                WHERE p.discogs_id = v.discogs_id
+            """, failures)
+
+        if deltas:
+            execute_values(c, """
+                UPDATE collection_values cv
+                SET total = cv.total + d.delta, priced_items = cv.priced_items + d.priced, updated_at = NOW()
+                FROM (
+                    SELECT ci.user_id, SUM(v.delta) AS delta, SUM(v.priced) AS priced
+                    FROM collection_items ci
+                    JOIN (VALUES %s) AS v(discogs_id, delta, priced) ON ci.discogs_id = v.discogs_id
+                    GROUP BY ci.user_id
+                ) d
+                WHERE cv.user_id = d.user_id
+            """, deltas, template="(%s, %s::numeric, %s)")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def stale_price_ids(conn, user_id: Optional[int] = None, limit: int = REFRESH_BATCH_SIZE) -> List[int]:
+    """Releases in some collection (or the user's) whose price is missing or old."""
+    c = conn.cursor()
+    c.execute(f"""
+        SELECT p.discogs_id FROM discogs_prices p
+        WHERE {STALE_PRICE_CONDITION}
+          AND EXISTS (
+              SELECT 1 FROM collection_items ci
+              WHERE ci.discogs_id = p.discogs_id AND (%s IS NULL OR ci.user_id = %s)
+          )
+        ORDER BY p.fetched_at NULLS FIRST
+        LIMIT %s
+    """, (user_id, user_id, limit))
+    ids = [row[0] for row in c.fetchall()]
+    conn.commit()
+    return ids
+
+def refresh_prices(get_connection: Callable, client, user_id: Optional[int] = None, max_batches: Optional[int] = None,
+                   batch_size: int = REFRESH_BATCH_SIZE, deadline: Optional[float] = None) -> int:
+    """Refresh stale prices batch by batch, starting no batch after `deadline` (a
+    time.monotonic() value). Returns the number of releases refreshed."""
+    refreshed, batches = 0, 0
+    wait = lambda: wait_for_request_slot(get_connection)
+    while (max_batches is None or batches < max_batches) and (deadline is None or time.monotonic() < deadline):
+        with get_connection() as conn:
+            ids = stale_price_ids(conn, user_id, batch_size)
+        if not ids:
+            break
+        prices = [fetch_release_price(client, discogs_id, wait) for discogs_id in ids]
+        with get_connection() as conn:
+            save_prices(conn, prices)
+        refreshed += len(prices)
+        batches += 1
+    return refreshed
+
+def refresh_prices_in_request(user_id: int, get_connection: Callable, client,
+                              budget: float = REQUEST_BUDGET_SECONDS) -> int:
+    """Refresh the user's stale prices one release at a time for about `budget`
+    seconds. Returns the number of releases refreshed."""
+    return refresh_prices(get_connection, client, user_id, batch_size=1,
+                          deadline=time.monotonic() + budget)
@@ -1,17 +1,16 @@
 import sys
 import os
+import base64
 
-from fastapi import FastAPI, HTTPException, Header, Response, Cookie, Body
+from fastapi import FastAPI, HTTPException, Header, Request, Response, Cookie, Body
 from fastapi.middleware.cors import CORSMiddleware
 import psycopg2
 from psycopg2.extras import RealDictCursor
-import random
 import secrets
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
 import bcrypt
-from collections import Counter
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
 # Load .env.local manually if present (for local development)
 env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env.local')
@@ -27,9 +26,25 @@ if os.path.exists(env_path):
 # Add current directory to path to allow importing sibling modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from _discogs import DiscogsClient
+from _collection import COLLECTION_COLUMNS, upsert_collection_items
+from _jobs import advance_import_job, create_import_job, get_import_job
+from _valuation import adjust_collection_value, get_collection_value, refresh_prices_in_request
+from _session_cache import SessionCache, notify_session_change
+from _albums import format_album_images, hydrate_albums
+from _artist_pages import get_artist_page, rebuild_artist_pages
+from _http import cacheable_json, json_response
+from _catalog_db import check_catalog_db, get_catalog_db
+from _ranking import anonymous_ranking, precomputed_feed, rank_albums
+from _facets import get_facet_index
+from _minhash import update_user_signature
+from _trending import record_like, trending_albums
+from _similarity import NEIGHBORS_K, RELATED_K, related_artists, similar_album_ids
+from _db_router import (READ_YOUR_WRITES_SECONDS, STICKY_COOKIE, DatabaseRouter, prefer_primary,
+                        replica_settings_from_env)
 
 app = FastAPI(title="slowdive API")
 discogs_client = DiscogsClient()
+session_cache = SessionCache()
 
 # ... (keep existing endpoints)
 
@@ -56,17 +71,74 @@ async def get_discogs_release(release_id: int):
 async def get_discogs_master_versions(master_id: int, page: int = 1, per_page: int = 50):
     return await discogs_client.get_master_versions(master_id, page, per_page)
 
+class BulkCollectionImport(BaseModel):
+    items: List[CollectionItem]
+
+class BulkCollectionDelete(BaseModel):
+    ids: List[int] = []
+    discogs_ids: List[int] = []
+
+MAX_COLLECTION_PAGE = 200
+MAX_BULK_ITEMS = 1000
+
+def encode_cursor(key, item_id: int) -> str:
+    """Opaque keyset cursor for the (key, id) position of the last item on a page.
+    `key` is a timestamp (e.g. added_at) or an integer (e.g. rank)."""
+    key_text = key.isoformat() if isinstance(key, datetime) else str(key)
+    raw = f"{key_text}|{item_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str, key_type=datetime):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key_text, item_id = base64.urlsafe_b64decode(padded).decode('utf-8').split('|')
+        key = datetime.fromisoformat(key_text) if key_type is datetime else key_type(key_text)
+        return key, int(item_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @app.get("/api/collection")
-def get_collection(session_token: Optional[str] = Cookie(None)):
+def get_collection(
+    session_token: Optional[str] = Cookie(None),
+    limit: int = 50,
+    cursor: Optional[str] = None
+):
     user_id = get_user_from_session(session_token)
     if not user_id:
         raise HTTPException(status_code=401, detail="Not authenticated")
-        
+
+    limit = min(max(1, limit), MAX_COLLECTION_PAGE)
+    columns = "id, " + ", ".join(COLLECTION_COLUMNS) + ", added_at"
+
     with get_db_connection() as conn:
         c = conn.cursor(cursor_factory=RealDictCursor)
-        c.execute("SELECT * FROM collection_items WHERE user_id = %s ORDER BY added_at DESC", (user_id,))
-        items = c.fetchall()
-    return items
+        # Fetch one extra row to know whether another page follows
+        if cursor:
+            added_at, item_id = decode_cursor(cursor)
+            c.execute(f"""
+                SELECT {columns} FROM collection_items
+                WHERE user_id = %s AND (added_at, id) < (%s, %s)
+                ORDER BY added_at DESC, id DESC
+                LIMIT %s
+            """, (user_id, added_at, item_id, limit + 1))
+            items = c.fetchall()
+            total = None
+        else:
+            c.execute(f"""
+                SELECT {columns} FROM collection_items
+                WHERE user_id = %s
+                ORDER BY added_at DESC, id DESC
+                LIMIT %s
+            """, (user_id, limit + 1))
+            items = c.fetchall()
+            # Only the first page carries the total, later pages don't pay for the count
+            c.execute("SELECT COUNT(*) AS count FROM collection_items WHERE user_id = %s", (user_id,))
+            total = c.fetchone()['count']
+
+    has_more = len(items) > limit
+    items = items[:limit]
+    next_cursor = encode_cursor(items[-1]['added_at'], items[-1]['id']) if has_more else None
+    return {"items": items, "next_cursor": next_cursor, "total": total}
 
 @app.post("/api/collection")
 def add_to_collection(item: CollectionItem, session_token: Optional[str] = Cookie(None)):
@@ -77,34 +149,116 @@ def add_to_collection(item: CollectionItem, session_token: Optional[str] = Cooki
     try:
         with get_write_db_connection() as conn:
             c = conn.cursor()
-            
-            # Check if item already exists in user's collection
-            c.execute("""
-                SELECT id FROM collection_items 
-                WHERE user_id = %s AND discogs_id = %s
-            """, (user_id, item.discogs_id))
-            existing = c.fetchone()
-            
-            if existing:
-                raise HTTPException(status_code=400, detail="This item is already in your collection")
-            
             c.execute("""
                 INSERT INTO collection_items 
                 (user_id, discogs_id, master_id, title, artist, format, label, year, thumb_url, notes)
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (user_id, discogs_id) DO NOTHING
                 RETURNING id
             """, (
                 user_id, item.discogs_id, item.master_id, item.title, item.artist, 
                 item.format, item.label, item.year, item.thumb_url, item.notes
             ))
+            row = c.fetchone()
+            if row is None:
+                conn.rollback()
+                raise HTTPException(status_code=400, detail="This item is already in your collection")
+
+            adjust_collection_value(c, user_id, [item.discogs_id], 1)
             conn.commit()
-            new_id = c.fetchone()[0]
-            return {"id": new_id, "status": "added"}
+            return {"id": row[0], "status": "added"}
     except HTTPException as he:
         raise he
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/collection/bulk")
+def bulk_add_to_collection(payload: BulkCollectionImport, session_token: Optional[str] = Cookie(None)):
+    """Upsert many items in one statement (see _collection.upsert_collection_items)."""
+    user_id = get_user_from_session(session_token)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    if len(payload.items) > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_ITEMS} items per request")
+
+    try:
+        with get_write_db_connection() as conn:
+            c = conn.cursor()
+            counts = upsert_collection_items(c, user_id, (item.dict() for item in payload.items))
+            conn.commit()
+            return counts
+    except Exception as e:
+        print(f"ERROR: Bulk collection import failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/collection/bulk-delete")
+def bulk_remove_from_collection(payload: BulkCollectionDelete, session_token: Optional[str] = Cookie(None)):
+    """Remove items by collection id and/or Discogs release id in one statement."""
+    user_id = get_user_from_session(session_token)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    if len(payload.ids) + len(payload.discogs_ids) > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_ITEMS} items per request")
+    if not payload.ids and not payload.discogs_ids:
+        return {"removed": 0, "ids": []}
+
+    with get_write_db_connection() as conn:
+        c = conn.cursor()
+        c.execute("""
+            DELETE FROM collection_items
+            WHERE user_id = %s AND (id = ANY(%s) OR discogs_id = ANY(%s))
+            RETURNING id, discogs_id
+        """, (user_id, payload.ids, payload.discogs_ids))
+        removed = c.fetchall()
+        adjust_collection_value(c, user_id, [discogs_id for _, discogs_id in removed], -1)
+        conn.commit()
+    removed_ids = [item_id for item_id, _ in removed]
+    return {"removed": len(removed_ids), "ids": removed_ids}
+
+class DiscogsImportRequest(BaseModel):
+    username: str
+
+@app.post("/api/collection/import", status_code=202)
+def import_discogs_collection(payload: DiscogsImportRequest, session_token: Optional[str] = Cookie(None)):
+    """Start importing the user's Discogs collection. The first pages are imported
+    before answering; poll /api/collection/import/{job_id} to import the rest."""
+    user_id = get_user_from_session(session_token)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    username = payload.username.strip()
+    if not username:
+        raise HTTPException(status_code=400, detail="Discogs username is required")
+
+    try:
+        with get_write_db_connection() as conn:
+            job = create_import_job(conn, user_id, username)
+        if advance_import_job(job['id'], get_write_db_connection, discogs_client):
+            with get_write_db_connection() as conn:
+                job = get_import_job(conn, job['id'], user_id)
+        return job
+    except Exception as e:
+        print(f"ERROR: Could not start Discogs import: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/collection/import/{job_id}")
+def get_discogs_import(job_id: int, session_token: Optional[str] = Cookie(None)):
+    """Import the job's next pages (see _jobs) and report its progress."""
+    user_id = get_user_from_session(session_token)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    with get_db_connection() as conn:
+        job = get_import_job(conn, job_id, user_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+
+    # Nothing runs between requests, so each poll moves the import forward
+    if job['status'] in ('queued', 'running') and \
+            advance_import_job(job_id, get_write_db_connection, discogs_client):
+        with get_write_db_connection() as conn:
+            job = get_import_job(conn, job_id, user_id)
+    return job
+
 @app.delete("/api/collection/{item_id}")
 def remove_from_collection(item_id: int, session_token: Optional[str] = Cookie(None)):
     user_id = get_user_from_session(session_token)
@@ -113,10 +267,37 @@ def remove_from_collection(item_id: int, session_token: Optional[str] = Cookie(N
         
     with get_write_db_connection() as conn:
         c = conn.cursor()
-        c.execute("DELETE FROM collection_items WHERE id = %s AND user_id = %s", (item_id, user_id))
+        c.execute("DELETE FROM collection_items WHERE id = %s AND user_id = %s RETURNING discogs_id", (item_id, user_id))
+        adjust_collection_value(c, user_id, [row[0] for row in c.fetchall()], -1)
         conn.commit()
     return {"status": "removed"}
 
+@app.get("/api/collection/value")
+def get_collection_valuation(session_token: Optional[str] = Cookie(None)):
+    """Running total of the collection's market value. Some stale or missing prices
+    are refreshed before answering; `refreshing` tells the client to poll again."""
+    user_id = get_user_from_session(session_token)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    try:
+        with get_write_db_connection() as conn:
+            value = get_collection_value(conn, user_id)
+        if value['stale']:
+            # Nothing runs after the response (see _valuation), so refresh a few now
+            try:
+                if refresh_prices_in_request(user_id, get_write_db_connection, discogs_client):
+                    with get_write_db_connection() as conn:
+                        value = get_collection_value(conn, user_id)
+            except Exception as e:
+                print(f"ERROR: Price refresh for user {user_id} failed: {e}")
+    except Exception as e:
+        print(f"ERROR: Failed to load collection value: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    value['refreshing'] = value.pop('stale')
+    return value
+
 
 # Test endpoint to verify the function is working
 @app.get("/")
@@ -153,6 +334,26 @@ app.add_middleware(
     expose_headers=["set-cookie"],  # Expose Set-Cookie header
 )
 
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    """Send a client's reads to the primary for a few seconds after it writes."""
+    token = prefer_primary.set(STICKY_COOKIE in request.cookies)
+    try:
+        response = await call_next(request)
+    finally:
+        prefer_primary.reset(token)
+    wrote = request.method in ("POST", "PUT", "PATCH", "DELETE") and response.status_code < 400
+    if wrote and db_router is not None and db_router.replicas:
+        response.set_cookie(
+            key=STICKY_COOKIE,
+            value="1",
+            httponly=True,
+            secure=True,
+            max_age=READ_YOUR_WRITES_SECONDS,
+            samesite="none"
+        )
+    return response
+
 class Album(BaseModel):
     """Base album model with core album data."""
     id: int
@@ -168,6 +369,9 @@ class Album(BaseModel):
     apple_music_link: Optional[str]
     artist_name: str
     genres: List[str]
+    blurhash: Optional[str] = None
+    dominant_color: Optional[str] = None
+    image_variants: Optional[Dict[str, Dict[str, str]]] = None
 
 class AlbumResponse(Album):
     """
@@ -192,22 +396,15 @@ class UserSettings(BaseModel):
     valuation_mode: bool = False
     price_comparison_mode: bool = False
 
+def settings_with_defaults(settings: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return {**UserSettings().dict(), **(settings or {})}
+
 @app.get("/api/settings")
 def get_settings(session_token: Optional[str] = Cookie(None)):
-    user_id = get_user_from_session(session_token)
-    if not user_id:
+    session = load_session(session_token)
+    if not session:
         raise HTTPException(status_code=401, detail="Not authenticated")
-        
-    with get_db_connection() as conn:
-        c = conn.cursor(cursor_factory=RealDictCursor)
-        c.execute("SELECT settings FROM users WHERE id = %s", (user_id,))
-        result = c.fetchone()
-        
-    if not result or not result['settings']:
-        # Return defaults if no settings found
-        return UserSettings()
-        
-    return result['settings']
+    return session['settings']
 
 @app.put("/api/settings")
 def update_settings(settings: UserSettings, session_token: Optional[str] = Cookie(None)):
@@ -221,14 +418,45 @@ def update_settings(settings: UserSettings, session_token: Optional[str] = Cooki
     with get_write_db_connection() as conn:
         c = conn.cursor()
         c.execute("UPDATE users SET settings = %s WHERE id = %s", (settings_json, user_id))
+        notify_session_change(c, user_id)
         conn.commit()
-        
+
+    session_cache.update_settings(user_id, settings.dict())
     return settings
 
+@app.get("/api/me")
+def get_me(session_token: Optional[str] = Cookie(None)):
+    """Everything the client needs on load: user, settings and counts, in one request."""
+    session = load_session(session_token)
+    if not session:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    user_id = session['user_id']
+
+    with get_db_connection() as conn:
+        c = conn.cursor(cursor_factory=RealDictCursor)
+        c.execute("""
+            SELECT
+                u.like_count,
+                (SELECT COUNT(*) FROM collection_items WHERE user_id = u.id) AS collection_count
+            FROM users u WHERE u.id = %s
+        """, (user_id,))
+        counts = c.fetchone()
+
+    return {
+        "user": {"id": user_id, "username": session['username']},
+        "settings": session['settings'],
+        "like_count": counts['like_count'],
+        "collection_count": counts['collection_count'],
+    }
+
 @app.get("/api/search")
 def search(q: str):
     if not q:
         return {"artists": [], "albums": []}
+    
+    catalog_db = get_catalog_db()
+    if catalog_db is not None:
+        return catalog_db.search(q)
         
     query = f"%{q}%"
     
@@ -267,73 +495,49 @@ DB_PORT = os.environ.get("POSTGRES_PORT", "5432")
 
 print(f"DEBUG: Connecting to DB at {DB_HOST}:{DB_PORT} (User: {DB_USER}, DB: {DB_NAME})")
 
-from psycopg2 import pool
-
-# Global connection pool
-db_pool = None
+# Global connection router: primary pool plus optional read replicas (see _db_router)
+db_router = None
 
 def init_db_pool():
-    global db_pool
-    if db_pool is None:
+    global db_router
+    if db_router is None:
         try:
-            db_pool = pool.SimpleConnectionPool(
-                1,  # minconn
-                20, # maxconn
-                host=DB_HOST,
-                user=DB_USER,
-                password=DB_PASSWORD,
-                dbname=DB_NAME,
-                port=DB_PORT
-            )
-            print("Database connection pool created")
+            primary = dict(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, dbname=DB_NAME, port=DB_PORT)
+            replicas = replica_settings_from_env(primary)
+            db_router = DatabaseRouter(primary, replicas)
+            # Logouts and settings changes from other processes evict cached sessions
+            session_cache.listen(lambda: psycopg2.connect(**primary))
+            print(f"Database connection pool created ({len(replicas)} read replicas)")
         except Exception as e:
             print(f"Error creating connection pool: {e}")
             raise e
 
-class PooledConnection:
-    def __init__(self, pool, conn):
-        self.pool = pool
-        self.conn = conn
-        
-    def close(self):
-        if self.pool and self.conn:
-            self.pool.putconn(self.conn)
-            self.conn = None
-            
-    def commit(self):
-        self.conn.commit()
-        
-    def rollback(self):
-        self.conn.rollback()
-        
-    def cursor(self, *args, **kwargs):
-        return self.conn.cursor(*args, **kwargs)
-        
-    def __enter__(self):
-        return self
-        
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self.close()
-
 def get_db_connection():
-    global db_pool
-    if db_pool is None:
+    """Connection for reads: a healthy replica, unless this client wrote moments ago."""
+    if db_router is None:
         init_db_pool()
     
     try:
-        conn = db_pool.getconn()
-        return PooledConnection(db_pool, conn)
+        return db_router.connect_read()
     except Exception as e:
         print(f"ERROR: PostgreSQL connection failed: {e}")
         raise HTTPException(status_code=500, detail=f"Database connection failed: {str(e)}")
 
 def get_write_db_connection():
-    return get_db_connection()
+    """Connection to the primary, for writes and reads that must see them."""
+    if db_router is None:
+        init_db_pool()
+    
+    try:
+        return db_router.connect_primary()
+    except Exception as e:
+        print(f"ERROR: PostgreSQL connection failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Database connection failed: {str(e)}")
 
 # Initialize DB
 def init_db():
     try:
-        with get_db_connection() as conn:
+        with get_write_db_connection() as conn:
             c = conn.cursor()
             
             # Check if users table exists
@@ -348,7 +552,10 @@ def init_db():
                         slug TEXT,
                         bio TEXT,
                         image_path TEXT,
-                        location TEXT
+                        location TEXT,
+                        bio_attempts INTEGER NOT NULL DEFAULT 0,
+                        bio_next_attempt_at TIMESTAMP,
+                        bio_claimed_until TIMESTAMP
                     );
                 """)
                 c.execute("""
@@ -370,6 +577,11 @@ def init_db():
                         spotify_link TEXT,
                         youtube_link TEXT,
                         apple_music_link TEXT,
+                        content_hash TEXT,
+                        cover_hash TEXT,
+                        blurhash TEXT,
+                        dominant_color TEXT,
+                        cover_variants JSONB,
                         FOREIGN KEY (artist_id) REFERENCES artists (id)
                     );
                 """)
@@ -388,6 +600,7 @@ def init_db():
                         id SERIAL PRIMARY KEY,
                         username TEXT UNIQUE NOT NULL,
                         password_hash TEXT NOT NULL,
+                        like_count INTEGER NOT NULL DEFAULT 0,
                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                     );
                 """)
@@ -429,6 +642,8 @@ def init_db():
 
 # Run init on startup
 init_db()
+# A production deploy without the exported catalog still works, but slower: say so
+check_catalog_db()
 
 
 def create_session(user_id: int) -> str:
@@ -445,37 +660,67 @@ def create_session(user_id: int) -> str:
         conn.commit()
     return token
 
-def get_user_from_session(session_token: Optional[str]) -> Optional[int]:
-    """Get user_id from session token if valid."""
+SESSION_QUERY = """
+    SELECT s.user_id, s.expires_at, u.username, u.settings
+    FROM sessions s
+    JOIN users u ON u.id = s.user_id
+    WHERE s.token = %s
+"""
+
+def load_session(session_token: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Resolve a session token to its user, username and settings.
+
+    The session, user and settings come from one query and are kept in
+    session_cache, so most requests don't touch the database here.
+    """
     if not session_token:
         return None
-    
-    session = None
-    with get_db_connection() as conn:
-        c = conn.cursor(cursor_factory=RealDictCursor)
-        c.execute(
-            "SELECT user_id, expires_at FROM sessions WHERE token = %s",
-            (session_token,)
-        )
-        session = c.fetchone()
-    
-    if not session:
-        return None
-    
+
+    session = session_cache.get(session_token)
+    if session is None:
+        with get_db_connection() as conn:
+            c = conn.cursor(cursor_factory=RealDictCursor)
+            c.execute(SESSION_QUERY, (session_token,))
+            row = c.fetchone()
+
+        if not row or session_cache.changed_recently(row['user_id']):
+            # A session created moments ago may not have reached the replica yet,
+            # and one just logged out or changed elsewhere may not have left it
+            with get_write_db_connection() as conn:
+                c = conn.cursor(cursor_factory=RealDictCursor)
+                c.execute(SESSION_QUERY, (session_token,))
+                row = c.fetchone()
+
+        if not row:
+            return None
+
+        expires_at = row['expires_at'] # psycopg2 returns datetime object for TIMESTAMP
+        if isinstance(expires_at, str):
+            expires_at = datetime.fromisoformat(expires_at)
+        session = {
+            'user_id': row['user_id'],
+            'username': row['username'],
+            'settings': settings_with_defaults(row['settings']),
+            'expires_at': expires_at,
+        }
+        session_cache.put(session_token, session)
+
     # Check if session is expired
-    expires_at = session['expires_at'] # psycopg2 returns datetime object for TIMESTAMP
-    if isinstance(expires_at, str):
-        expires_at = datetime.fromisoformat(expires_at)
-        
-    if datetime.now() > expires_at:
+    if datetime.now() > session['expires_at']:
+        session_cache.invalidate(session_token)
         # Clean up expired session
         with get_write_db_connection() as conn:
             c = conn.cursor()
             c.execute("DELETE FROM sessions WHERE token = %s", (session_token,))
             conn.commit()
         return None
-    
-    return session['user_id']
+
+    return session
+
+def get_user_from_session(session_token: Optional[str]) -> Optional[int]:
+    """Get user_id from session token if valid."""
+    session = load_session(session_token)
+    return session['user_id'] if session else None
 
 @app.post("/api/auth/register")
 def register(user: UserRegister, response: Response):
@@ -553,9 +798,14 @@ def login(user: UserLogin, response: Response):
 def logout(response: Response, session_token: Optional[str] = Cookie(None)):
     """Logout user by deleting session."""
     if session_token:
+        session_cache.invalidate(session_token)
         with get_write_db_connection() as conn:
             c = conn.cursor()
-            c.execute("DELETE FROM sessions WHERE token = %s", (session_token,))
+            c.execute("DELETE FROM sessions WHERE token = %s RETURNING user_id", (session_token,))
+            row = c.fetchone()
+            if row:
+                # Other processes may still have the session cached
+                notify_session_change(c, row[0])
             conn.commit()
     
     # Clear cookie
@@ -589,11 +839,21 @@ def toggle_like(like: LikeRequest, session_token: Optional[str] = Cookie(None)):
             
             if existing:
                 c.execute("DELETE FROM likes WHERE user_id = %s AND album_id = %s", (user_id, like.album_id))
+                liked_at = existing['created_at']
                 status = "unliked"
             else:
-                c.execute("INSERT INTO likes (user_id, album_id) VALUES (%s, %s)", (user_id, like.album_id))
+                c.execute("INSERT INTO likes (user_id, album_id) VALUES (%s, %s) RETURNING created_at",
+                          (user_id, like.album_id))
+                liked_at = c.fetchone()['created_at']
                 status = "liked"
-                
+
+            # Keep the profile's like total without counting on every read
+            c.execute("UPDATE users SET like_count = like_count + %s WHERE id = %s",
+                      (-1 if existing else 1, user_id))
+            # And the user's MinHash signature for finding similar users
+            update_user_signature(c, user_id, like.album_id, liked=not existing)
+            # And the album's time-decayed trending score
+            record_like(c, like.album_id, liked_at, liked=not existing)
             conn.commit()
             print(f"DEBUG: Success. New status: {status}")
             return {"status": status}
@@ -603,71 +863,108 @@ def toggle_like(like: LikeRequest, session_token: Optional[str] = Cookie(None)):
         print(f"DEBUG: Exception: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/users/{user_id}/likes", response_model=List[Album])
-def get_user_likes(user_id: int):
-    """Get all albums liked by a specific user"""
+LIKES_PAGE_SIZE = 40
+MAX_LIKES_PAGE = 100
+# Albums without a chart rank sort last
+UNRANKED = 2147483647
+
+def load_albums(album_ids: List[int], user_id: Optional[int] = None):
+    """hydrate_albums, reading the catalog from the local SQLite copy when there is one.
+
+    Albums newer than the exported copy and the user's likes come from Postgres.
+    Returns (albums, missing_ids)."""
+    catalog_db = get_catalog_db()
+    if catalog_db is None:
+        with get_db_connection() as conn:
+            return hydrate_albums(conn, album_ids, user_id)
+
+    albums, missing = catalog_db.hydrate_albums(album_ids)
+    if not missing and not (user_id and albums):
+        return albums, missing
+
+    with get_db_connection() as conn:
+        if missing:
+            found, missing = hydrate_albums(conn, missing, user_id)
+            by_id = {album['id']: album for album in albums + found}
+            albums = [by_id[album_id] for album_id in dict.fromkeys(album_ids) if album_id in by_id]
+        if user_id and albums:
+            c = conn.cursor()
+            c.execute("SELECT album_id FROM likes WHERE user_id = %s AND album_id = ANY(%s)",
+                      (user_id, [album['id'] for album in albums]))
+            liked_ids = {row[0] for row in c.fetchall()}
+            for album in albums:
+                album['is_liked'] = album['id'] in liked_ids
+    return albums, missing
+
+@app.get("/api/users/{user_id}/likes")
+def get_user_likes(
+    user_id: int,
+    sort: str = "recent",
+    limit: int = LIKES_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None)
+):
+    """Albums liked by a user, newest like first (sort=recent) or by chart rank (sort=rank).
+
+    Keyset-paginated: pass back `next_cursor` for the next page. Only one page of
+    ids is read and hydrated per request, and `total` comes from users.like_count.
+    """
+    if sort not in ("recent", "rank"):
+        raise HTTPException(status_code=400, detail="sort must be 'recent' or 'rank'")
+    limit = min(max(1, limit), MAX_LIKES_PAGE)
+
     try:
         with get_db_connection() as conn:
             c = conn.cursor(cursor_factory=RealDictCursor)
-            
-            # Get liked album IDs
-            c.execute("SELECT album_id FROM likes WHERE user_id = %s", (user_id,))
-            liked_ids = c.fetchall()
-            liked_album_ids = {row['album_id'] for row in liked_ids}
-            
-            if not liked_album_ids:
-                return []
-            
-            # Get album details for liked albums
-            # Postgres requires explicit casting or safe handling for IN clause
-            # We can use tuple(liked_album_ids) directly with %s if we construct the string correctly
-            placeholders = ','.join(['%s'] * len(liked_album_ids))
-            
-            # Note: We need to pass the tuple of IDs twice because we use it in two queries? No, just once here.
-            
-            c.execute(f'''
-                SELECT a.*, ar.name as artist_name 
-                FROM albums a 
-                JOIN artists ar ON a.artist_id = ar.id
-                WHERE a.id IN ({placeholders})
-                ORDER BY a.rank ASC
-            ''', tuple(liked_album_ids))
-            albums_data = c.fetchall()
-            
-            # Get all genres for these albums
-            c.execute(f'''
-                SELECT ag.album_id, g.name 
-                FROM genres g 
-                JOIN album_genres ag ON g.id = ag.genre_id
-                WHERE ag.album_id IN ({placeholders})
-            ''', tuple(liked_album_ids))
-            all_genres = c.fetchall()
-            
-            album_genres_map = {}
-            for row in all_genres:
-                if row['album_id'] not in album_genres_map:
-                    album_genres_map[row['album_id']] = []
-                album_genres_map[row['album_id']].append(row['name'])
-            
-            results = []
-            for album in albums_data:
-                album_dict = dict(album)
-                aid = album['id']
-                
-                album_dict['genres'] = album_genres_map.get(aid, [])
-                album_dict['is_liked'] = True  # All albums in this list are liked
-                
-                img_path = album_dict['image_path']
-                if img_path and img_path.startswith('covers/'):
-                    img_path = img_path.replace('covers/', '')
-                album_dict['image_path'] = f"/covers/{img_path}" if img_path else None
-                
-                results.append(album_dict)
-                
-            return results
+
+            # Fetch one extra row to know whether another page follows
+            if sort == "recent":
+                key_sql = "l.created_at"
+                after = decode_cursor(cursor) if cursor else None
+            else:
+                key_sql = f"COALESCE(a.rank, {UNRANKED})"
+                after = decode_cursor(cursor, int) if cursor else None
+            order = "DESC" if sort == "recent" else "ASC"
+            comparison = "<" if sort == "recent" else ">"
+            keyset_sql = f"AND ({key_sql}, l.album_id) {comparison} (%s, %s)" if after else ""
+
+            c.execute(f"""
+                SELECT l.album_id, {key_sql} AS sort_key
+                FROM likes l
+                JOIN albums a ON a.id = l.album_id
+                WHERE l.user_id = %s
+                {keyset_sql}
+                ORDER BY {key_sql} {order}, l.album_id {order}
+                LIMIT %s
+            """, (user_id, *(after or ()), limit + 1))
+            rows = c.fetchall()
+
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+
+            c.execute("SELECT like_count FROM users WHERE id = %s", (user_id,))
+            user = c.fetchone()
+        albums, _ = load_albums([row['album_id'] for row in rows])
+    except HTTPException as he:
+        raise he
     except Exception as e:
+        print(f"ERROR: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    for album in albums:
+        album['is_liked'] = True  # All albums in this list are liked
+
+    last = rows[-1] if rows else None
+    return cacheable_json({
+        "albums": albums,
+        "next_cursor": encode_cursor(last['sort_key'], last['album_id']) if has_more else None,
+        "total": user['like_count'],
+        "sort": sort,
+    }, if_none_match, "private, max-age=0, must-revalidate")
+
 @app.get("/api/albums")
 def get_albums(
     session_token: Optional[str] = Cookie(None),
@@ -684,289 +981,189 @@ def get_albums(
         # Get user_id from session cookie
         user_id = get_user_from_session(session_token)
         
-        # Generate daily seed for consistent but refreshing recommendations
-        from datetime import date
-        today = date.today().isoformat()
-        daily_seed = hash(f"{user_id or 'anonymous'}_{today}") % (2**31)
-        rng = random.Random(daily_seed)
+        if not user_id:
+            # Everyone anonymous shares today's ranking: only the requested slice is loaded
+            album_ids = anonymous_ranking(get_write_db_connection, genre)
+            paginated_results, _ = load_albums(album_ids[offset:offset + limit])
+            return {
+                "albums": paginated_results,
+                "total": len(album_ids),
+                "limit": limit,
+                "offset": offset,
+                "has_more": offset + limit < len(album_ids)
+            }
+        
+        with get_db_connection() as conn:
+            # Serve the nightly precomputed feed when it covers the requested page
+            feed = None if genre else precomputed_feed(conn, user_id, date.today())
+        if feed:
+            album_ids, total = feed
+            if offset + limit <= len(album_ids) or len(album_ids) >= total:
+                paginated_results, _ = load_albums(album_ids[offset:offset + limit], user_id)
+                return {
+                    "albums": paginated_results,
+                    "total": total,
+                    "limit": limit,
+                    "offset": offset,
+                    "has_more": offset + limit < max(total, len(album_ids))
+                }
         
         with get_db_connection() as conn:
             c = conn.cursor(cursor_factory=RealDictCursor)
-            
-            # Get total count and albums data
-            if genre:
-                # Filter by genre
-                c.execute('''
-                    SELECT COUNT(DISTINCT a.id) as count 
-                    FROM albums a
-                    JOIN album_genres ag ON a.id = ag.album_id
-                    JOIN genres g ON ag.genre_id = g.id
-                    WHERE g.name = %s
-                ''', (genre,))
-                total_count = c.fetchone()['count']
-                
-                c.execute('''
-                    SELECT DISTINCT a.*, ar.name as artist_name 
-                    FROM albums a 
-                    JOIN artists ar ON a.artist_id = ar.id
-                    JOIN album_genres ag ON a.id = ag.album_id
-                    JOIN genres g ON ag.genre_id = g.id
-                    WHERE g.name = %s
-                ''', (genre,))
-                albums_data = c.fetchall()
-            else:
-                # No filter
-                c.execute('SELECT COUNT(*) as count FROM albums')
-                total_count = c.fetchone()['count']
-                
-                c.execute('''
-                    SELECT a.*, ar.name as artist_name 
-                    FROM albums a 
-                    JOIN artists ar ON a.artist_id = ar.id
-                ''')
-                albums_data = c.fetchall()
-            
-            # Get all genres
-            c.execute('''
-                SELECT ag.album_id, g.name 
-                FROM genres g 
-                JOIN album_genres ag ON g.id = ag.genre_id
-            ''')
-            all_genres = c.fetchall()
-            
-            album_genres_map = {}
-            for row in all_genres:
-                if row['album_id'] not in album_genres_map:
-                    album_genres_map[row['album_id']] = []
-                album_genres_map[row['album_id']].append(row['name'])
-
-            # Get user profile data
-            liked_album_ids = set()
-            liked_artist_ids = set()
-            user_genre_counts = Counter()
-            similar_user_likes = set()
-            
-            if user_id:
-                # Get user's likes
-                c.execute("SELECT album_id FROM likes WHERE user_id = %s", (user_id,))
-                likes = c.fetchall()
-                liked_album_ids = {row['album_id'] for row in likes}
-                
-                # Get liked artists
-                if liked_album_ids:
-                    placeholders = ','.join(['%s'] * len(liked_album_ids))
-                    c.execute(f'''
-                        SELECT DISTINCT artist_id FROM albums WHERE id IN ({placeholders})
-                    ''', tuple(liked_album_ids))
-                    liked_artists = c.fetchall()
-                    liked_artist_ids = {row['artist_id'] for row in liked_artists}
-                
-                # Build genre preference profile
-                for aid in liked_album_ids:
-                    if aid in album_genres_map:
-                        for g in album_genres_map[aid]:
-                            user_genre_counts[g] += 1
-                
-                # Collaborative filtering: find similar users
-                if liked_album_ids:
-                    # Find users who liked at least 2 of the same albums
-                    placeholders = ','.join(['%s'] * len(liked_album_ids))
-                    c.execute(f'''
-                        SELECT user_id, COUNT(*) as common_likes
-                        FROM likes
-                        WHERE album_id IN ({placeholders}) AND user_id != %s
-                        GROUP BY user_id
-                        HAVING COUNT(*) >= 2
-                        ORDER BY common_likes DESC
-                        LIMIT 10
-                    ''', (*tuple(liked_album_ids), user_id))
-                    similar_users = c.fetchall()
-                    
-                    # Get what similar users liked
-                    if similar_users:
-                        similar_user_ids = [row['user_id'] for row in similar_users]
-                        placeholders = ','.join(['%s'] * len(similar_user_ids))
-                        c.execute(f'''
-                            SELECT DISTINCT album_id FROM likes 
-                            WHERE user_id IN ({placeholders})
-                        ''', tuple(similar_user_ids))
-                        collab_likes = c.fetchall()
-                        similar_user_likes = {row['album_id'] for row in collab_likes}
-
-            # Calculate scores for all albums
-            results = []
-            for album in albums_data:
-                album_dict = dict(album)
-                aid = album['id']
-                
-                album_dict['genres'] = album_genres_map.get(aid, [])
-                album_dict['is_liked'] = aid in liked_album_ids
-                
-                img_path = album_dict['image_path']
-                if img_path and img_path.startswith('covers/'):
-                    img_path = img_path.replace('covers/', '')
-                album_dict['image_path'] = f"/covers/{img_path}" if img_path else None
-                
-                # === SCORING ALGORITHM ===
-                
-                # 1. BASE SCORE (30%): Quality and popularity
-                base_score = 0
-                # Rank score (lower rank = better)
-                rank_score = max(0, 1 - (album['rank'] / 10000.0))
-                # Rating score
-                rating_score = (album['rating'] or 3.0) / 5.0 if album['rating'] else 0.6
-                # Popularity score (normalized ratings count)
-                try:
-                    ratings_count = int(album['ratings_count'].replace(',', '')) if album['ratings_count'] else 0
-                    popularity_score = min(1.0, ratings_count / 50000.0)
-                except:
-                    popularity_score = 0
-                
-                base_score = (rank_score * 0.5 + rating_score * 0.3 + popularity_score * 0.2) * 30
-                
-                # 2. PERSONALIZATION SCORE (40%)
-                personalization_score = 0
-                if user_id:
-                    # Genre affinity
-                    genre_match = 0
-                    for g in album_dict['genres']:
-                        if g in user_genre_counts:
-                            genre_match += user_genre_counts[g]
-                    personalization_score += min(genre_match * 3, 20)  # Cap at 20
-                    
-                    # Artist affinity
-                    if album['artist_id'] in liked_artist_ids:
-                        personalization_score += 10
-                    
-                    # Collaborative filtering boost
-                    if aid in similar_user_likes and aid not in liked_album_ids:
-                        personalization_score += 8
-                    
-                    # Already liked albums get top priority
-                    if album_dict['is_liked']:
-                        personalization_score += 15
-                
-                # 3. EXPLORATION SCORE (20%): Controlled randomness for discovery
-                exploration_score = 0
-                if user_id:
-                    # Boost albums from genres user hasn't explored much
-                    unexplored_boost = 0
-                    for g in album_dict['genres']:
-                        if g not in user_genre_counts or user_genre_counts[g] < 2:
-                            unexplored_boost += 1
-                    exploration_score += min(unexplored_boost * 3, 10)
-                    
-                    # Add controlled randomness
-                    exploration_score += rng.uniform(0, 10)
-                else:
-                    # For anonymous users, more randomness
-                    exploration_score = rng.uniform(0, 20)
-                
-                # 4. DIVERSITY PENALTY (10%): Will be applied after initial sorting
-                # (Applied later to avoid clustering)
-                
-                # Combine scores
-                total_score = base_score + personalization_score + exploration_score
-                album_dict['_score'] = total_score
-                album_dict['_artist_id'] = album['artist_id']
-                album_dict['_release_year'] = album['release_date'][:4] if album['release_date'] else None
-                
-                results.append(album_dict)
-            
-            # Sort by score
-            results.sort(key=lambda x: x['_score'], reverse=True)
-            
-            # Apply diversity optimization: penalize albums that cluster by artist/genre
-            if not genre:  # Only apply diversity when not filtering by genre
-                seen_artists = Counter()
-                seen_genres = Counter()
-                
-                for i, album in enumerate(results):
-                    # Penalize if we've seen this artist too much in top results
-                    artist_penalty = seen_artists[album['_artist_id']] * 2
-                    
-                    # Penalize if genres are over-represented
-                    genre_penalty = sum(seen_genres[g] for g in album['genres']) * 0.5
-                    
-                    # Apply penalties
-                    diversity_penalty = (artist_penalty + genre_penalty) * 0.1
-                    album['_score'] -= diversity_penalty
-                    
-                    # Update counters
-                    seen_artists[album['_artist_id']] += 1
-                    for g in album['genres']:
-                        seen_genres[g] += 1
-                
-                # Re-sort after diversity adjustment
-                results.sort(key=lambda x: x['_score'], reverse=True)
-            
-            # Apply pagination
-            paginated_results = results[offset:offset + limit]
-            
-            # Clean up internal fields
-            for album in paginated_results:
-                album.pop('_score', None)
-                album.pop('_artist_id', None)
-                album.pop('_release_year', None)
-            
+            results = rank_albums(c, user_id, genre, date.today())
+
+        if feed:
+            # Past the end of the precomputed prefix: continue its order with the rest of the
+            # live ranking, so pages on either side of the boundary don't repeat or skip albums
+            album_ids, _ = feed
+            prefix = set(album_ids)
+            album_ids = album_ids + [album['id'] for album in results if album['id'] not in prefix]
+            paginated_results, _ = load_albums(album_ids[offset:offset + limit], user_id)
             return {
                 "albums": paginated_results,
-                "total": total_count,
+                "total": len(album_ids),
                 "limit": limit,
                 "offset": offset,
-                "has_more": offset + limit < len(results)
+                "has_more": offset + limit < len(album_ids)
             }
+
+        # Apply pagination
+        paginated_results = results[offset:offset + limit]
+        
+        return {
+            "albums": paginated_results,
+            "total": len(results),
+            "limit": limit,
+            "offset": offset,
+            "has_more": offset + limit < len(results)
+        }
     except Exception as e:
         print(f"ERROR: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/albums/{album_id}", response_model=Album)
-def get_album(album_id: int, user_id: Optional[int] = None):
+MAX_BATCH_ALBUMS = 200
+
+@app.get("/api/albums/batch")
+def get_albums_batch(ids: str, session_token: Optional[str] = Cookie(None)):
+    """Albums for a comma-separated id list, in the order requested, with unknown ids
+    listed under `missing`. Declared before /api/albums/{album_id} so 'batch' isn't
+    taken for an id."""
+    try:
+        album_ids = [int(part) for part in ids.split(',') if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+    if len(album_ids) > MAX_BATCH_ALBUMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_ALBUMS} ids per request")
+
+    user_id = get_user_from_session(session_token)
+    try:
+        albums, missing = load_albums(album_ids, user_id)
+        return {"albums": albums, "missing": missing}
+    except Exception as e:
+        print(f"ERROR: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/browse")
+def browse_albums(
+    session_token: Optional[str] = Cookie(None),
+    genres: Optional[str] = None,
+    genre_mode: str = "all",
+    primary_only: bool = False,
+    year_min: Optional[int] = None,
+    year_max: Optional[int] = None,
+    min_rating: Optional[float] = None,
+    min_ratings_count: Optional[int] = None,
+    artist_id: Optional[int] = None,
+    sort: str = "rank",
+    limit: int = 40,
+    offset: int = 0
+):
+    """Faceted browse: `genres` is a comma-separated list matched with `genre_mode`
+    all (AND) or any (OR). `facets` counts how many of the matches each genre and
+    decade would keep, for drilling down further."""
+    if genre_mode not in ("all", "any"):
+        raise HTTPException(status_code=400, detail="genre_mode must be 'all' or 'any'")
+    if sort not in ("rank", "rating", "year"):
+        raise HTTPException(status_code=400, detail="sort must be 'rank', 'rating' or 'year'")
+    limit = min(max(1, limit), 100)
+    offset = max(0, offset)
+    genre_names = [name.strip() for name in genres.split(',') if name.strip()] if genres else []
+
+    user_id = get_user_from_session(session_token)
+    try:
+        index = get_facet_index(get_db_connection)
+        result = index.query(genre_names, genre_mode, primary_only, year_min, year_max,
+                             min_rating, min_ratings_count, artist_id)
+        album_ids, total = index.page(result, sort, offset, limit)
+        albums, _ = load_albums(album_ids, user_id)
+        return {
+            "albums": albums,
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+            "has_more": offset + limit < total,
+            "facets": index.facet_counts(result, primary_only),
+        }
+    except Exception as e:
+        print(f"ERROR: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+MAX_TRENDING_PAGE = 100
+
+@app.get("/api/albums/trending")
+def get_trending_albums(
+    session_token: Optional[str] = Cookie(None),
+    genre: Optional[str] = None,
+    limit: int = 40,
+    offset: int = 0
+):
+    """Albums by time-decayed like count (see _trending), optionally within a genre.
+    Declared before /api/albums/{album_id} so 'trending' isn't taken for an id."""
+    limit = min(max(1, limit), MAX_TRENDING_PAGE)
+    offset = max(0, offset)
+    user_id = get_user_from_session(session_token)
     try:
         with get_db_connection() as conn:
             c = conn.cursor(cursor_factory=RealDictCursor)
-            
-            c.execute('''
-                SELECT a.*, ar.name as artist_name 
-                FROM albums a 
-                JOIN artists ar ON a.artist_id = ar.id
-                WHERE a.id = %s
-            ''', (album_id,))
-            album = c.fetchone()
-            
-            if album is None:
-                raise HTTPException(status_code=404, detail="Album not found")
-            
-            album_dict = dict(album)
-            
-            c.execute('''
-                SELECT g.name 
-                FROM genres g 
-                JOIN album_genres ag ON g.id = ag.genre_id 
-                WHERE ag.album_id = %s
-            ''', (album_id,))
-            genres = c.fetchall()
-            
-            album_dict['genres'] = [g['name'] for g in genres]
-            
-            album_dict['is_liked'] = False
-            if user_id:
-                c.execute("SELECT * FROM likes WHERE user_id = %s AND album_id = %s", (user_id, album_id))
-                like = c.fetchone()
-                if like:
-                    album_dict['is_liked'] = True
-
-            img_path = album_dict['image_path']
-            if img_path and img_path.startswith('covers/'):
-                img_path = img_path.replace('covers/', '')
-            album_dict['image_path'] = f"/covers/{img_path}" if img_path else None
-            
-            return album_dict
+            # One extra row says whether another page follows
+            trending = trending_albums(c, genre, limit + 1, offset)
+        has_more = len(trending) > limit
+        trending = trending[:limit]
+        albums, _ = load_albums([album_id for album_id, _ in trending], user_id)
+        scores = dict(trending)
+        for album in albums:
+            album['trending_score'] = round(scores[album['id']], 2)
+        return {"albums": albums, "limit": limit, "offset": offset, "has_more": has_more}
+    except Exception as e:
+        print(f"ERROR: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/albums/{album_id}", response_model=Album)
+def get_album(album_id: int, user_id: Optional[int] = None):
+    try:
+        albums, _ = load_albums([album_id], user_id)
+        if not albums:
+            raise HTTPException(status_code=404, detail="Album not found")
+        return albums[0]
     except HTTPException as he:
         raise he
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/albums/{album_id}/similar")
+def get_similar_albums(album_id: int, limit: int = NEIGHBORS_K, session_token: Optional[str] = Cookie(None)):
+    """The "more like this" list: neighbours precomputed by scripts/build_neighbors.py."""
+    limit = min(max(1, limit), NEIGHBORS_K)
+    user_id = get_user_from_session(session_token)
+    try:
+        with get_db_connection() as conn:
+            neighbor_ids = similar_album_ids(conn, album_id, limit)
+        albums, _ = load_albums(neighbor_ids or [], user_id)
+        return {"albums": albums}
+    except Exception as e:
+        print(f"ERROR: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 class Artist(BaseModel):
     id: int
     name: str
@@ -977,74 +1174,51 @@ class Artist(BaseModel):
     albums: List[Album] = []
 
 @app.get("/api/artists/{artist_id}", response_model=Artist)
-def get_artist(artist_id: int):
+def get_artist(artist_id: int, if_none_match: Optional[str] = Header(None)):
+    """Serve the artist page from the local catalog copy (see _catalog_db) or the
+    materialized page in Postgres (see _artist_pages), rebuilding it if it was invalidated."""
     try:
-        with get_db_connection() as conn:
-            c = conn.cursor(cursor_factory=RealDictCursor)
-            
-            # Get artist details
-            c.execute("SELECT * FROM artists WHERE id = %s", (artist_id,))
-            artist = c.fetchone()
-            
-            if not artist:
+        catalog_db = get_catalog_db()
+        page = None
+        if catalog_db is not None:
+            # Pages rebuilt since the export are newer in Postgres
+            changed = catalog_db.changed_artist_ids(get_db_connection)
+            if changed is not None and artist_id not in changed:
+                page = catalog_db.artist_page(artist_id)
+        if page is None:
+            with get_db_connection() as conn:
+                exists, page = get_artist_page(conn.cursor(), artist_id)
+            # Unknown ids are answered from the replica, without touching the primary
+            if not exists:
                 raise HTTPException(status_code=404, detail="Artist not found")
-                
-            artist_dict = dict(artist)
-            
-            # Get artist's albums (only ranked albums from Top 5000 chart)
-            c.execute('''
-                SELECT a.*, ar.name as artist_name 
-                FROM albums a 
-                JOIN artists ar ON a.artist_id = ar.id
-                WHERE a.artist_id = %s AND a.rank IS NOT NULL
-                ORDER BY a.release_date DESC
-            ''', (artist_id,))
-            albums = c.fetchall()
-            
-            # Get genres for these albums
-            if albums:
-                album_ids = tuple(a['id'] for a in albums)
-                placeholders = ','.join(['%s'] * len(album_ids))
-                c.execute(f'''
-                    SELECT ag.album_id, g.name 
-                    FROM genres g 
-                    JOIN album_genres ag ON g.id = ag.genre_id 
-                    WHERE ag.album_id IN ({placeholders})
-                ''', album_ids)
-                all_genres = c.fetchall()
-                
-                album_genres_map = {}
-                for row in all_genres:
-                    if row['album_id'] not in album_genres_map:
-                        album_genres_map[row['album_id']] = []
-                    album_genres_map[row['album_id']].append(row['name'])
-            else:
-                album_genres_map = {}
 
-            artist_albums = []
-            for album in albums:
-                alb_dict = dict(album)
-                alb_dict['genres'] = album_genres_map.get(alb_dict['id'], [])
-                
-                img_path = alb_dict['image_path']
-                if img_path and img_path.startswith('covers/'):
-                    img_path = img_path.replace('covers/', '')
-                alb_dict['image_path'] = f"/covers/{img_path}" if img_path else None
-                
-                # Add dummy fields required by Album model
-                alb_dict['artist_name'] = artist_dict['name']
-                
-                artist_albums.append(alb_dict)
-                
-            artist_dict['albums'] = artist_albums
-            
-            return artist_dict
+        if page is None:
+            with get_write_db_connection() as conn:
+                page = rebuild_artist_pages(conn, [artist_id], lock_timeout_ms=200).get(artist_id)
+            if page is None:
+                raise HTTPException(status_code=404, detail="Artist not found")
     except HTTPException as he:
         raise he
     except Exception as e:
         print(f"ERROR: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+    body, etag = page
+    return json_response(body, etag, if_none_match, "public, max-age=0, must-revalidate")
+
+@app.get("/api/artists/{artist_id}/related")
+def get_related_artists(artist_id: int, limit: int = RELATED_K, if_none_match: Optional[str] = Header(None)):
+    """Artists related by shared genres and co-likes, from the graph built by
+    scripts/build_related_artists.py."""
+    limit = min(max(1, limit), RELATED_K)
+    try:
+        with get_db_connection() as conn:
+            artists = related_artists(conn, artist_id, limit)
+    except Exception as e:
+        print(f"ERROR: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return cacheable_json({"artists": artists}, if_none_match, "public, max-age=0, must-revalidate")
+
 
 
 @app.get("/api/search")
@@ -1074,10 +1248,7 @@ async def search(q: str):
         processed_albums = []
         for album in albums:
             alb_dict = dict(album)
-            img_path = alb_dict['image_path']
-            if img_path and img_path.startswith('covers/'):
-                img_path = img_path.replace('covers/', '')
-            alb_dict['image_path'] = f"/covers/{img_path}" if img_path else None
+            format_album_images(alb_dict)
             processed_albums.append(alb_dict)
 
         conn.close()
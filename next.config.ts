@@ -12,6 +12,17 @@ const nextConfig: NextConfig = {
       },
     ],
   },
+  async headers() {
+    // Content-addressed covers never change under the same URL
+    return [
+      {
+        source: '/covers/:dir(store|variants)/:file*',
+        headers: [
+          { key: 'Cache-Control', value: 'public, max-age=31536000, immutable' },
+        ],
+      },
+    ];
+  },
   async rewrites() {
     // In development, proxy to local FastAPI server
     if (process.env.NODE_ENV === 'development') {
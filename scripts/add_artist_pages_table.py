@@ -0,0 +1,54 @@
+import os
+import sys
+import psycopg2
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+from _artist_pages import ARTIST_PAGES_DDL, rebuild_artist_pages
+
+def get_db_connection():
+    # Load .env.local manually
+    env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env.local')
+    if os.path.exists(env_path):
+        print(f"Loading environment from {env_path}")
+        with open(env_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    key, value = line.split('=', 1)
+                    if key not in os.environ:
+                        os.environ[key] = value.strip('"').strip("'")
+
+    return psycopg2.connect(
+        host=os.environ.get("POSTGRES_HOST"),
+        database=os.environ.get("POSTGRES_DATABASE"),
+        user=os.environ.get("POSTGRES_USER"),
+        password=os.environ.get("POSTGRES_PASSWORD"),
+        port=os.environ.get("POSTGRES_PORT", "5432")
+    )
+
+def migrate():
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+
+        print("Creating artist_pages table and invalidation triggers...")
+        cur.execute(ARTIST_PAGES_DDL)
+        conn.commit()
+
+        # Pages are also built lazily on first view; building them up front avoids a cold start
+        cur.execute("SELECT id FROM artists ORDER BY id")
+        artist_ids = [row[0] for row in cur.fetchall()]
+        for start in range(0, len(artist_ids), 500):
+            rebuild_artist_pages(conn, artist_ids[start:start + 500])
+            print(f"Built {min(start + 500, len(artist_ids))}/{len(artist_ids)} artist pages...")
+
+        cur.close()
+        conn.close()
+        print("Migration completed successfully.")
+
+    except Exception as e:
+        print(f"Error during migration: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,58 @@
+import os
+import sys
+import psycopg2
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+
+def get_db_connection():
+    # Load .env.local manually
+    env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env.local')
+    if os.path.exists(env_path):
+        print(f"Loading environment from {env_path}")
+        with open(env_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    key, value = line.split('=', 1)
+                    if key not in os.environ:
+                        os.environ[key] = value.strip('"').strip("'")
+
+    return psycopg2.connect(
+        host=os.environ.get("POSTGRES_HOST"),
+        database=os.environ.get("POSTGRES_DATABASE"),
+        user=os.environ.get("POSTGRES_USER"),
+        password=os.environ.get("POSTGRES_PASSWORD"),
+        port=os.environ.get("POSTGRES_PORT", "5432")
+    )
+
+def migrate():
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+
+        # Work-queue columns used by scripts/scrape_artists.py to lease artists and back off failures
+        print("Adding artist scrape queue columns...")
+        cur.execute("ALTER TABLE artists ADD COLUMN IF NOT EXISTS bio_attempts INTEGER NOT NULL DEFAULT 0;")
+        cur.execute("ALTER TABLE artists ADD COLUMN IF NOT EXISTS bio_next_attempt_at TIMESTAMP;")
+        cur.execute("ALTER TABLE artists ADD COLUMN IF NOT EXISTS bio_claimed_until TIMESTAMP;")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_artists_bio_pending ON artists(id) WHERE bio IS NULL;")
+
+        print("Creating scrape_rate_limits table...")
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS scrape_rate_limits (
+                name TEXT PRIMARY KEY,
+                next_slot TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            );
+        """)
+
+        conn.commit()
+        cur.close()
+        conn.close()
+        print("Migration completed successfully.")
+
+    except Exception as e:
+        print(f"Error during migration: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,78 @@
+import os
+import sys
+import psycopg2
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+
+def get_db_connection():
+    # Load .env.local manually
+    env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env.local')
+    if os.path.exists(env_path):
+        print(f"Loading environment from {env_path}")
+        with open(env_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    key, value = line.split('=', 1)
+                    if key not in os.environ:
+                        os.environ[key] = value.strip('"').strip("'")
+
+    return psycopg2.connect(
+        host=os.environ.get("POSTGRES_HOST"),
+        database=os.environ.get("POSTGRES_DATABASE"),
+        user=os.environ.get("POSTGRES_USER"),
+        password=os.environ.get("POSTGRES_PASSWORD"),
+        port=os.environ.get("POSTGRES_PORT", "5432")
+    )
+
+def migrate():
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+
+        # The old SELECT-then-INSERT check could race, so keep the oldest copy of each release
+        print("Removing duplicate collection items...")
+        cur.execute("""
+            DELETE FROM collection_items c
+            USING collection_items keep
+            WHERE c.user_id = keep.user_id
+              AND c.discogs_id = keep.discogs_id
+              AND c.id > keep.id;
+        """)
+        print(f"Removed {cur.rowcount} duplicates.")
+
+        # Keyset pagination compares (added_at, id), which needs added_at to be set
+        cur.execute("UPDATE collection_items SET added_at = CURRENT_TIMESTAMP WHERE added_at IS NULL;")
+        cur.execute("ALTER TABLE collection_items ALTER COLUMN added_at SET NOT NULL;")
+
+        cur.execute("""
+            SELECT 1 FROM pg_constraint WHERE conname = 'collection_items_user_discogs_key';
+        """)
+        if cur.fetchone():
+            print("Unique constraint already exists. Skipping.")
+        else:
+            print("Adding unique constraint on (user_id, discogs_id)...")
+            cur.execute("""
+                ALTER TABLE collection_items
+                ADD CONSTRAINT collection_items_user_discogs_key UNIQUE (user_id, discogs_id);
+            """)
+
+        print("Creating pagination index...")
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_collection_user_added
+            ON collection_items(user_id, added_at DESC, id DESC);
+        """)
+        # The unique constraint and the pagination index both lead with user_id
+        cur.execute("DROP INDEX IF EXISTS idx_collection_user;")
+
+        conn.commit()
+        cur.close()
+        conn.close()
+        print("Migration completed successfully.")
+
+    except Exception as e:
+        print(f"Error during migration: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,56 @@
+import os
+import sys
+import psycopg2
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+
+def get_db_connection():
+    # Load .env.local manually
+    env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env.local')
+    if os.path.exists(env_path):
+        print(f"Loading environment from {env_path}")
+        with open(env_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    key, value = line.split('=', 1)
+                    if key not in os.environ:
+                        os.environ[key] = value.strip('"').strip("'")
+
+    return psycopg2.connect(
+        host=os.environ.get("POSTGRES_HOST"),
+        database=os.environ.get("POSTGRES_DATABASE"),
+        user=os.environ.get("POSTGRES_USER"),
+        password=os.environ.get("POSTGRES_PASSWORD"),
+        port=os.environ.get("POSTGRES_PORT", "5432")
+    )
+
+def migrate():
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+
+        print("Creating cover_manifest table...")
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS cover_manifest (
+                album_id INTEGER PRIMARY KEY REFERENCES albums(id),
+                content_hash TEXT NOT NULL,
+                source_url TEXT,
+                etag TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_cover_manifest_source ON cover_manifest(source_url);")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_cover_manifest_hash ON cover_manifest(content_hash);")
+
+        conn.commit()
+        cur.close()
+        conn.close()
+        print("Migration completed successfully. Run scripts/cover_store.py migrate to move existing covers.")
+
+    except Exception as e:
+        print(f"Error during migration: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    migrate()
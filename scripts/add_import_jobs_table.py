@@ -0,0 +1,70 @@
+import os
+import sys
+import psycopg2
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+
+def get_db_connection():
+    # Load .env.local manually
+    env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env.local')
+    if os.path.exists(env_path):
+        print(f"Loading environment from {env_path}")
+        with open(env_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    key, value = line.split('=', 1)
+                    if key not in os.environ:
+                        os.environ[key] = value.strip('"').strip("'")
+
+    return psycopg2.connect(
+        host=os.environ.get("POSTGRES_HOST"),
+        database=os.environ.get("POSTGRES_DATABASE"),
+        user=os.environ.get("POSTGRES_USER"),
+        password=os.environ.get("POSTGRES_PASSWORD"),
+        port=os.environ.get("POSTGRES_PORT", "5432")
+    )
+
+def migrate():
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+
+        print("Creating import_jobs table...")
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS import_jobs (
+                id SERIAL PRIMARY KEY,
+                user_id INTEGER NOT NULL REFERENCES users(id),
+                discogs_username TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                next_page INTEGER NOT NULL DEFAULT 1,
+                total_pages INTEGER,
+                total_items INTEGER,
+                items_imported INTEGER NOT NULL DEFAULT 0,
+                items_added INTEGER NOT NULL DEFAULT 0,
+                items_updated INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                worker_token TEXT,
+                heartbeat_at TIMESTAMP,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                finished_at TIMESTAMP
+            );
+        """)
+        # At most one queued/running import per user
+        cur.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_import_jobs_active
+            ON import_jobs(user_id) WHERE status IN ('queued', 'running');
+        """)
+
+        conn.commit()
+        cur.close()
+        conn.close()
+        print("Migration completed successfully.")
+
+    except Exception as e:
+        print(f"Error during migration: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,72 @@
+import os
+import sys
+import psycopg2
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+
+def get_db_connection():
+    # Load .env.local manually
+    env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env.local')
+    if os.path.exists(env_path):
+        print(f"Loading environment from {env_path}")
+        with open(env_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    key, value = line.split('=', 1)
+                    if key not in os.environ:
+                        os.environ[key] = value.strip('"').strip("'")
+
+    return psycopg2.connect(
+        host=os.environ.get("POSTGRES_HOST"),
+        database=os.environ.get("POSTGRES_DATABASE"),
+        user=os.environ.get("POSTGRES_USER"),
+        password=os.environ.get("POSTGRES_PASSWORD"),
+        port=os.environ.get("POSTGRES_PORT", "5432")
+    )
+
+def migrate():
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+
+        print("Checking if 'like_count' column exists in 'users' table...")
+        cur.execute("""
+            SELECT column_name 
+            FROM information_schema.columns 
+            WHERE table_name='users' AND column_name='like_count';
+        """)
+
+        if cur.fetchone():
+            print("'like_count' column already exists. Skipping.")
+        else:
+            print("Adding 'like_count' column...")
+            cur.execute("ALTER TABLE users ADD COLUMN like_count INTEGER NOT NULL DEFAULT 0;")
+            cur.execute("""
+                UPDATE users u
+                SET like_count = l.count
+                FROM (SELECT user_id, COUNT(*) AS count FROM likes GROUP BY user_id) l
+                WHERE u.id = l.user_id;
+            """)
+            print(f"Backfilled like counts for {cur.rowcount} users.")
+
+        # The likes feed pages on (created_at, album_id)
+        cur.execute("UPDATE likes SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL;")
+        cur.execute("ALTER TABLE likes ALTER COLUMN created_at SET NOT NULL;")
+        print("Creating likes feed index...")
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_likes_user_created
+            ON likes(user_id, created_at DESC, album_id DESC);
+        """)
+
+        conn.commit()
+        cur.close()
+        conn.close()
+        print("Migration completed successfully.")
+
+    except Exception as e:
+        print(f"Error during migration: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    migrate()
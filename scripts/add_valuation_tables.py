@@ -0,0 +1,82 @@
+import os
+import sys
+import psycopg2
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+
+def get_db_connection():
+    # Load .env.local manually
+    env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env.local')
+    if os.path.exists(env_path):
+        print(f"Loading environment from {env_path}")
+        with open(env_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    key, value = line.split('=', 1)
+                    if key not in os.environ:
+                        os.environ[key] = value.strip('"').strip("'")
+
+    return psycopg2.connect(
+        host=os.environ.get("POSTGRES_HOST"),
+        database=os.environ.get("POSTGRES_DATABASE"),
+        user=os.environ.get("POSTGRES_USER"),
+        password=os.environ.get("POSTGRES_PASSWORD"),
+        port=os.environ.get("POSTGRES_PORT", "5432")
+    )
+
+def migrate():
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+
+        print("Creating discogs_prices table...")
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS discogs_prices (
+                discogs_id INTEGER PRIMARY KEY,
+                value NUMERIC(10, 2),
+                suggested_price NUMERIC(10, 2),
+                lowest_price NUMERIC(10, 2),
+                num_for_sale INTEGER,
+                currency TEXT,
+                error TEXT,
+                fetched_at TIMESTAMP,
+                failed_at TIMESTAMP
+            );
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_discogs_prices_fetched ON discogs_prices(fetched_at NULLS FIRST);")
+        # Failed lookups are retried after a short delay instead of the full TTL
+        cur.execute("ALTER TABLE discogs_prices ADD COLUMN IF NOT EXISTS failed_at TIMESTAMP;")
+        # Shared Discogs request budget (see api/_valuation.py)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS scrape_rate_limits (
+                name TEXT PRIMARY KEY,
+                next_slot TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            );
+        """)
+
+        print("Creating collection_values table...")
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS collection_values (
+                user_id INTEGER PRIMARY KEY REFERENCES users(id),
+                total NUMERIC(12, 2) NOT NULL DEFAULT 0,
+                priced_items INTEGER NOT NULL DEFAULT 0,
+                item_count INTEGER NOT NULL DEFAULT 0,
+                currency TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        # Price changes are pushed to every owner of the release
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_collection_discogs ON collection_items(discogs_id);")
+
+        conn.commit()
+        cur.close()
+        conn.close()
+        print("Migration completed successfully. Totals are built on first read; run scripts/refresh_prices.py to fetch prices.")
+
+    except Exception as e:
+        print(f"Error during migration: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,122 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Content-addressed store for raw HTML fetched by the scrapers.
+#
+# Layout:
+#   <root>/objects/ab/abcdef....html.zst   zstd-compressed page, named by sha256 of the HTML
+#   <root>/index.db                        SQLite index: one row per fetch (url, fetched_at, sha256)
+#
+# Identical pages fetched on different runs share one object file, so the
+# archive only grows when the content actually changes.
+
+ARCHIVE_DIR = "html_archive"
+
+
+class HtmlArchive:
+    def __init__(self, root=ARCHIVE_DIR):
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed. Run: pip install zstandard (or pass --no-archive)")
+
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+        # The fetch stage writes from several threads, so share one connection behind a lock
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(root, "index.db"), check_same_thread=False)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT NOT NULL,
+                fetched_at TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                key TEXT,
+                etag TEXT,
+                last_modified TEXT
+            )
+        """)
+        # Indexes created before conditional fetching lack the validator columns
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(pages)")}
+        for column in ("etag", "last_modified"):
+            if column not in columns:
+                self.db.execute(f"ALTER TABLE pages ADD COLUMN {column} TEXT")
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_pages_url ON pages(url, fetched_at)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_pages_kind ON pages(kind)")
+        self.db.commit()
+
+    def object_path(self, sha):
+        return object_path(self.root, sha)
+
+    def put(self, url, html, kind, key=None, etag=None, last_modified=None):
+        """Store a fetched page and record the fetch. Returns the content hash."""
+        data = html.encode('utf-8')
+        sha = hashlib.sha256(data).hexdigest()
+        path = self.object_path(sha)
+
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(zstandard.ZstdCompressor(level=10).compress(data))
+            os.replace(tmp_path, path)
+
+        self.record(url, sha, kind, key, etag, last_modified)
+        return sha
+
+    def record(self, url, sha, kind, key=None, etag=None, last_modified=None):
+        """Record a fetch of an object that is already stored (e.g. after a 304)."""
+        with self.lock:
+            self.db.execute(
+                "INSERT INTO pages (url, fetched_at, sha256, kind, key, etag, last_modified) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, datetime.now().isoformat(), sha, kind, None if key is None else str(key), etag, last_modified)
+            )
+            self.db.commit()
+
+    def validators(self, url):
+        """HTTP cache validators of the latest fetch of `url`, or None if it was never fetched."""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT sha256, etag, last_modified FROM pages WHERE url = ? ORDER BY fetched_at DESC LIMIT 1",
+                (url,)
+            ).fetchone()
+        if row is None or not (row[1] or row[2]):
+            return None
+        return {'sha256': row[0], 'etag': row[1], 'last_modified': row[2]}
+
+    def get(self, sha):
+        return read_object(self.root, sha)
+
+    def latest(self, kind):
+        """Most recent fetch of every URL of the given kind, as (url, key, sha256) rows."""
+        with self.lock:
+            return self.db.execute("""
+                SELECT p.url, p.key, p.sha256
+                FROM pages p
+                WHERE p.kind = ? AND p.fetched_at = (
+                    SELECT MAX(fetched_at) FROM pages WHERE url = p.url
+                )
+                ORDER BY p.url
+            """, (kind,)).fetchall()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+# Module-level readers so worker processes can load pages without opening the index
+
+def object_path(root, sha):
+    return os.path.join(root, "objects", sha[:2], f"{sha}.html.zst")
+
+def read_object(root, sha):
+    with open(object_path(root, sha), 'rb') as f:
+        return zstandard.ZstdDecompressor().decompress(f.read()).decode('utf-8')
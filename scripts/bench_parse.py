@@ -0,0 +1,68 @@
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from scraper import lxml_html, parse_page_bs4, parse_page_lxml
+
+# Compare the BeautifulSoup and lxml chart parsers over stored chart pages.
+# Usage: python scripts/bench_parse.py pages/*.html --repeat 5
+
+def load_pages(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '*.html'))))
+        else:
+            files.append(path)
+
+    pages = []
+    for path in files:
+        with open(path, 'r', encoding='utf-8') as f:
+            pages.append((path, f.read()))
+    return pages
+
+def time_parser(parse, pages, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _, html in pages:
+            parse(html)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chart page parsers.")
+    parser.add_argument("paths", nargs='+', help="HTML files or directories of .html files")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if lxml_html is None:
+        print("lxml is not installed. Run: pip install lxml")
+        return
+
+    pages = load_pages(args.paths)
+    if not pages:
+        print("No pages found.")
+        return
+
+    # Both backends must agree before the timings mean anything
+    mismatches = 0
+    for path, html in pages:
+        if parse_page_bs4(html) != parse_page_lxml(html):
+            mismatches += 1
+            print(f"Output differs for {path}")
+
+    bs4_time = time_parser(parse_page_bs4, pages, args.repeat)
+    lxml_time = time_parser(parse_page_lxml, pages, args.repeat)
+
+    print(f"Pages: {len(pages)} (mismatches: {mismatches})")
+    print(f"BeautifulSoup: {bs4_time * 1000 / len(pages):.2f} ms/page")
+    print(f"lxml:          {lxml_time * 1000 / len(pages):.2f} ms/page")
+    print(f"Speedup:       {bs4_time / lxml_time:.1f}x")
+
+if __name__ == "__main__":
+    main()
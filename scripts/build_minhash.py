@@ -0,0 +1,115 @@
+import argparse
+import io
+import os
+import sys
+
+import psycopg2
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+from _minhash import band_buckets, iter_signatures, pack
+
+# Backfill the MinHash signatures and LSH buckets of users who have none (see
+# api/_minhash.py). After that POST /api/likes keeps them current, so this only
+# needs to run once, or with --rebuild after changing the hash parameters.
+#
+# Likes are streamed in user order through a server-side cursor, so memory
+# stays flat however many there are. Without --rebuild, users who liked
+# something while the backfill ran keep the signature the API wrote for them.
+# --rebuild recomputes everyone in one transaction that blocks likes until it
+# commits.
+#
+# Usage: python scripts/build_minhash.py [--rebuild] [--batch-size 5000]
+
+def get_db_connection():
+    # Load .env.local manually
+    env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env.local')
+    if os.path.exists(env_path):
+        with open(env_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    key, value = line.split('=', 1)
+                    if key not in os.environ:
+                        os.environ[key] = value.strip('"').strip("'")
+
+    return psycopg2.connect(
+        host=os.environ.get("POSTGRES_HOST"),
+        database=os.environ.get("POSTGRES_DATABASE"),
+        user=os.environ.get("POSTGRES_USER"),
+        password=os.environ.get("POSTGRES_PASSWORD"),
+        port=os.environ.get("POSTGRES_PORT", "5432")
+    )
+
+def save_signatures(conn, signatures):
+    """Insert signatures and buckets for users that still have none. Returns how many were inserted."""
+    c = conn.cursor()
+    c.execute("CREATE TEMP TABLE IF NOT EXISTS minhash_stage (user_id INTEGER, signature BYTEA)")
+    c.execute("CREATE TEMP TABLE IF NOT EXISTS lsh_stage (band SMALLINT, bucket BIGINT, user_id INTEGER)")
+    c.execute("TRUNCATE minhash_stage, lsh_stage")
+
+    signature_buf, bucket_buf = io.StringIO(), io.StringIO()
+    for user_id, signature in signatures:
+        signature_buf.write(f"{user_id}\t\\\\x{pack(signature).hex()}\n")
+        for band, bucket in enumerate(band_buckets(signature)):
+            bucket_buf.write(f"{band}\t{bucket}\t{user_id}\n")
+    signature_buf.seek(0)
+    bucket_buf.seek(0)
+    c.copy_expert("COPY minhash_stage (user_id, signature) FROM STDIN", signature_buf)
+    c.copy_expert("COPY lsh_stage (band, bucket, user_id) FROM STDIN", bucket_buf)
+
+    c.execute("""
+        WITH inserted AS (
+            INSERT INTO user_minhash (user_id, signature)
+            SELECT s.user_id, s.signature FROM minhash_stage s
+            JOIN users u ON u.id = s.user_id
+            ON CONFLICT (user_id) DO NOTHING
+            RETURNING user_id
+        ), buckets AS (
+            INSERT INTO user_lsh_buckets (band, bucket, user_id)
+            SELECT b.band, b.bucket, b.user_id FROM lsh_stage b
+            JOIN inserted i ON i.user_id = b.user_id
+        )
+        SELECT COUNT(*) FROM inserted
+    """)
+    return c.fetchone()[0]
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill MinHash signatures and LSH buckets for users.")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute every user's signature")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Users per COPY")
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    if args.rebuild:
+        c = conn.cursor()
+        # Reads still work; likes wait until the new signatures are committed
+        c.execute("LOCK TABLE user_minhash, user_lsh_buckets IN EXCLUSIVE MODE")
+        c.execute("DELETE FROM user_lsh_buckets")
+        c.execute("DELETE FROM user_minhash")
+
+    # WITH HOLD keeps the cursor open across the per-batch commits
+    likes = conn.cursor(name="minhash_likes", withhold=True)
+    likes.itersize = 50000
+    likes.execute("SELECT user_id, album_id FROM likes ORDER BY user_id")
+
+    batch = []
+    seen = saved = 0
+    for user_id, signature in iter_signatures(likes):
+        batch.append((user_id, signature))
+        if len(batch) >= args.batch_size:
+            saved += save_signatures(conn, batch)
+            seen += len(batch)
+            batch = []
+            if not args.rebuild:
+                conn.commit()
+            print(f"Processed {seen} users...")
+    if batch:
+        saved += save_signatures(conn, batch)
+        seen += len(batch)
+    conn.commit()
+    likes.close()
+    conn.close()
+    print(f"Done. {saved} of {seen} users with likes got a signature.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import argparse
+import io
+import os
+import sys
+
+import numpy as np
+import psycopg2
+from scipy import sparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+from _similarity import CO_LIKE_WEIGHT, NEIGHBORS_K, PRIMARY_GENRE_WEIGHT
+
+# Build album_neighbors, the "more like this" lists served by
+# GET /api/albums/{id}/similar (run after each scrape, or nightly as likes
+# accumulate). See api/_similarity.py for the scoring.
+#
+# Albums are scored against the whole catalog a block of rows at a time, so
+# memory stays around SCORE_BLOCK_FLOATS floats however large the catalog is.
+# Likes are kept as a sparse users x items matrix: each user likes a handful
+# of albums, so a dense one would be almost all zeros.
+# The new lists replace the old ones in a single transaction.
+#
+# Usage: python scripts/build_neighbors.py [--k 24]
+
+SCORE_BLOCK_FLOATS = 1 << 24
+
+def get_db_connection():
+    # Load .env.local manually
+    env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env.local')
+    if os.path.exists(env_path):
+        with open(env_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    key, value = line.split('=', 1)
+                    if key not in os.environ:
+                        os.environ[key] = value.strip('"').strip("'")
+
+    return psycopg2.connect(
+        host=os.environ.get("POSTGRES_HOST"),
+        database=os.environ.get("POSTGRES_DATABASE"),
+        user=os.environ.get("POSTGRES_USER"),
+        password=os.environ.get("POSTGRES_PASSWORD"),
+        port=os.environ.get("POSTGRES_PORT", "5432")
+    )
+
+def genre_vectors(item_ids, tags):
+    """Unit-length TF-IDF genre vectors, one row per item.
+
+    `tags` is [(item_id, genre_id, weight)]; weights of repeated pairs add up."""
+    row_of = {item_id: i for i, item_id in enumerate(item_ids)}
+    genre_ids = sorted({genre_id for _, genre_id, _ in tags})
+    col_of = {genre_id: j for j, genre_id in enumerate(genre_ids)}
+
+    vectors = np.zeros((len(item_ids), len(genre_ids)), dtype=np.float32)
+    for item_id, genre_id, weight in tags:
+        row = row_of.get(item_id)
+        if row is not None:
+            vectors[row, col_of[genre_id]] += weight
+
+    # Smoothed IDF: a genre on every item still counts a little
+    document_frequency = np.count_nonzero(vectors, axis=0)
+    vectors *= (np.log((1 + len(item_ids)) / (1 + document_frequency)) + 1).astype(np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+def like_vectors(item_ids, likes):
+    """(vectors, liked_position): a sparse (CSC) users x liked-items matrix whose
+    column dot products are the co-like cosines, and each item's column in it
+    (-1 if nobody liked it).
+
+    `likes` is distinct (user_id, item_id) pairs. Only users with two or more
+    likes connect items, so only they get a row."""
+    row_of = {item_id: i for i, item_id in enumerate(item_ids)}
+    by_user = {}
+    for user_id, item_id in likes:
+        if item_id in row_of:
+            by_user.setdefault(user_id, []).append(row_of[item_id])
+    users = [rows for rows in by_user.values() if len(rows) > 1]
+
+    liked_position = np.full(len(item_ids), -1, dtype=np.int64)
+    liked_rows = sorted({row for rows in users for row in rows})
+    liked_position[liked_rows] = np.arange(len(liked_rows))
+
+    user_of_like = np.repeat(np.arange(len(users)), [len(rows) for rows in users])
+    column_of_like = liked_position[[row for rows in users for row in rows]]
+    # Every liked column has at least one like, so its norm is never zero
+    counts = np.bincount(column_of_like, minlength=len(liked_rows))
+    vectors = sparse.csc_matrix(
+        ((1 / np.sqrt(counts[column_of_like])).astype(np.float32), (user_of_like, column_of_like)),
+        shape=(len(users), len(liked_rows)),
+    )
+    return vectors, liked_position
+
+def similarity_rows(rows, genres, likes, liked_position, co_like_weight=CO_LIKE_WEIGHT):
+    """Blended similarity of the items at `rows` to every item (len(rows) x n),
+    with -inf for an item against itself."""
+    scores = genres[rows] @ genres.T
+    scores *= 1 - co_like_weight
+    positions = liked_position[rows]
+    rows_liked = np.nonzero(positions >= 0)[0]
+    if len(rows_liked):
+        co_likes = (likes[:, positions[rows_liked]].T @ likes).toarray()
+        scores[np.ix_(rows_liked, np.nonzero(liked_position >= 0)[0])] += co_like_weight * co_likes
+    scores[np.arange(len(rows)), rows] = -np.inf
+    return scores
+
+def top_k(scores, k):
+    """(columns, scores) of the k best scores per row, best first."""
+    k = min(k, scores.shape[1] - 1)
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    best_scores = np.take_along_axis(scores, best, axis=1)
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    return np.take_along_axis(best, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+def top_neighbors(genres, likes, liked_position, k, co_like_weight=CO_LIKE_WEIGHT):
+    """Yield (row, neighbour rows, scores) for every item with a positive score, best first."""
+    n = genres.shape[0]
+    if n < 2 or k <= 0:
+        return
+    block = max(1, SCORE_BLOCK_FLOATS // n)
+    for start in range(0, n, block):
+        rows = np.arange(start, min(start + block, n))
+        best, best_scores = top_k(similarity_rows(rows, genres, likes, liked_position, co_like_weight), k)
+        for i, row in enumerate(rows):
+            keep = best_scores[i] > 0
+            if keep.any():
+                yield row, best[i][keep], best_scores[i][keep]
+
+def pg_array(values):
+    return "{" + ",".join(map(str, values)) + "}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute similar albums from genres and co-likes.")
+    parser.add_argument("--k", type=int, default=NEIGHBORS_K, help="Neighbours kept per album")
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+    c.execute("SELECT a.id FROM albums a JOIN artists ar ON ar.id = a.artist_id ORDER BY a.id")
+    album_ids = [row[0] for row in c.fetchall()]
+    c.execute("""
+        SELECT album_id, genre_id, (CASE WHEN is_primary THEN %s ELSE 1 END)::REAL
+        FROM album_genres
+    """, (PRIMARY_GENRE_WEIGHT,))
+    album_genres = c.fetchall()
+    c.execute("SELECT user_id, album_id FROM likes")
+    likes = c.fetchall()
+    conn.commit()
+    print(f"Scoring {len(album_ids)} albums ({len(album_genres)} genre tags, {len(likes)} likes)...")
+
+    genres = genre_vectors(album_ids, album_genres)
+    likes_matrix, liked_position = like_vectors(album_ids, likes)
+
+    c.execute("CREATE TEMP TABLE album_neighbors_stage (LIKE album_neighbors INCLUDING DEFAULTS) ON COMMIT DROP")
+    buf = io.StringIO()
+    built = 0
+    for row, neighbors, scores in top_neighbors(genres, likes_matrix, liked_position, args.k):
+        neighbor_ids = [album_ids[i] for i in neighbors]
+        buf.write(f"{album_ids[row]}\t{pg_array(neighbor_ids)}\t{pg_array(f'{s:.4f}' for s in scores)}\n")
+        built += 1
+        if built % 10000 == 0:
+            buf.seek(0)
+            c.copy_expert("COPY album_neighbors_stage (album_id, neighbor_ids, scores) FROM STDIN", buf)
+            buf = io.StringIO()
+            print(f"Scored {built} albums...")
+    buf.seek(0)
+    c.copy_expert("COPY album_neighbors_stage (album_id, neighbor_ids, scores) FROM STDIN", buf)
+
+    # Albums deleted since the snapshot are skipped
+    c.execute("DELETE FROM album_neighbors")
+    c.execute("""
+        INSERT INTO album_neighbors (album_id, neighbor_ids, scores)
+        SELECT s.album_id, s.neighbor_ids, s.scores
+        FROM album_neighbors_stage s
+        JOIN albums a ON a.id = s.album_id
+    """)
+    conn.commit()
+    conn.close()
+    print(f"Done. Neighbours for {built} of {len(album_ids)} albums.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import argparse
+import io
+import os
+import sys
+
+import numpy as np
+import psycopg2
+from psycopg2.extras import execute_values
+
+from build_neighbors import genre_vectors, like_vectors, pg_array, similarity_rows, top_k, top_neighbors
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+from _similarity import ARTIST_CO_LIKE_WEIGHT, PRIMARY_GENRE_WEIGHT, RELATED_K
+
+# Build artist_related, the related-artists graph served by
+# GET /api/artists/{id}/related. See api/_similarity.py for the weights.
+#
+# A full build (this script) scores every artist against every other and
+# replaces the table in one transaction; run it nightly so co-likes and genre
+# rarity stay current. Between builds the scraper calls
+# update_related_artists() once a run for the artists it wrote: they are rescored against
+# everyone, and every other artist's list gains, loses or reorders them
+# accordingly. Lists only hold their top K, so when a touched artist's score
+# drops, an artist ranked just outside a list can't overtake it until the next
+# full build.
+#
+# Usage: python scripts/build_related_artists.py [--k 12]
+
+def get_db_connection():
+    # Load .env.local manually
+    env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env.local')
+    if os.path.exists(env_path):
+        with open(env_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    key, value = line.split('=', 1)
+                    if key not in os.environ:
+                        os.environ[key] = value.strip('"').strip("'")
+
+    return psycopg2.connect(
+        host=os.environ.get("POSTGRES_HOST"),
+        database=os.environ.get("POSTGRES_DATABASE"),
+        user=os.environ.get("POSTGRES_USER"),
+        password=os.environ.get("POSTGRES_PASSWORD"),
+        port=os.environ.get("POSTGRES_PORT", "5432")
+    )
+
+def load_artist_vectors(c):
+    """(artist_ids, genre vectors, like vectors, liked positions) for every artist with albums."""
+    c.execute("""
+        SELECT DISTINCT a.artist_id FROM albums a
+        JOIN artists ar ON ar.id = a.artist_id
+        ORDER BY 1
+    """)
+    artist_ids = [row[0] for row in c.fetchall()]
+    c.execute("""
+        SELECT a.artist_id, ag.genre_id, SUM(CASE WHEN ag.is_primary THEN %s ELSE 1 END)::REAL
+        FROM album_genres ag
+        JOIN albums a ON a.id = ag.album_id
+        GROUP BY a.artist_id, ag.genre_id
+    """, (PRIMARY_GENRE_WEIGHT,))
+    genres = genre_vectors(artist_ids, c.fetchall())
+    c.execute("SELECT DISTINCT l.user_id, a.artist_id FROM likes l JOIN albums a ON a.id = l.album_id")
+    likes, liked_position = like_vectors(artist_ids, c.fetchall())
+    return artist_ids, genres, likes, liked_position
+
+def update_related_artists(conn, artist_ids, k=RELATED_K):
+    """Rescore the given artists and patch every list they enter or leave. Commits.
+    Returns how many lists changed."""
+    touched = set(artist_ids)
+    if not touched:
+        return 0
+    c = conn.cursor()
+    all_ids, genres, likes, liked_position = load_artist_vectors(c)
+    rows = np.array([i for i, artist_id in enumerate(all_ids) if artist_id in touched], dtype=np.int64)
+    if len(all_ids) < 2 or not len(rows):
+        conn.commit()
+        return 0
+    scores = similarity_rows(rows, genres, likes, liked_position, ARTIST_CO_LIKE_WEIGHT)
+    best, best_scores = top_k(scores, k)
+
+    # Serializes with full builds and other scrapers
+    c.execute("LOCK TABLE artist_related IN SHARE ROW EXCLUSIVE MODE")
+    c.execute("SELECT artist_id, related_ids, weights FROM artist_related")
+    current = {artist_id: list(zip(related_ids, weights)) for artist_id, related_ids, weights in c.fetchall()}
+
+    lists = {}
+    for i, row in enumerate(rows):
+        lists[all_ids[row]] = [(all_ids[j], float(s)) for j, s in zip(best[i], best_scores[i]) if s > 0]
+
+    # Scores are symmetric, so column j of `scores` is how every artist j now rates the touched ones
+    candidates = set(np.nonzero((scores > 0).any(axis=0))[0].tolist())
+    candidates |= {j for j, artist_id in enumerate(all_ids)
+                   if any(related_id in touched for related_id, _ in current.get(artist_id, ()))}
+    for j in candidates:
+        artist_id = all_ids[j]
+        if artist_id in touched:
+            continue
+        merged = {related_id: weight for related_id, weight in current.get(artist_id, ())
+                  if related_id not in touched}
+        for i, row in enumerate(rows):
+            if scores[i, j] > 0:
+                merged[all_ids[row]] = float(scores[i, j])
+        lists[artist_id] = sorted(merged.items(), key=lambda item: -item[1])[:k]
+
+    changed = {
+        artist_id: related for artist_id, related in lists.items()
+        if [r for r, _ in related] != [r for r, _ in current.get(artist_id, ())]
+        or any(abs(w - old) > 1e-4 for (_, w), (_, old) in zip(related, current.get(artist_id, ())))
+    }
+    empty = [artist_id for artist_id, related in changed.items() if not related]
+    if empty:
+        c.execute("DELETE FROM artist_related WHERE artist_id = ANY(%s)", (empty,))
+    upserts = [(artist_id, [r for r, _ in related], [round(w, 4) for _, w in related])
+               for artist_id, related in changed.items() if related]
+    if upserts:
+        execute_values(c, """
+            INSERT INTO artist_related (artist_id, related_ids, weights)
+            SELECT v.artist_id, v.related_ids, v.weights::REAL[]
+            FROM (VALUES %s) AS v(artist_id, related_ids, weights)
+            JOIN artists ar ON ar.id = v.artist_id
+            ON CONFLICT (artist_id) DO UPDATE SET
+                related_ids = EXCLUDED.related_ids, weights = EXCLUDED.weights, built_at = NOW()
+        """, upserts)
+    conn.commit()
+    return len(changed)
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute related artists from shared genres and co-likes.")
+    parser.add_argument("--k", type=int, default=RELATED_K, help="Related artists kept per artist")
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+    artist_ids, genres, likes, liked_position = load_artist_vectors(c)
+    conn.commit()
+    print(f"Scoring {len(artist_ids)} artists...")
+
+    buf = io.StringIO()
+    built = 0
+    for row, related, weights in top_neighbors(genres, likes, liked_position, args.k, ARTIST_CO_LIKE_WEIGHT):
+        related_ids = [artist_ids[i] for i in related]
+        buf.write(f"{artist_ids[row]}\t{pg_array(related_ids)}\t{pg_array(f'{w:.4f}' for w in weights)}\n")
+        built += 1
+    buf.seek(0)
+
+    c.execute("CREATE TEMP TABLE artist_related_stage (LIKE artist_related INCLUDING DEFAULTS) ON COMMIT DROP")
+    c.copy_expert("COPY artist_related_stage (artist_id, related_ids, weights) FROM STDIN", buf)
+    c.execute("LOCK TABLE artist_related IN SHARE ROW EXCLUSIVE MODE")
+    c.execute("DELETE FROM artist_related")
+    # Artists deleted since the snapshot are skipped
+    c.execute("""
+        INSERT INTO artist_related (artist_id, related_ids, weights)
+        SELECT s.artist_id, s.related_ids, s.weights
+        FROM artist_related_stage s
+        JOIN artists ar ON ar.id = s.artist_id
+    """)
+    conn.commit()
+    conn.close()
+    print(f"Done. Related artists for {built} of {len(artist_ids)} artists.")
+
+if __name__ == "__main__":
+    main()
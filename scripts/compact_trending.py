@@ -0,0 +1,52 @@
+import argparse
+import os
+import sys
+
+import psycopg2
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+from _trending import compact_trending, rebuild_trending
+
+# Keep album_trending small (see api/_trending.py). Compaction moves the
+# landmark to now and drops albums whose likes have decayed away; it is cheap,
+# so run it from cron every hour or so. --rebuild recomputes every score from
+# the likes table instead, for after changing TRENDING_HALF_LIFE_HOURS or if
+# the incremental scores are ever suspected to have drifted.
+#
+# Usage: python scripts/compact_trending.py [--rebuild]
+
+def get_db_connection():
+    # Load .env.local manually
+    env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env.local')
+    if os.path.exists(env_path):
+        with open(env_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    key, value = line.split('=', 1)
+                    if key not in os.environ:
+                        os.environ[key] = value.strip('"').strip("'")
+
+    return psycopg2.connect(
+        host=os.environ.get("POSTGRES_HOST"),
+        database=os.environ.get("POSTGRES_DATABASE"),
+        user=os.environ.get("POSTGRES_USER"),
+        password=os.environ.get("POSTGRES_PASSWORD"),
+        port=os.environ.get("POSTGRES_PORT", "5432")
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact or rebuild the trending album scores.")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute every score from recent likes")
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    if args.rebuild:
+        print(f"Done. {rebuild_trending(conn)} albums trending.")
+    else:
+        kept, dropped = compact_trending(conn)
+        print(f"Done. {kept} albums trending, {dropped} decayed away.")
+    conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+import argparse
+import asyncio
+import hashlib
+import os
+import sys
+import threading
+from urllib.parse import urlparse
+
+from curl_cffi.requests import AsyncSession
+# Required: without a decode check, truncated bodies and HTML error pages would be stored as covers
+from PIL import Image
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import cover_store
+
+# Async cover downloader.
+#
+# One AsyncSession (and its connection pool) is shared by every download. A
+# global semaphore bounds in-flight requests and a per-host semaphore keeps any
+# single CDN host from being hammered. Bodies are streamed to a temp file in the
+# store directory while being hashed, checked, then atomically renamed to
+# <sha256>.jpg, so a crash never leaves a half-written cover behind.
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_PER_HOST = 6
+DEFAULT_RETRIES = 3
+DEFAULT_USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+
+class CoverDownloadError(Exception):
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def verify_image(path):
+    """Raise CoverDownloadError unless `path` is a non-empty, decodable image."""
+    if os.path.getsize(path) == 0:
+        raise CoverDownloadError("empty body")
+    try:
+        with Image.open(path) as img:
+            img.verify()
+    except Exception as e:
+        raise CoverDownloadError(f"not a valid image: {e}")
+
+
+class CoverDownloader:
+    """Runs an asyncio loop on a background thread so synchronous callers
+    (the scraper's download stage) can hand it batches of items."""
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, per_host=DEFAULT_PER_HOST,
+                 retries=DEFAULT_RETRIES, user_agent=None):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.retries = retries
+        self.user_agent = user_agent or DEFAULT_USER_AGENT
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="cover-downloader", daemon=True)
+        self.session = None
+        self.limit = None
+        self.host_limits = {}
+
+    def start(self):
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self._open(), self.loop).result()
+        return self
+
+    async def _open(self):
+        self.session = AsyncSession(
+            max_clients=self.concurrency,
+            impersonate="chrome120",
+            headers={"User-Agent": self.user_agent},
+        )
+        self.limit = asyncio.Semaphore(self.concurrency)
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.session.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    def _host_limit(self, url):
+        host = urlparse(url).netloc
+        if host not in self.host_limits:
+            self.host_limits[host] = asyncio.Semaphore(self.per_host)
+        return self.host_limits[host]
+
+    async def fetch(self, url, etag=None):
+        """Download one cover into the store.
+
+        Returns (content_hash, etag), or None when the server answered 304 to `etag`."""
+        headers = {"If-None-Match": etag} if etag else None
+        last_error = None
+
+        for attempt in range(self.retries):
+            tmp_path = os.path.join(cover_store.STORE_DIR, f".{os.getpid()}.{id(asyncio.current_task())}.tmp")
+            try:
+                async with self._host_limit(url), self.limit:
+                    async with self.session.stream("GET", url, headers=headers) as response:
+                        if response.status_code == 304 and etag:
+                            return None
+                        if response.status_code != 200:
+                            # Client errors won't fix themselves, except rate limiting
+                            retryable = response.status_code >= 500 or response.status_code == 429
+                            raise CoverDownloadError(f"status {response.status_code}", retryable=retryable)
+
+                        digest = hashlib.sha256()
+                        with open(tmp_path, 'wb') as f:
+                            async for chunk in response.aiter_content():
+                                digest.update(chunk)
+                                f.write(chunk)
+                        new_etag = response.headers.get('ETag')
+
+                verify_image(tmp_path)
+                content_hash = digest.hexdigest()
+                final_path = cover_store.store_path(content_hash)
+                if os.path.exists(final_path):
+                    os.remove(tmp_path)
+                    cover_store.touch(final_path)
+                else:
+                    os.replace(tmp_path, final_path)
+                return content_hash, new_etag
+
+            except Exception as e:
+                last_error = e
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                if not getattr(e, 'retryable', True):
+                    break
+                if attempt < self.retries - 1:
+                    await asyncio.sleep(0.5 * 2 ** attempt)
+
+        raise CoverDownloadError(f"{url}: {last_error}")
+
+    async def _download_item(self, item, manifest, revalidate):
+        url = item['Image URL']
+        known = manifest.get(url)
+        if known and not (revalidate and known['etag']):
+            apply_known_cover(item, known)
+            return
+
+        try:
+            result = await self.fetch(url, etag=known['etag'] if known else None)
+            if result is None:
+                apply_known_cover(item, known)
+                return
+            content_hash, etag = result
+            item['Local Image'] = cover_store.db_image_path(content_hash)
+            item['Cover Hash'] = content_hash
+            item['Cover ETag'] = etag
+        except Exception as e:
+            print(f"Error downloading image for {item['Album']}: {e}")
+            if known:
+                # Keep serving the cover we already have
+                apply_known_cover(item, known)
+            else:
+                item['Local Image'] = None
+
+    async def _download_all(self, items, manifest, revalidate):
+        await asyncio.gather(*(
+            self._download_item(item, manifest, revalidate)
+            for item in items if item['Image URL']
+        ))
+
+    def download_all(self, items, manifest=None, revalidate=False):
+        """Download covers for chart items, setting item['Local Image'] / ['Cover Hash'] / ['Cover ETag'].
+        Covers whose source URL is already in `manifest` are skipped unless `revalidate` is set."""
+        os.makedirs(cover_store.STORE_DIR, exist_ok=True)
+        future = asyncio.run_coroutine_threadsafe(
+            self._download_all(items, manifest or {}, revalidate), self.loop
+        )
+        future.result()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def apply_known_cover(item, entry):
+    item['Local Image'] = cover_store.db_image_path(entry['content_hash'])
+    item['Cover Hash'] = entry['content_hash']
+    item['Cover ETag'] = entry['etag']
+
+
+def backfill(conn, downloader):
+    """Re-download every manifest cover whose file is missing from the store."""
+    c = conn.cursor()
+    c.execute("SELECT DISTINCT source_url, content_hash FROM cover_manifest WHERE source_url IS NOT NULL")
+    missing = [url for url, content_hash in c.fetchall() if not os.path.exists(cover_store.store_path(content_hash))]
+    print(f"{len(missing)} covers missing from {cover_store.STORE_DIR}.")
+
+    items = [{'Image URL': url, 'Album': url} for url in missing]
+    downloader.download_all(items)
+
+    # A source may now serve different bytes: repoint its albums at the new hash
+    for item in items:
+        if item.get('Cover Hash'):
+            c.execute("""
+                UPDATE cover_manifest SET content_hash = %s, etag = %s, updated_at = NOW()
+                WHERE source_url = %s AND content_hash <> %s
+            """, (item['Cover Hash'], item['Cover ETag'], item['Image URL'], item['Cover Hash']))
+            c.execute("""
+                UPDATE albums SET image_path = %s
+                WHERE id IN (SELECT album_id FROM cover_manifest WHERE source_url = %s)
+                  AND image_path IS DISTINCT FROM %s
+            """, (item['Local Image'], item['Image URL'], item['Local Image']))
+    conn.commit()
+
+    failed = sum(1 for item in items if not item.get('Cover Hash'))
+    print(f"Backfill done: {len(items) - failed} downloaded, {failed} failed.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-download covers that are missing from the store.")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--per-host", type=int, default=DEFAULT_PER_HOST)
+    args = parser.parse_args()
+
+    conn = cover_store.get_db_connection()
+    try:
+        with CoverDownloader(concurrency=args.concurrency, per_host=args.per_host) as downloader:
+            backfill(conn, downloader)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
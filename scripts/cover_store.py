@@ -0,0 +1,206 @@
+import argparse
+import hashlib
+import os
+import re
+import sys
+import threading
+import time
+
+import psycopg2
+
+# Content-addressed cover storage.
+#
+# Covers live at public/covers/store/<sha256>.jpg and albums.image_path points at
+# 'covers/store/<sha256>.jpg'. The URL of a cover therefore only changes when its
+# bytes do, so it can be cached forever, and identical images are stored once.
+# cover_manifest maps each album to its cover hash plus the source URL/ETag it
+# was downloaded from, which lets the scraper skip unchanged downloads.
+#
+# Usage:
+#   python scripts/cover_store.py migrate      # move legacy rank-named covers into the store
+#   python scripts/cover_store.py gc [--dry-run] [--grace-seconds 3600]
+
+COVERS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "public", "covers")
+STORE_DIR = os.path.join(COVERS_DIR, "store")
+VARIANTS_DIR = os.path.join(COVERS_DIR, "variants")
+
+# gc leaves files younger than this alone: a running scraper stores covers in its
+# download stage but only writes cover_manifest later, in its persist stage
+GC_GRACE_SECONDS = 3600
+
+# The only files gc may delete: anything else in these directories (placeholders,
+# .gitkeep, other tools' files) is not ours to remove
+STORE_NAME = re.compile(r"^[0-9a-f]{64}\.jpg$")
+LEGACY_NAME = re.compile(r"^\d+_.*\.jpg$")       # <rank>_<artist>_<title>.jpg
+VARIANT_NAME = re.compile(r"^[0-9a-f]{16}_\d+\.\w+$")
+
+
+def get_db_connection():
+    # Load from .env.local or use hardcoded
+    env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env.local")
+    env_vars = {}
+    if os.path.exists(env_path):
+        with open(env_path, 'r') as f:
+            for line in f:
+                if '=' in line and not line.startswith('#'):
+                    key, val = line.strip().split('=', 1)
+                    env_vars[key] = val
+
+    host = os.environ.get("POSTGRES_HOST", env_vars.get("POSTGRES_HOST", "localhost"))
+    user = os.environ.get("POSTGRES_USER", env_vars.get("POSTGRES_USER", "myuser"))
+    password = os.environ.get("POSTGRES_PASSWORD", env_vars.get("POSTGRES_PASSWORD", ""))
+    dbname = os.environ.get("POSTGRES_DATABASE", env_vars.get("POSTGRES_DATABASE", "rym_db"))
+    port = os.environ.get("POSTGRES_PORT", env_vars.get("POSTGRES_PORT", "5432"))
+
+    return psycopg2.connect(host=host, user=user, password=password, dbname=dbname, port=port)
+
+
+def store_path(content_hash):
+    return os.path.join(STORE_DIR, f"{content_hash}.jpg")
+
+
+def db_image_path(content_hash):
+    """Value stored in albums.image_path (relative to public/)."""
+    return f"covers/store/{content_hash}.jpg"
+
+
+def write_cover(data):
+    """Store cover bytes under their hash (no-op if already present). Returns the hash."""
+    content_hash = hashlib.sha256(data).hexdigest()
+    path = store_path(content_hash)
+    if os.path.exists(path):
+        touch(path)
+    else:
+        os.makedirs(STORE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return content_hash
+
+
+def touch(path):
+    """Mark an existing cover as just stored, so gc's grace period covers it again."""
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+
+def load_manifest(conn):
+    """Map source URL -> {'content_hash', 'etag'} for every cover whose file is present."""
+    c = conn.cursor()
+    c.execute("SELECT source_url, content_hash, etag FROM cover_manifest WHERE source_url IS NOT NULL")
+    return {
+        url: {'content_hash': content_hash, 'etag': etag}
+        for url, content_hash, etag in c.fetchall()
+        if os.path.exists(store_path(content_hash))
+    }
+
+
+def upsert_manifest(c, album_id, content_hash, source_url=None, etag=None):
+    c.execute("""
+        INSERT INTO cover_manifest (album_id, content_hash, source_url, etag, updated_at)
+        VALUES (%s, %s, %s, %s, NOW())
+        ON CONFLICT (album_id) DO UPDATE
+        SET content_hash = EXCLUDED.content_hash, source_url = EXCLUDED.source_url,
+            etag = EXCLUDED.etag, updated_at = NOW()
+        WHERE cover_manifest.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+           OR cover_manifest.source_url IS DISTINCT FROM EXCLUDED.source_url
+           OR cover_manifest.etag IS DISTINCT FROM EXCLUDED.etag
+    """, (album_id, content_hash, source_url, etag))
+
+
+def migrate(conn):
+    """Copy legacy rank-named covers into the store and repoint albums at them."""
+    c = conn.cursor()
+    c.execute("SELECT id, image_path FROM albums WHERE image_path IS NOT NULL AND image_path NOT LIKE 'covers/store/%'")
+    rows = c.fetchall()
+    print(f"Found {len(rows)} albums with legacy cover paths.")
+
+    moved = 0
+    for album_id, image_path in rows:
+        legacy_path = os.path.join(COVERS_DIR, image_path.replace('covers/', '', 1))
+        if not os.path.exists(legacy_path):
+            print(f"Missing cover file for album {album_id}: {legacy_path}")
+            continue
+        with open(legacy_path, 'rb') as f:
+            content_hash = write_cover(f.read())
+        c.execute("UPDATE albums SET image_path = %s WHERE id = %s", (db_image_path(content_hash), album_id))
+        upsert_manifest(c, album_id, content_hash)
+        moved += 1
+
+    conn.commit()
+    print(f"Moved {moved} covers into {STORE_DIR}. Run 'gc' to delete the legacy files.")
+
+
+def gc(conn, dry_run=False, grace_seconds=GC_GRACE_SECONDS):
+    """Delete cover files (store, legacy rank-named and variants) that no album
+    references any more and that were not written in the last `grace_seconds`.
+    Files not named like one of those are never touched."""
+    c = conn.cursor()
+    c.execute("SELECT content_hash FROM cover_manifest")
+    referenced_hashes = {row[0] for row in c.fetchall()}
+    c.execute("SELECT image_path, cover_hash FROM albums WHERE image_path IS NOT NULL")
+    referenced_paths = set()
+    for image_path, cover_hash in c.fetchall():
+        referenced_paths.add(os.path.normpath(os.path.join(COVERS_DIR, image_path.replace('covers/', '', 1))))
+        if cover_hash:
+            referenced_hashes.add(cover_hash)
+    variant_prefixes = {h[:16] for h in referenced_hashes}
+
+    candidates = []
+    if os.path.isdir(STORE_DIR):
+        for name in os.listdir(STORE_DIR):
+            if STORE_NAME.match(name) and name[:-4] not in referenced_hashes:
+                candidates.append(os.path.join(STORE_DIR, name))
+    for name in os.listdir(COVERS_DIR):
+        path = os.path.join(COVERS_DIR, name)
+        if LEGACY_NAME.match(name) and os.path.isfile(path) and os.path.normpath(path) not in referenced_paths:
+            candidates.append(path)
+    if os.path.isdir(VARIANTS_DIR):
+        for name in os.listdir(VARIANTS_DIR):
+            if VARIANT_NAME.match(name) and name.split('_', 1)[0] not in variant_prefixes:
+                candidates.append(os.path.join(VARIANTS_DIR, name))
+
+    cutoff = time.time() - grace_seconds
+    candidates = [path for path in candidates if os.path.getmtime(path) < cutoff]
+
+    freed = 0
+    for path in candidates:
+        freed += os.path.getsize(path)
+        if dry_run:
+            print(f"Would remove {path}")
+        else:
+            os.remove(path)
+
+    action = "Would free" if dry_run else "Freed"
+    print(f"{action} {freed / 1024 / 1024:.1f} MB across {len(candidates)} unreferenced files.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage content-addressed cover storage.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("migrate", help="Move legacy covers into the content-addressed store")
+    gc_parser = sub.add_parser("gc", help="Remove cover files no album references")
+    gc_parser.add_argument("--dry-run", action="store_true")
+    gc_parser.add_argument("--grace-seconds", type=int, default=GC_GRACE_SECONDS,
+                           help="Keep unreferenced files younger than this")
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    try:
+        if args.command == "migrate":
+            migrate(conn)
+        elif args.command == "gc":
+            gc(conn, dry_run=args.dry_run, grace_seconds=args.grace_seconds)
+    except Exception as e:
+        print(f"Error: {e}")
+        conn.rollback()
+        sys.exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from contextlib import closing
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+from _artist_pages import render_pages
+from _catalog_db import CATALOG_DB_PATH, CATALOG_DB_SCHEMA
+
+# Export the catalog to the read-only SQLite file the API reads locally (run
+# after each scrape, then deploy the API from this checkout: the file is not
+# committed, and a production API without it logs an error and reads the
+# catalog from Postgres). Everything is read from one Postgres snapshot, whose
+# time is stored as meta.exported_at; the file is built next to the old one
+# and renamed over it.
+#
+# Usage: python scripts/export_catalog_sqlite.py [--path api/data/catalog.sqlite]
+
+PAGE_CHUNK = 500
+
+def get_db_connection():
+    # Load .env.local manually
+    env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env.local')
+    if os.path.exists(env_path):
+        with open(env_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    key, value = line.split('=', 1)
+                    if key not in os.environ:
+                        os.environ[key] = value.strip('"').strip("'")
+
+    return psycopg2.connect(
+        host=os.environ.get("POSTGRES_HOST"),
+        database=os.environ.get("POSTGRES_DATABASE"),
+        user=os.environ.get("POSTGRES_USER"),
+        password=os.environ.get("POSTGRES_PASSWORD"),
+        port=os.environ.get("POSTGRES_PORT", "5432")
+    )
+
+def export(pg, out):
+    c = pg.cursor(cursor_factory=RealDictCursor)
+    c.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+    # Artist pages updated after this are served from Postgres instead
+    c.execute("SELECT NOW()::TIMESTAMP AS exported_at")
+    out.execute("INSERT INTO meta (key, value) VALUES ('exported_at', ?)",
+                (c.fetchone()['exported_at'].isoformat(),))
+
+    c.execute("SELECT id, name, slug, bio, image_path, location FROM artists")
+    artists = c.fetchall()
+    out.executemany("""
+        INSERT INTO artists (id, name, slug, bio, image_path, location)
+        VALUES (:id, :name, :slug, :bio, :image_path, :location)
+    """, artists)
+
+    c.execute("""
+        SELECT a.id, a.title, a.artist_id, a.rank, a.release_date, a.rating, a.ratings_count,
+            a.image_path, a.spotify_link, a.youtube_link, a.apple_music_link,
+            a.blurhash, a.dominant_color, a.cover_variants
+        FROM albums a
+        JOIN artists ar ON ar.id = a.artist_id
+    """)
+    albums = c.fetchall()
+    for album in albums:
+        if album['cover_variants'] is not None:
+            album['cover_variants'] = json.dumps(album['cover_variants'], separators=(',', ':'))
+    out.executemany("""
+        INSERT INTO albums (id, title, artist_id, rank, release_date, rating, ratings_count,
+            image_path, spotify_link, youtube_link, apple_music_link, blurhash, dominant_color, cover_variants)
+        VALUES (:id, :title, :artist_id, :rank, :release_date, :rating, :ratings_count,
+            :image_path, :spotify_link, :youtube_link, :apple_music_link, :blurhash, :dominant_color, :cover_variants)
+    """, albums)
+
+    c.execute("SELECT id, name FROM genres")
+    genres = c.fetchall()
+    out.executemany("INSERT INTO genres (id, name) VALUES (:id, :name)", genres)
+
+    c.execute("""
+        SELECT ag.album_id, ag.genre_id, COALESCE(ag.is_primary, FALSE) AS is_primary
+        FROM album_genres ag
+        JOIN albums a ON a.id = ag.album_id
+        JOIN artists ar ON ar.id = a.artist_id
+    """)
+    out.executemany("""
+        INSERT INTO album_genres (album_id, genre_id, is_primary) VALUES (:album_id, :genre_id, :is_primary)
+    """, c.fetchall())
+
+    # Built pages are copied; invalidated or missing ones are rendered from the same snapshot
+    c.execute("SELECT artist_id, body, etag FROM artist_pages WHERE body IS NOT NULL")
+    pages = {row['artist_id']: (row['body'], row['etag']) for row in c.fetchall()}
+    unbuilt = [artist['id'] for artist in artists if artist['id'] not in pages]
+    for start in range(0, len(unbuilt), PAGE_CHUNK):
+        pages.update(render_pages(pg, unbuilt[start:start + PAGE_CHUNK]))
+    out.executemany("INSERT INTO artist_pages (artist_id, body, etag) VALUES (?, ?, ?)",
+                    [(artist_id, body, etag) for artist_id, (body, etag) in pages.items()])
+    pg.rollback()
+
+    out.execute("INSERT INTO artist_search (artist_search) VALUES ('rebuild')")
+    out.execute("INSERT INTO album_search (album_search) VALUES ('rebuild')")
+    out.commit()
+    out.execute("ANALYZE")
+    out.execute("VACUUM")
+    return len(albums), len(artists), len(genres), len(unbuilt)
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the catalog to a read-only SQLite file.")
+    parser.add_argument("--path", default=CATALOG_DB_PATH, help="SQLite file to replace")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.path)), exist_ok=True)
+    tmp_path = f"{args.path}.tmp-{os.getpid()}"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    with closing(get_db_connection()) as pg, closing(sqlite3.connect(tmp_path)) as out:
+        out.execute("PRAGMA journal_mode = OFF")
+        out.execute("PRAGMA synchronous = OFF")
+        out.executescript(CATALOG_DB_SCHEMA)
+        albums, artists, genres, rendered = export(pg, out)
+
+    # The API opens the file as immutable, so it must never change in place
+    os.replace(tmp_path, args.path)
+    size = os.path.getsize(args.path)
+    print(f"Exported {albums} albums, {artists} artists and {genres} genres "
+          f"({rendered} artist pages rendered) to {args.path} ({size / 1024:.0f} KiB).")
+
+if __name__ == "__main__":
+    main()
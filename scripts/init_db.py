@@ -4,6 +4,12 @@ import sys
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+from _artist_pages import ARTIST_PAGES_DDL
+from _ranking import FEED_CACHE_DDL, USER_FEEDS_DDL
+from _similarity import ALBUM_NEIGHBORS_DDL, ARTIST_RELATED_DDL
+from _minhash import USER_MINHASH_DDL
+from _trending import TRENDING_DDL
 
 def get_postgres_conn():
     # Load from .env.local or use hardcoded
@@ -30,12 +36,23 @@ def init_db():
     
     print("Dropping existing tables...")
     c.execute("DROP TABLE IF EXISTS likes CASCADE")
+    c.execute("DROP TABLE IF EXISTS cover_manifest CASCADE")
     c.execute("DROP TABLE IF EXISTS album_genres CASCADE")
     c.execute("DROP TABLE IF EXISTS genres CASCADE")
     c.execute("DROP TABLE IF EXISTS albums CASCADE")
     c.execute("DROP TABLE IF EXISTS artists CASCADE")
     c.execute("DROP TABLE IF EXISTS users CASCADE")
     c.execute("DROP TABLE IF EXISTS sessions CASCADE")
+    c.execute("DROP TABLE IF EXISTS scrape_rate_limits CASCADE")
+    c.execute("DROP TABLE IF EXISTS artist_pages CASCADE")
+    c.execute("DROP TABLE IF EXISTS feed_cache CASCADE")
+    c.execute("DROP TABLE IF EXISTS user_feeds CASCADE")
+    c.execute("DROP TABLE IF EXISTS album_neighbors CASCADE")
+    c.execute("DROP TABLE IF EXISTS artist_related CASCADE")
+    c.execute("DROP TABLE IF EXISTS user_lsh_buckets CASCADE")
+    c.execute("DROP TABLE IF EXISTS user_minhash CASCADE")
+    c.execute("DROP TABLE IF EXISTS album_trending CASCADE")
+    c.execute("DROP TABLE IF EXISTS trending_landmark CASCADE")
     
     print("Creating tables...")
     
@@ -47,7 +64,10 @@ def init_db():
             slug TEXT,
             bio TEXT,
             image_path TEXT,
-            location TEXT
+            location TEXT,
+            bio_attempts INTEGER NOT NULL DEFAULT 0,
+            bio_next_attempt_at TIMESTAMP,
+            bio_claimed_until TIMESTAMP
         );
     """)
     
@@ -65,6 +85,11 @@ def init_db():
             spotify_link TEXT,
             youtube_link TEXT,
             apple_music_link TEXT,
+            content_hash TEXT,
+            cover_hash TEXT,
+            blurhash TEXT,
+            dominant_color TEXT,
+            cover_variants JSONB,
             UNIQUE(title, artist_id)
         );
     """)
@@ -87,12 +112,39 @@ def init_db():
         );
     """)
     
+    # Cover Manifest (content-addressed covers, see scripts/cover_store.py)
+    c.execute("""
+        CREATE TABLE cover_manifest (
+            album_id INTEGER PRIMARY KEY REFERENCES albums(id),
+            content_hash TEXT NOT NULL,
+            source_url TEXT,
+            etag TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    c.execute("CREATE INDEX idx_cover_manifest_source ON cover_manifest(source_url);")
+    
+    # Shared request budget for the scrapers
+    c.execute("""
+        CREATE TABLE scrape_rate_limits (
+            name TEXT PRIMARY KEY,
+            next_slot TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+    """)
+    
+    # Materialized artist pages, invalidated by triggers (see api/_artist_pages.py)
+    c.execute(ARTIST_PAGES_DDL)
+    
+    # Shared anonymous home feed rankings, one per day and genre (see api/_ranking.py)
+    c.execute(FEED_CACHE_DDL)
+    
     # Users
     c.execute("""
         CREATE TABLE users (
             id SERIAL PRIMARY KEY,
             username TEXT UNIQUE NOT NULL,
             password_hash TEXT NOT NULL,
+            like_count INTEGER NOT NULL DEFAULT 0,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         );
     """)
@@ -111,10 +163,26 @@ def init_db():
         CREATE TABLE likes (
             user_id INTEGER REFERENCES users(id),
             album_id INTEGER REFERENCES albums(id),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
             PRIMARY KEY (user_id, album_id)
         );
     """)
+    c.execute("CREATE INDEX idx_likes_user_created ON likes(user_id, created_at DESC, album_id DESC);")
+    
+    # Nightly precomputed home feeds (see scripts/precompute_feeds.py)
+    c.execute(USER_FEEDS_DDL)
+    
+    # MinHash signatures and LSH buckets for similar users (see api/_minhash.py)
+    c.execute(USER_MINHASH_DDL)
+    
+    # Time-decayed like scores for trending albums (see api/_trending.py)
+    c.execute(TRENDING_DDL)
+    
+    # Precomputed similar albums (see scripts/build_neighbors.py)
+    c.execute(ALBUM_NEIGHBORS_DDL)
+    
+    # Related-artists graph (see scripts/build_related_artists.py)
+    c.execute(ARTIST_RELATED_DDL)
     
     conn.commit()
     conn.close()
@@ -0,0 +1,117 @@
+import argparse
+import json
+import math
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Minimal stand-in for the Discogs API so collection imports and valuations can
+# be exercised locally without a token or rate limits. Start it, then run the API with
+#   DISCOGS_API_URL=http://localhost:8765 DISCOGS_TOKEN=mock
+#
+# Usage: python scripts/mock_discogs.py --items 2000 --throttle-every 7
+
+FORMATS = ["Vinyl", "CD", "Cassette"]
+
+
+def fake_release(n):
+    release_id = 1000000 + n
+    return {
+        "id": release_id,
+        "instance_id": 5000000 + n,
+        "date_added": f"2020-01-01T00:{n // 60 % 60:02d}:{n % 60:02d}-08:00",
+        "basic_information": {
+            "id": release_id,
+            "master_id": 200000 + n if n % 3 else 0,
+            "title": f"Mock Album {n}",
+            "year": 1960 + n % 60,
+            "thumb": f"https://i.discogs.com/mock/{release_id}.jpg",
+            "formats": [{"name": FORMATS[n % len(FORMATS)], "qty": "1"}],
+            "labels": [{"name": f"Mock Label {n % 25}"}],
+            "artists": [{"name": f"Mock Artist {n % 150}" + (" (2)" if n % 11 == 0 else "")}],
+        },
+    }
+
+
+class MockDiscogsHandler(BaseHTTPRequestHandler):
+    items = 250
+    throttle_every = 0
+    request_count = 0
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+        query = parse_qs(url.query)
+
+        MockDiscogsHandler.request_count += 1
+        if self.throttle_every and MockDiscogsHandler.request_count % self.throttle_every == 0:
+            self.send_json(429, {"message": "You are making requests too quickly."}, {"Retry-After": "1"})
+            return
+
+        # /users/<name>/collection/folders/0/releases
+        if len(parts) == 6 and parts[0] == "users" and parts[2:5] == ["collection", "folders", "0"] and parts[5] == "releases":
+            if parts[1] == "private":
+                self.send_json(404, {"message": "User does not exist or may have been deleted."})
+                return
+            page = int(query.get("page", ["1"])[0])
+            per_page = min(int(query.get("per_page", ["50"])[0]), 100)
+            pages = max(1, math.ceil(self.items / per_page))
+            start = (page - 1) * per_page
+            releases = [fake_release(n) for n in range(start, min(start + per_page, self.items))]
+            self.send_json(200, {
+                "pagination": {"page": page, "pages": pages, "per_page": per_page, "items": self.items},
+                "releases": releases,
+            })
+            return
+
+        # /marketplace/stats/<id> and /marketplace/price_suggestions/<id>
+        if len(parts) == 3 and parts[0] == "marketplace" and parts[2].isdigit():
+            n = int(parts[2]) - 1000000
+            if parts[1] == "stats":
+                currency = query.get("curr_abbr", ["USD"])[0]
+                self.send_json(200, {
+                    "lowest_price": {"value": round(5 + n % 40 * 1.25, 2), "currency": currency} if n % 7 else None,
+                    "num_for_sale": 0 if n % 7 == 0 else n % 30 + 1,
+                    "blocked_from_sale": False,
+                })
+                return
+            if parts[1] == "price_suggestions":
+                base = 8 + n % 50
+                self.send_json(200, {
+                    "Mint (M)": {"currency": "USD", "value": base * 1.6},
+                    "Very Good Plus (VG+)": {"currency": "USD", "value": base * 1.1},
+                    "Good (G)": {"currency": "USD", "value": base * 0.4},
+                })
+                return
+
+        self.send_json(404, {"message": "The requested resource was not found."})
+
+    def log_message(self, format, *args):
+        print(f"mock-discogs: {format % args}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake Discogs API for local testing.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--items", type=int, default=250, help="Releases in every mock collection")
+    parser.add_argument("--throttle-every", type=int, default=0, help="Answer every Nth request with a 429")
+    args = parser.parse_args()
+
+    MockDiscogsHandler.items = args.items
+    MockDiscogsHandler.throttle_every = args.throttle_every
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), MockDiscogsHandler)
+    print(f"Mock Discogs API on http://127.0.0.1:{args.port} ({args.items} releases per collection)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import json
+import os
+import queue
+import threading
+import time
+
+# Shared building blocks for the scrapers: a process-wide rate limiter,
+# a resumable checkpoint file and a small staged pipeline runner.
+
+STOP = object()  # Sentinel passed down a queue to shut the next stage down
+
+
+class RateLimiter:
+    """Spaces out calls to wait() so that at most one starts every `interval` seconds,
+    no matter how many threads share the limiter."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.next_slot = 0.0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Checkpoint:
+    """Records completed pages and items in a JSON file so an interrupted run can resume."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.pages = set()
+        self.items = set()
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                data = json.load(f)
+            self.pages = set(data.get('pages', []))
+            self.items = set(data.get('items', []))
+            print(f"Resuming from checkpoint {path}: {len(self.pages)} pages, {len(self.items)} items done.")
+
+    def page_done(self, page):
+        with self.lock:
+            return page in self.pages
+
+    def item_done(self, key):
+        with self.lock:
+            return key in self.items
+
+    def mark_items(self, keys):
+        with self.lock:
+            self.items.update(keys)
+            self._save()
+
+    def mark_page(self, page):
+        with self.lock:
+            self.pages.add(page)
+            self._save()
+
+    def _save(self):
+        # Write to a temp file first so a crash never leaves a truncated checkpoint
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'pages': sorted(self.pages), 'items': sorted(self.items)}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        with self.lock:
+            self.pages.clear()
+            self.items.clear()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+class Stage:
+    """A pool of worker threads that consume one queue and optionally feed the next.
+
+    `func(payload, emit)` is called for every payload; it calls `emit(x)` to pass
+    results downstream. When every worker has seen STOP the stage forwards a single
+    STOP to its output queue. A payload whose `func` raises is logged and dropped;
+    `failed` records that it happened and `on_error(e)` is called, so the caller
+    can stop the run and must not treat it as complete."""
+
+    def __init__(self, name, func, inbox, outbox=None, workers=1, on_error=None):
+        self.name = name
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.workers = workers
+        self.on_error = on_error
+        self.failed = False
+        self.remaining = workers
+        self.lock = threading.Lock()
+        self.threads = []
+
+    def emit(self, payload):
+        if self.outbox is not None:
+            self.outbox.put(payload)
+
+    def _run(self):
+        while True:
+            payload = self.inbox.get()
+            if payload is STOP:
+                # Let sibling workers see the sentinel too
+                self.inbox.put(STOP)
+                break
+            try:
+                self.func(payload, self.emit)
+            except Exception as e:
+                print(f"[{self.name}] Error: {e}")
+                with self.lock:
+                    self.failed = True
+                if self.on_error is not None:
+                    self.on_error(e)
+
+        with self.lock:
+            self.remaining -= 1
+            last = self.remaining == 0
+        if last:
+            self.emit(STOP)
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            t.start()
+            self.threads.append(t)
+
+    def join(self):
+        for t in self.threads:
+            t.join()
+
+
+def bounded_queue(maxsize):
+    return queue.Queue(maxsize=maxsize)
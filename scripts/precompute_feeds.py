@@ -0,0 +1,156 @@
+import argparse
+import io
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+from _ranking import (FEED_TOP_N, daily_seed, load_album_genres, load_anonymous_ranking,
+                      load_candidates, load_trending_boosts, load_user_profile, score_albums)
+
+# Precompute the day's home feed of every active user (run from cron just after
+# midnight, in the API's timezone). Users are ranked in worker processes with
+# the same scoring as GET /api/albums and written to user_feeds with COPY; the
+# API then serves those lists and only patches in likes made during the day.
+# Also builds the shared anonymous ranking so no visitor has to.
+#
+# Usage: python scripts/precompute_feeds.py [--workers 8] [--active-days 30]
+
+USERS_PER_TASK = 50
+
+def load_env():
+    # Load .env.local manually
+    env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env.local')
+    if os.path.exists(env_path):
+        with open(env_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    key, value = line.split('=', 1)
+                    if key not in os.environ:
+                        os.environ[key] = value.strip('"').strip("'")
+
+def get_db_connection():
+    return psycopg2.connect(
+        host=os.environ.get("POSTGRES_HOST"),
+        database=os.environ.get("POSTGRES_DATABASE"),
+        user=os.environ.get("POSTGRES_USER"),
+        password=os.environ.get("POSTGRES_PASSWORD"),
+        port=os.environ.get("POSTGRES_PORT", "5432")
+    )
+
+# Per-process state: each worker loads the catalog once and keeps its connection
+_worker = {}
+
+def init_worker(day):
+    load_env()
+    conn = get_db_connection()
+    c = conn.cursor(cursor_factory=RealDictCursor)
+    _worker['conn'] = conn
+    _worker['day'] = day
+    _worker['albums_data'] = load_candidates(c)
+    _worker['album_genres_map'] = load_album_genres(c)
+    _worker['trending'] = load_trending_boosts(c)
+    conn.commit()
+
+def rank_users(user_ids):
+    """Worker body: [(user_id, top album ids, liked album ids, total)]."""
+    conn = _worker['conn']
+    c = conn.cursor(cursor_factory=RealDictCursor)
+    feeds = []
+    for user_id in user_ids:
+        profile = load_user_profile(c, user_id, _worker['album_genres_map'])
+        rng = random.Random(daily_seed(str(user_id), _worker['day']))
+        results = score_albums(_worker['albums_data'], _worker['album_genres_map'], profile, rng,
+                               trending=_worker['trending'])
+        feeds.append((
+            user_id,
+            [album['id'] for album in results[:FEED_TOP_N]],
+            sorted(profile['liked_album_ids']),
+            len(results),
+        ))
+    conn.commit()
+    return feeds
+
+def pg_array(ids):
+    return "{" + ",".join(map(str, ids)) + "}"
+
+def save_feeds(conn, day, started_at, feeds):
+    """Store feeds with built_at = `started_at`, so the API patches in every like
+    made after the profiles were read."""
+    c = conn.cursor()
+    c.execute("CREATE TEMP TABLE user_feeds_stage (LIKE user_feeds INCLUDING DEFAULTS) ON COMMIT DROP")
+    buf = io.StringIO()
+    for user_id, album_ids, liked_album_ids, total in feeds:
+        buf.write(f"{user_id}\t{day.isoformat()}\t{pg_array(album_ids)}\t{pg_array(liked_album_ids)}\t{total}\n")
+    buf.seek(0)
+    c.copy_expert("COPY user_feeds_stage (user_id, day, album_ids, liked_album_ids, total) FROM STDIN", buf)
+    # Users deleted since the run started are skipped
+    c.execute("""
+        INSERT INTO user_feeds (user_id, day, album_ids, liked_album_ids, total, built_at)
+        SELECT s.user_id, s.day, s.album_ids, s.liked_album_ids, s.total, %s
+        FROM user_feeds_stage s
+        JOIN users u ON u.id = s.user_id
+        ON CONFLICT (user_id) DO UPDATE SET
+            day = EXCLUDED.day, album_ids = EXCLUDED.album_ids,
+            liked_album_ids = EXCLUDED.liked_album_ids, total = EXCLUDED.total, built_at = EXCLUDED.built_at
+    """, (started_at,))
+    conn.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute personalized home feeds for active users.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--active-days", type=int, default=30,
+                        help="Users with a live session or a like in this many days are ranked")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Feeds per COPY")
+    parser.add_argument("--day", type=date.fromisoformat, default=None, help="Feed date (default: today)")
+    args = parser.parse_args()
+
+    load_env()
+    day = args.day or date.today()
+    conn = get_db_connection()
+    c = conn.cursor()
+    # Every profile is read after this, so later likes are the only ones a feed can miss
+    c.execute("SELECT NOW()::TIMESTAMP")
+    started_at = c.fetchone()[0]
+    c.execute("""
+        SELECT user_id FROM sessions WHERE expires_at > NOW()
+        UNION
+        SELECT user_id FROM likes WHERE created_at > NOW() - %s * INTERVAL '1 day'
+        ORDER BY 1
+    """, (args.active_days,))
+    user_ids = [row[0] for row in c.fetchall()]
+    conn.commit()
+    print(f"Ranking {len(user_ids)} active users for {day.isoformat()}...")
+
+    tasks = [user_ids[i:i + USERS_PER_TASK] for i in range(0, len(user_ids), USERS_PER_TASK)]
+    pending = []
+    saved = 0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(day,)) as executor:
+        for feeds in executor.map(rank_users, tasks):
+            pending.extend(feeds)
+            if len(pending) >= args.batch_size:
+                save_feeds(conn, day, started_at, pending)
+                saved += len(pending)
+                print(f"Saved {saved}/{len(user_ids)} feeds...")
+                pending = []
+
+    if pending:
+        save_feeds(conn, day, started_at, pending)
+        saved += len(pending)
+
+    # Feeds of users who went inactive are older than today and no longer served
+    c.execute("DELETE FROM user_feeds WHERE day < %s", (day,))
+    conn.commit()
+
+    anonymous = load_anonymous_ranking(conn, day)
+    conn.close()
+    print(f"Done. {saved} user feeds and an anonymous ranking of {len(anonymous)} albums.")
+
+if __name__ == "__main__":
+    main()
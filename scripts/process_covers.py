@@ -0,0 +1,246 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import psycopg2
+from PIL import Image, features
+from psycopg2.extras import execute_values
+
+# Builds the derived cover assets the frontend needs:
+#   - resized WebP (and AVIF, when Pillow was built with it) variants at fixed widths
+#   - a blurhash and a dominant colour to paint while the image loads
+# Variants are named after the source file's hash, so their URLs never change
+# for a given image and re-runs only touch covers whose bytes changed.
+
+COVERS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "public", "covers")
+VARIANT_WIDTHS = (96, 160, 240, 320)
+VARIANTS_DIR = os.path.join(COVERS_DIR, "variants")
+FORMATS = {"webp": {"quality": 80, "method": 6}}
+if features.check("avif"):
+    FORMATS["avif"] = {"quality": 55}
+
+BLURHASH_COMPONENTS = (4, 3)
+BLURHASH_CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+
+def get_db_connection():
+    # Load from .env.local or use hardcoded
+    env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env.local")
+    env_vars = {}
+    if os.path.exists(env_path):
+        with open(env_path, 'r') as f:
+            for line in f:
+                if '=' in line and not line.startswith('#'):
+                    key, val = line.strip().split('=', 1)
+                    env_vars[key] = val
+
+    host = os.environ.get("POSTGRES_HOST", env_vars.get("POSTGRES_HOST", "localhost"))
+    user = os.environ.get("POSTGRES_USER", env_vars.get("POSTGRES_USER", "myuser"))
+    password = os.environ.get("POSTGRES_PASSWORD", env_vars.get("POSTGRES_PASSWORD", ""))
+    dbname = os.environ.get("POSTGRES_DATABASE", env_vars.get("POSTGRES_DATABASE", "rym_db"))
+    port = os.environ.get("POSTGRES_PORT", env_vars.get("POSTGRES_PORT", "5432"))
+
+    return psycopg2.connect(host=host, user=user, password=password, dbname=dbname, port=port)
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _encode83(value, length):
+    return "".join(
+        BLURHASH_CHARS[(value // (83 ** (length - i))) % 83]
+        for i in range(1, length + 1)
+    )
+
+
+def _srgb_to_linear(value):
+    v = value / 255
+    return v / 12.92 if v <= 0.04045 else ((v + 0.055) / 1.055) ** 2.4
+
+
+def _linear_to_srgb(value):
+    v = max(0.0, min(1.0, value))
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+    return int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _sign_pow(value, exp):
+    return math.copysign(abs(value) ** exp, value)
+
+
+def blurhash(image, x_components=BLURHASH_COMPONENTS[0], y_components=BLURHASH_COMPONENTS[1]):
+    """Encode a blurhash (https://blurha.sh) from a small RGB image."""
+    width, height = image.size
+    linear = [tuple(_srgb_to_linear(c) for c in px) for px in image.getdata()]
+    cos_x = [[math.cos(math.pi * i * x / width) for x in range(width)] for i in range(x_components)]
+    cos_y = [[math.cos(math.pi * j * y / height) for y in range(height)] for j in range(y_components)]
+
+    factors = []
+    for j in range(y_components):
+        for i in range(x_components):
+            norm = 1 if i == 0 and j == 0 else 2
+            r = g = b = 0.0
+            for y in range(height):
+                row_basis = norm * cos_y[j][y]
+                offset = y * width
+                for x in range(width):
+                    basis = row_basis * cos_x[i][x]
+                    pr, pg, pb = linear[offset + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            scale = 1 / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = _encode83((x_components - 1) + (y_components - 1) * 9, 1)
+
+    if ac:
+        actual_max = max(abs(v) for factor in ac for v in factor)
+        quantised_max = max(0, min(82, int(actual_max * 166 - 0.5)))
+        max_value = (quantised_max + 1) / 166
+        result += _encode83(quantised_max, 1)
+    else:
+        max_value = 1
+        result += _encode83(0, 1)
+
+    result += _encode83((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+
+    for factor in ac:
+        q = [max(0, min(18, int(_sign_pow(v / max_value, 0.5) * 9 + 9.5))) for v in factor]
+        result += _encode83(q[0] * 19 * 19 + q[1] * 19 + q[2], 2)
+
+    return result
+
+
+def dominant_color(image):
+    """Most common colour of a small palette-quantised copy, as #rrggbb."""
+    small = image.copy()
+    small.thumbnail((64, 64))
+    quantised = small.quantize(colors=5)
+    palette = quantised.getpalette()
+    count, index = max(quantised.getcolors())
+    r, g, b = palette[index * 3:index * 3 + 3]
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def variant_path(cover_hash, width, fmt):
+    return os.path.join(VARIANTS_DIR, f"{cover_hash[:16]}_{width}.{fmt}")
+
+
+def variant_widths(source_width):
+    """Widths to generate. Never upscale: widths above the source are left to the
+    original JPEG, and a source narrower than every width gets one variant at its
+    own width, named (and listed in srcset) by the width actually written."""
+    return [w for w in VARIANT_WIDTHS if w <= source_width] or [source_width]
+
+
+def variants_exist(cover_hash, widths):
+    return all(os.path.exists(variant_path(cover_hash, width, fmt)) for width in widths for fmt in FORMATS)
+
+
+def process_cover(job):
+    """Worker: build variants and placeholders for one cover. Returns None if nothing changed."""
+    album_id, src_path, old_hash, force = job
+    try:
+        cover_hash = file_hash(src_path)
+
+        with Image.open(src_path) as img:
+            # Only the header has been read so far
+            widths = variant_widths(img.width)
+            if cover_hash == old_hash and not force and variants_exist(cover_hash, widths):
+                return None
+            img = img.convert("RGB")
+
+            variants = {fmt: {} for fmt in FORMATS}
+            for width in widths:
+                height = max(1, round(img.height * width / img.width))
+                resized = img.resize((width, height), Image.LANCZOS) if width != img.width else img
+                for fmt, options in FORMATS.items():
+                    path = variant_path(cover_hash, width, fmt)
+                    if force or not os.path.exists(path):
+                        tmp_path = f"{path}.{os.getpid()}.tmp"
+                        resized.save(tmp_path, format=fmt.upper(), **options)
+                        os.replace(tmp_path, path)
+                    variants[fmt][str(width)] = os.path.relpath(path, os.path.dirname(COVERS_DIR))
+
+            thumb = img.resize((32, 32), Image.BILINEAR)
+            return {
+                'id': album_id,
+                'cover_hash': cover_hash,
+                'blurhash': blurhash(thumb),
+                'dominant_color': dominant_color(img),
+                'cover_variants': variants,
+            }
+    except Exception as e:
+        print(f"Error processing cover for album {album_id}: {e}")
+        return None
+
+
+def save_results(conn, results):
+    c = conn.cursor()
+    execute_values(c, """
+        UPDATE albums AS a
+        SET cover_hash = v.cover_hash, blurhash = v.blurhash,
+            dominant_color = v.dominant_color, cover_variants = v.cover_variants::jsonb
+        FROM (VALUES %s) AS v(id, cover_hash, blurhash, dominant_color, cover_variants)
+        WHERE a.id = v.id
+    """, [
+        (r['id'], r['cover_hash'], r['blurhash'], r['dominant_color'], json.dumps(r['cover_variants']))
+        for r in results
+    ])
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate cover variants, blurhashes and dominant colours.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the cover hash is unchanged")
+    parser.add_argument("--batch-size", type=int, default=200, help="Rows per DB write")
+    args = parser.parse_args()
+
+    os.makedirs(VARIANTS_DIR, exist_ok=True)
+    print(f"Formats: {', '.join(FORMATS)}; widths: {', '.join(map(str, VARIANT_WIDTHS))}")
+
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute("SELECT id, image_path, cover_hash FROM albums WHERE image_path IS NOT NULL")
+    jobs = []
+    for album_id, image_path, cover_hash in c.fetchall():
+        src_path = os.path.join(COVERS_DIR, image_path.replace('covers/', '', 1))
+        if os.path.exists(src_path):
+            jobs.append((album_id, src_path, cover_hash, args.force))
+    print(f"Checking {len(jobs)} covers...")
+
+    pending = []
+    processed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for result in executor.map(process_cover, jobs, chunksize=8):
+            if result is None:
+                continue
+            pending.append(result)
+            if len(pending) >= args.batch_size:
+                save_results(conn, pending)
+                processed += len(pending)
+                print(f"Processed {processed} covers...")
+                pending = []
+
+    if pending:
+        save_results(conn, pending)
+        processed += len(pending)
+
+    conn.close()
+    print(f"Done. {processed} covers (re)built, {len(jobs) - processed} unchanged or failed.")
+
+
+if __name__ == "__main__":
+    main()
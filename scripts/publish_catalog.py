@@ -0,0 +1,70 @@
+import argparse
+import os
+import sys
+from contextlib import closing
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+from _catalog_mmap import CATALOG_PATH, write_catalog
+
+# Publish the memory-mapped catalog read by the API workers (run after each
+# scrape). The file is written next to the old one and renamed over it, so
+# running workers switch to it within a few seconds without a restart.
+#
+# Usage: python scripts/publish_catalog.py [--path data/catalog.bin]
+
+def get_db_connection():
+    # Load .env.local manually
+    env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env.local')
+    if os.path.exists(env_path):
+        with open(env_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    key, value = line.split('=', 1)
+                    if key not in os.environ:
+                        os.environ[key] = value.strip('"').strip("'")
+
+    return psycopg2.connect(
+        host=os.environ.get("POSTGRES_HOST"),
+        database=os.environ.get("POSTGRES_DATABASE"),
+        user=os.environ.get("POSTGRES_USER"),
+        password=os.environ.get("POSTGRES_PASSWORD"),
+        port=os.environ.get("POSTGRES_PORT", "5432")
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the catalog file mapped by the API workers.")
+    parser.add_argument("--path", default=CATALOG_PATH, help="Catalog file to replace")
+    args = parser.parse_args()
+
+    with closing(get_db_connection()) as conn:
+        c = conn.cursor(cursor_factory=RealDictCursor)
+        # One snapshot for all four reads, so albums and their genres agree
+        c.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+        # Same candidates as the home feed: albums with an artist
+        c.execute("""
+            SELECT a.id, a.title, a.artist_id, a.rank, a.release_date, a.rating, a.ratings_count,
+                a.image_path, a.spotify_link, a.youtube_link, a.apple_music_link,
+                a.blurhash, a.dominant_color, a.cover_variants
+            FROM albums a
+            JOIN artists ar ON ar.id = a.artist_id
+        """)
+        albums = c.fetchall()
+        c.execute("SELECT id, name, slug, bio, image_path, location FROM artists")
+        artists = c.fetchall()
+        c.execute("SELECT id, name FROM genres")
+        genres = c.fetchall()
+        c.execute("SELECT album_id, genre_id, is_primary FROM album_genres")
+        album_genres = c.fetchall()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.path)), exist_ok=True)
+    write_catalog(args.path, albums, artists, genres, album_genres)
+    size = os.path.getsize(args.path)
+    print(f"Published {len(albums)} albums, {len(artists)} artists and {len(genres)} genres "
+          f"to {args.path} ({size / 1024:.0f} KiB).")
+
+if __name__ == "__main__":
+    main()
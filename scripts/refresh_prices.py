@@ -0,0 +1,72 @@
+import argparse
+import os
+import sys
+from contextlib import closing
+
+import psycopg2
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+from _discogs import DiscogsClient
+from _valuation import REFRESH_BATCH_SIZE, rebuild_collection_value, refresh_prices
+
+# Refresh cached Discogs prices for every collected release (run from cron).
+# The API only refreshes a few of a user's own stale prices each time their
+# collection value is read; this does the bulk and keeps everyone else's
+# totals current too.
+#
+# Usage: python scripts/refresh_prices.py [--max-batches 40] [--rebuild]
+
+def load_env():
+    # Load .env.local manually (DISCOGS_TOKEN lives there too)
+    env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env.local')
+    if os.path.exists(env_path):
+        print(f"Loading environment from {env_path}")
+        with open(env_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    key, value = line.split('=', 1)
+                    if key not in os.environ:
+                        os.environ[key] = value.strip('"').strip("'")
+
+def get_db_connection():
+    return psycopg2.connect(
+        host=os.environ.get("POSTGRES_HOST"),
+        database=os.environ.get("POSTGRES_DATABASE"),
+        user=os.environ.get("POSTGRES_USER"),
+        password=os.environ.get("POSTGRES_PASSWORD"),
+        port=os.environ.get("POSTGRES_PORT", "5432")
+    )
+
+def rebuild_all(conn):
+    """Recompute every stored collection total from scratch."""
+    c = conn.cursor()
+    c.execute("SELECT user_id FROM collection_values")
+    user_ids = [row[0] for row in c.fetchall()]
+    for user_id in user_ids:
+        rebuild_collection_value(c, user_id)
+        conn.commit()
+    print(f"Rebuilt {len(user_ids)} collection totals.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh cached Discogs marketplace prices.")
+    parser.add_argument("--max-batches", type=int, default=None,
+                        help=f"Stop after this many batches of {REFRESH_BATCH_SIZE} releases")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute all collection totals afterwards")
+    args = parser.parse_args()
+
+    load_env()
+    client = DiscogsClient()
+    if not client.token:
+        print("DISCOGS_TOKEN is not set.")
+        sys.exit(1)
+
+    refreshed = refresh_prices(lambda: closing(get_db_connection()), client, max_batches=args.max_batches)
+    print(f"Refreshed {refreshed} prices.")
+
+    if args.rebuild:
+        with closing(get_db_connection()) as conn:
+            rebuild_all(conn)
+
+if __name__ == "__main__":
+    main()
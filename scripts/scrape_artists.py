@@ -1,6 +1,9 @@
+import argparse
+import threading
 import time
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 from bs4 import BeautifulSoup
 from curl_cffi import requests
@@ -8,14 +11,32 @@ from curl_cffi import requests
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import sqlite3
+import psycopg2
+from psycopg2.extras import execute_values
+
+from archive import ARCHIVE_DIR, HtmlArchive, read_object
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+from _artist_pages import rebuild_artist_pages
 
 def get_db_connection():
-    # Connect to local SQLite
-    db_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api", "rym.db")
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    return conn
+    # Load from .env.local or use hardcoded
+    env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env.local")
+    env_vars = {}
+    if os.path.exists(env_path):
+        with open(env_path, 'r') as f:
+            for line in f:
+                if '=' in line and not line.startswith('#'):
+                    key, val = line.strip().split('=', 1)
+                    env_vars[key] = val
+    
+    host = os.environ.get("POSTGRES_HOST", env_vars.get("POSTGRES_HOST", "***REMOVED***"))
+    user = os.environ.get("POSTGRES_USER", env_vars.get("POSTGRES_USER", "myuser"))
+    password = os.environ.get("POSTGRES_PASSWORD", env_vars.get("POSTGRES_PASSWORD", ""))
+    dbname = os.environ.get("POSTGRES_DATABASE", env_vars.get("POSTGRES_DATABASE", "rym_db"))
+    port = os.environ.get("POSTGRES_PORT", env_vars.get("POSTGRES_PORT", "5432"))
+    
+    return psycopg2.connect(host=host, user=user, password=password, dbname=dbname, port=port)
 
 def load_file_content(path):
     if not os.path.exists(path):
@@ -60,7 +81,7 @@ def get_html(url):
         print(f"Error fetching {url}: {e}")
         return None
 
-def scrape_artist_info(artist_name, artist_slug=None):
+def scrape_artist_info(artist_name, artist_slug=None, archive=None, key=None):
     # If we don't have a slug, we might need to search or guess.
     # RYM URLs are usually /artist/name_slug
     if not artist_slug:
@@ -73,9 +94,21 @@ def scrape_artist_info(artist_name, artist_slug=None):
     
     if not html:
         return None
-        
+
+    info = parse_artist_page(html)
+    # Only real artist pages are archived, so a captcha never becomes the latest copy
+    if info is not None and archive is not None:
+        archive.put(url, html, 'artist', key)
+    return info
+
+def parse_artist_page(html):
+    """Bio and image of an artist page, or None if `html` is not one: captcha and
+    challenge pages are served with a 200 too, and must count as a failed fetch."""
     soup = BeautifulSoup(html, 'html.parser')
     print(f"Page Title: {soup.title.string if soup.title else 'No Title'}")
+    if soup.select_one('.artist_name_hdr') is None:
+        print("No artist header found. Possible captcha.")
+        return None
     
     info = {}
 
@@ -104,37 +137,184 @@ def scrape_artist_info(artist_name, artist_slug=None):
             
     return info
 
-def main():
-    conn = get_db_connection()
+def _parse_archived(job):
+    root, aid, sha = job
+    return aid, parse_artist_page(read_object(root, sha))
+
+def reparse_archive(archive, workers=None):
+    """Re-run the artist page parser over the latest archived copy of every artist page."""
+    rows = archive.latest('artist')
+    jobs = [(archive.root, int(key), sha) for url, key, sha in rows if key is not None]
+    print(f"Re-parsing {len(jobs)} archived artist pages...")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_parse_archived, jobs, chunksize=16))
+
+class SharedRateLimiter:
+    """Rate limiter whose schedule lives in Postgres, so every worker process
+    (and every thread in it) shares one request budget against RYM."""
+
+    def __init__(self, name, interval):
+        self.name = name
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.conn = get_db_connection()
+        self.conn.autocommit = True
+        with self.conn.cursor() as c:
+            c.execute("INSERT INTO scrape_rate_limits (name) VALUES (%s) ON CONFLICT (name) DO NOTHING", (name,))
+
+    def wait(self):
+        # Reserve the next free slot atomically and sleep until it starts
+        with self.lock, self.conn.cursor() as c:
+            c.execute("""
+                UPDATE scrape_rate_limits
+                SET next_slot = GREATEST(next_slot, clock_timestamp()) + make_interval(secs => %s)
+                WHERE name = %s
+                RETURNING EXTRACT(EPOCH FROM (next_slot - make_interval(secs => %s) - clock_timestamp()))
+            """, (self.interval, self.name, self.interval))
+            delay = float(c.fetchone()[0])
+        if delay > 0:
+            time.sleep(delay)
+
+    def close(self):
+        self.conn.close()
+
+def claim_batch(conn, batch_size, lease_seconds, max_attempts):
+    """Lease a batch of artists that still need a bio. SKIP LOCKED lets several
+    workers claim concurrently without handing out the same artist twice."""
     c = conn.cursor()
-    
-    # Get artists without bio
-    c.execute("SELECT id, name, slug FROM artists WHERE bio IS NULL")
-    artists = c.fetchall()
-    
-    print(f"Found {len(artists)} artists to scrape.")
-    
-    for row in artists:
-        aid, name, slug = row
+    c.execute("""
+        UPDATE artists
+        SET bio_claimed_until = NOW() + make_interval(secs => %s)
+        WHERE id IN (
+            SELECT id FROM artists
+            WHERE bio IS NULL
+              AND bio_attempts < %s
+              AND (bio_claimed_until IS NULL OR bio_claimed_until < NOW())
+              AND (bio_next_attempt_at IS NULL OR bio_next_attempt_at <= NOW())
+            ORDER BY id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, name, slug, bio_attempts
+    """, (lease_seconds, max_attempts, batch_size))
+    batch = c.fetchall()
+    conn.commit()
+    return batch
+
+def scraped_row(aid, info):
+    """(id, bio, image_url) for save_results. An artist page without a bio still
+    counts as scraped: the empty bio takes the artist off the queue for good."""
+    return aid, info.get('bio') or '', info.get('image_url')
+
+def save_results(conn, scraped, failed):
+    """Write a batch of results in two statements: one for successes, one for failures."""
+    c = conn.cursor()
+    if scraped:
+        # A page without a bio or image never replaces one we already have
+        execute_values(c, """
+            UPDATE artists AS a
+            SET bio = COALESCE(NULLIF(v.bio, ''), a.bio, v.bio),
+                image_path = COALESCE(v.image_path, a.image_path),
+                bio_claimed_until = NULL
+            FROM (VALUES %s) AS v(id, bio, image_path)
+            WHERE a.id = v.id
+        """, scraped)
+    if failed:
+        # Exponential backoff across runs: 1, 2, 4, 8... hours after each failed attempt
+        execute_values(c, """
+            UPDATE artists AS a
+            SET bio_attempts = a.bio_attempts + 1,
+                bio_next_attempt_at = NOW() + make_interval(hours => power(2, a.bio_attempts)::int),
+                bio_claimed_until = NULL
+            FROM (VALUES %s) AS v(id)
+            WHERE a.id = v.id
+        """, [(aid,) for aid in failed])
+    conn.commit()
+
+    if scraped:
+        try:
+            rebuild_artist_pages(conn, [row[0] for row in scraped])
+        except Exception as e:
+            print(f"Error rebuilding artist pages: {e}")
+
+def scrape_with_retry(limiter, name, slug, archive=None, key=None, retries=3):
+    """Parsed artist info, or None if the page could not be fetched."""
+    for attempt in range(retries):
+        limiter.wait()
+        info = scrape_artist_info(name, slug, archive=archive, key=key)
+        if info is not None:
+            return info
+        if attempt < retries - 1:
+            time.sleep(2 ** (attempt + 1))
+    return None
+
+def run_worker(args, archive=None):
+    limiter = SharedRateLimiter("rateyourmusic", args.interval)
+    conn = get_db_connection()
+    total_scraped = 0
+    total_failed = 0
+
+    def process(row):
+        aid, name, slug, attempts = row
         print(f"Processing {name}...")
-        
-        info = scrape_artist_info(name, slug)
-        
-        if info:
-            # Update DB
-            c.execute("""
-                UPDATE artists 
-                SET bio = %s, image_path = %s 
-                WHERE id = %s
-            """, (info.get('bio'), info.get('image_url'), aid))
-            conn.commit()
-            print(f"Updated {name}")
-        else:
-            print(f"Could not scrape info for {name}")
-            
-        time.sleep(2) # Be nice
-        
-    conn.close()
+        return aid, name, scrape_with_retry(limiter, name, slug, archive=archive, key=aid)
+
+    try:
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            while True:
+                batch = claim_batch(conn, args.batch_size, args.lease, args.max_attempts)
+                if not batch:
+                    break
+
+                scraped = []
+                failed = []
+                for aid, name, info in executor.map(process, batch):
+                    if info is not None:
+                        scraped.append(scraped_row(aid, info))
+                    else:
+                        print(f"Could not scrape info for {name}")
+                        failed.append(aid)
+
+                save_results(conn, scraped, failed)
+                total_scraped += len(scraped)
+                total_failed += len(failed)
+                print(f"Batch done: {len(scraped)} updated, {len(failed)} failed "
+                      f"({total_scraped} updated, {total_failed} failed so far)")
+    finally:
+        limiter.close()
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape artist bios and images from RYM.")
+    parser.add_argument("--threads", type=int, default=4, help="Concurrent fetches in this worker")
+    parser.add_argument("--batch-size", type=int, default=20, help="Artists claimed per batch")
+    parser.add_argument("--interval", type=float, default=2.0, help="Minimum seconds between requests, shared by all workers")
+    parser.add_argument("--lease", type=int, default=600, help="Seconds a claimed batch stays reserved")
+    parser.add_argument("--max-attempts", type=int, default=5)
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--no-archive", action="store_true", help="Do not keep raw HTML of fetched pages")
+    parser.add_argument("--from-archive", action="store_true", help="Re-parse archived pages instead of fetching")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes for --from-archive")
+    args = parser.parse_args()
+
+    if args.from_archive:
+        archive = HtmlArchive(args.archive_dir)
+        results = reparse_archive(archive, args.workers)
+        archive.close()
+
+        conn = get_db_connection()
+        save_results(conn, [scraped_row(aid, info) for aid, info in results if info is not None], [])
+        conn.close()
+        print(f"Re-derived {len(results)} artists from {args.archive_dir}.")
+        return
+
+    archive = None if args.no_archive else HtmlArchive(args.archive_dir)
+    try:
+        run_worker(args, archive)
+    finally:
+        if archive is not None:
+            archive.close()
 
 if __name__ == "__main__":
     main()
@@ -1,8 +1,21 @@
-import time
+import argparse
+import hashlib
+import queue
+import threading
 import pandas as pd
 from bs4 import BeautifulSoup
 from curl_cffi import requests
+from concurrent.futures import ProcessPoolExecutor
 import os
+import sys
+
+import cover_store
+from archive import ARCHIVE_DIR, HtmlArchive, read_object
+from cover_downloader import CoverDownloader, apply_known_cover
+from pipeline import STOP, Checkpoint, RateLimiter, Stage, bounded_queue
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+from _artist_pages import rebuild_artist_pages
 
 def load_file_content(path):
     if not os.path.exists(path):
@@ -20,20 +33,38 @@ def get_cookies_dict():
                 cookies[name] = value
     return cookies
 
-def get_html(url):
+def get_html(url, archive=None, key=None):
     user_agent = load_file_content('user_agent.txt')
     cookies = get_cookies_dict()
     
+    headers = {"User-Agent": user_agent}
+
+    # Revalidate against the last archived copy instead of re-downloading it
+    cached = archive.validators(url) if archive is not None else None
+    if cached:
+        if cached['etag']:
+            headers["If-None-Match"] = cached['etag']
+        if cached['last_modified']:
+            headers["If-Modified-Since"] = cached['last_modified']
+
     print(f"Fetching {url}...")
     try:
         response = requests.get(
             url,
             impersonate="chrome120",
             cookies=cookies,
-            headers={"User-Agent": user_agent}
+            headers=headers
         )
         if response.status_code == 200:
+            if archive is not None:
+                archive.put(url, response.text, 'chart', key,
+                            etag=response.headers.get('ETag'),
+                            last_modified=response.headers.get('Last-Modified'))
             return response.text
+        elif response.status_code == 304 and cached:
+            print(f"{url} not modified since last fetch.")
+            archive.record(url, cached['sha256'], 'chart', key, cached['etag'], cached['last_modified'])
+            return archive.get(cached['sha256'])
         else:
             print(f"Failed to fetch {url}. Status: {response.status_code}")
             return None
@@ -66,270 +97,621 @@ def get_db_connection():
 
 # ... (keep existing imports and helper functions)
 
+# Scraped fields that feed the content hash. 'Local Image' is left out on purpose:
+# the hash is checked before covers are downloaded so unchanged items skip both.
+# That only holds while the stored row has its cover, so album_values leaves the
+# hash unset when the cover is missing and the next run retries the download.
+HASH_FIELDS = (
+    'Rank', 'Artist', 'Album', 'Date', 'Rating', 'Ratings Count',
+    'Primary Genres', 'Secondary Genres', 'Image URL', 'Spotify', 'YouTube', 'Apple Music'
+)
+
+def item_hash(item):
+    payload = json.dumps([item.get(field) for field in HASH_FIELDS], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def clean_artist_name(name):
+    return name.replace('*', '').strip()
+
+def load_content_hashes():
+    """Map (artist name, album title) -> content hash of the last write for every album."""
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute('''
+        SELECT ar.name, a.title, a.content_hash
+        FROM albums a
+        JOIN artists ar ON a.artist_id = ar.id
+        WHERE a.content_hash IS NOT NULL AND a.image_path IS NOT NULL
+    ''')
+    hashes = {(name, title): content_hash for name, title, content_hash in c.fetchall()}
+    conn.close()
+    return hashes
+
+def is_unchanged(item, known_hashes):
+    if not item['Artist'] or not item['Album']:
+        return False
+    key = (clean_artist_name(item['Artist']), item['Album'])
+    return known_hashes.get(key) == item_hash(item)
+
+ALBUM_COLUMNS = (
+    'rank', 'release_date', 'rating', 'ratings_count', 'image_path',
+    'spotify_link', 'youtube_link', 'apple_music_link', 'content_hash'
+)
+
+def album_values(item, current_image=None):
+    """Column values for a chart item. A failed or skipped cover download keeps
+    `current_image` (the stored cover) and leaves content_hash unset."""
+    rating = item['Rating']
+    has_cover = bool(item.get('Local Image')) or not item.get('Image URL')
+    return {
+        'rank': item['Rank'],
+        'release_date': item['Date'],
+        'rating': float(rating) if rating else None,
+        'ratings_count': item['Ratings Count'],
+        'image_path': item.get('Local Image') or current_image,
+        'spotify_link': item.get('Spotify'),
+        'youtube_link': item.get('YouTube'),
+        'apple_music_link': item.get('Apple Music'),
+        'content_hash': item_hash(item) if has_cover else None,
+    }
+
+def _same_value(column, old, new):
+    if column == 'rating' and old is not None and new is not None:
+        # rating is a REAL column, compare at the precision RYM publishes
+        return abs(old - new) < 1e-4
+    return old == new
+
 def save_to_db(items):
     conn = get_db_connection()
     c = conn.cursor()
-    
+    stats = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'failed': 0}
+    touched_artists = set()
+
+    c.execute('SELECT name, id FROM genres')
+    genre_ids = dict(c.fetchall())
+
+    def get_genre_id(genre_name):
+        if genre_name not in genre_ids:
+            c.execute('INSERT INTO genres (name) VALUES (%s) ON CONFLICT (name) DO NOTHING', (genre_name,))
+            c.execute('SELECT id FROM genres WHERE name = %s', (genre_name,))
+            genre_ids[genre_name] = c.fetchone()[0]
+        return genre_ids[genre_name]
+
     for item in items:
+        # Each item gets its own savepoint so one bad row doesn't roll back the batch
+        c.execute('SAVEPOINT save_item')
         try:
-            # Clean artist name
-            artist_name = item['Artist'].replace('*', '').strip()
-            
-            # 1. Insert/Get Artist
-            c.execute('INSERT INTO artists (name) VALUES (%s) ON CONFLICT (name) DO NOTHING', (artist_name,))
+            artist_name = clean_artist_name(item['Artist'])
+
+            # 1. Get/Insert Artist
             c.execute('SELECT id FROM artists WHERE name = %s', (artist_name,))
-            artist_id = c.fetchone()[0]
-            
-            # 2. Check if Album exists
-            c.execute('SELECT id FROM albums WHERE title = %s AND artist_id = %s', (item['Album'], artist_id))
+            row = c.fetchone()
+            if row is None:
+                c.execute('INSERT INTO artists (name) VALUES (%s) ON CONFLICT (name) DO NOTHING', (artist_name,))
+                c.execute('SELECT id FROM artists WHERE name = %s', (artist_name,))
+                row = c.fetchone()
+            artist_id = row[0]
+
+            # 2. Insert the album, or update only the columns that changed
+            c.execute(f'''
+                SELECT id, {', '.join(ALBUM_COLUMNS)}
+                FROM albums WHERE title = %s AND artist_id = %s
+            ''', (item['Album'], artist_id))
             existing_album = c.fetchone()
-            
+
             if existing_album:
                 album_id = existing_album[0]
-                # Update existing album
-                c.execute('''
-                    UPDATE albums 
-                    SET rank = %s, release_date = %s, rating = %s, ratings_count = %s, image_path = %s, spotify_link = %s, youtube_link = %s, apple_music_link = %s
-                    WHERE id = %s
-                ''', (
-                    item['Rank'], item['Date'], item['Rating'], item['Ratings Count'], 
-                    item.get('Local Image'), item.get('Spotify'), item.get('YouTube'), item.get('Apple Music'),
-                    album_id
-                ))
+                current = dict(zip(ALBUM_COLUMNS, existing_album[1:]))
+                values = album_values(item, current['image_path'])
+                changed = {
+                    col: val for col, val in values.items()
+                    if not _same_value(col, current[col], val)
+                }
+                if changed:
+                    assignments = ', '.join(f'{col} = %s' for col in changed)
+                    c.execute(f'UPDATE albums SET {assignments} WHERE id = %s', (*changed.values(), album_id))
             else:
-                # Insert new album
-                c.execute('''
-                    INSERT INTO albums (title, artist_id, rank, release_date, rating, ratings_count, image_path, spotify_link, youtube_link, apple_music_link)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                values = album_values(item)
+                changed = values
+                c.execute(f'''
+                    INSERT INTO albums (title, artist_id, {', '.join(ALBUM_COLUMNS)})
+                    VALUES (%s, %s, {', '.join(['%s'] * len(ALBUM_COLUMNS))})
                     RETURNING id
-                ''', (
-                    item['Album'], artist_id, item['Rank'], item['Date'], item['Rating'], 
-                    item['Ratings Count'], item.get('Local Image'), 
-                    item.get('Spotify'), item.get('YouTube'), item.get('Apple Music')
-                ))
+                ''', (item['Album'], artist_id, *values.values()))
                 album_id = c.fetchone()[0]
-            
-            # 3. Insert Genres and Link to Album
-            # Clear existing genres for this album to avoid stale data
-            c.execute('DELETE FROM album_genres WHERE album_id = %s', (album_id,))
-            
-            # Helper to insert genres
-            def insert_genres(genre_list, is_primary):
-                for genre_name in genre_list:
-                    genre_name = genre_name.strip()
-                    if not genre_name: continue
-                    
-                    c.execute('INSERT INTO genres (name) VALUES (%s) ON CONFLICT (name) DO NOTHING', (genre_name,))
-                    c.execute('SELECT id FROM genres WHERE name = %s', (genre_name,))
-                    genre_id = c.fetchone()[0]
-                    
-                    c.execute('INSERT INTO album_genres (album_id, genre_id, is_primary) VALUES (%s, %s, %s) ON CONFLICT DO NOTHING', 
-                              (album_id, genre_id, is_primary))
-
-            insert_genres(item['Primary Genres'], True)
-            insert_genres(item['Secondary Genres'], False)
-                    
+
+            # 3. Diff genre links instead of rebuilding them (primary wins if listed twice)
+            desired = {}
+            for genre_name in item['Primary Genres']:
+                genre_name = genre_name.strip()
+                if genre_name:
+                    desired[get_genre_id(genre_name)] = True
+            for genre_name in item['Secondary Genres']:
+                genre_name = genre_name.strip()
+                if genre_name:
+                    desired.setdefault(get_genre_id(genre_name), False)
+
+            c.execute('SELECT genre_id, is_primary FROM album_genres WHERE album_id = %s', (album_id,))
+            current_genres = dict(c.fetchall())
+
+            removed = [gid for gid in current_genres if gid not in desired]
+            added = [(album_id, gid, primary) for gid, primary in desired.items() if gid not in current_genres]
+            flipped = [(primary, album_id, gid) for gid, primary in desired.items()
+                       if gid in current_genres and current_genres[gid] != primary]
+
+            if removed:
+                c.execute('DELETE FROM album_genres WHERE album_id = %s AND genre_id = ANY(%s)', (album_id, removed))
+            if added:
+                c.executemany('INSERT INTO album_genres (album_id, genre_id, is_primary) VALUES (%s, %s, %s) ON CONFLICT DO NOTHING', added)
+            if flipped:
+                c.executemany('UPDATE album_genres SET is_primary = %s WHERE album_id = %s AND genre_id = %s', flipped)
+
+            if item.get('Cover Hash'):
+                cover_store.upsert_manifest(c, album_id, item['Cover Hash'], item['Image URL'], item.get('Cover ETag'))
+
+            c.execute('RELEASE SAVEPOINT save_item')
+
+            if not existing_album:
+                stats['inserted'] += 1
+                touched_artists.add(artist_id)
+            elif changed or removed or added or flipped:
+                stats['updated'] += 1
+                touched_artists.add(artist_id)
+            else:
+                stats['unchanged'] += 1
+
         except Exception as e:
             print(f"Error saving item {item['Album']} to DB: {e}")
-            conn.rollback()
+            c.execute('ROLLBACK TO SAVEPOINT save_item')
+            # Genres created inside the failed savepoint are gone again
+            c.execute('SELECT name, id FROM genres')
+            genre_ids = dict(c.fetchall())
+            stats['failed'] += 1
             continue
-            
+
     conn.commit()
+
+    # The writes above invalidated these artists' pages; rebuild them now rather than on first view
+    try:
+        rebuild_artist_pages(conn, touched_artists)
+    except Exception as e:
+        conn.rollback()
+        print(f"Error rebuilding artist pages: {e}")
     conn.close()
-    print("Data saved to database.")
+    print(f"Data saved to database: {stats['inserted']} inserted, {stats['updated']} updated, "
+          f"{stats['unchanged']} unchanged, {stats['failed']} failed.")
+    # Their place in the related-artists graph is refreshed once per run, see refresh_related_artists
+    stats['touched_artists'] = touched_artists
+    return stats
 
-def parse_page(html, start_rank=1):
+def refresh_related_artists(artist_ids):
+    """Patch the related-artists lists of every artist saved this run.
+
+    Each call scores the touched artists against every artist, so it runs once at
+    the end of a run rather than per page, interrupted or not. Only a process that
+    is killed outright skips it; the next full build_related_artists.py catches up."""
+    if not artist_ids:
+        return
+    # Needs numpy and scipy, which nothing else in the scraper does
+    from build_related_artists import update_related_artists
+    conn = get_db_connection()
+    try:
+        changed = update_related_artists(conn, artist_ids)
+        print(f"Related artists updated for {len(artist_ids)} artists ({changed} lists changed).")
+    except Exception as e:
+        conn.rollback()
+        print(f"Error updating related artists: {e}")
+    finally:
+        conn.close()
+
+def normalize_image_url(src):
+    if not src:
+        return None
+    if src.startswith('//'):
+        return f"https:{src}"
+    return src
+
+def parse_media_links(raw):
+    """Turn a .media_link_container data-links JSON blob into (spotify, youtube, apple) URLs."""
+    spotify = None
+    youtube = None
+    apple = None
+
+    if not raw:
+        return spotify, youtube, apple
+
+    try:
+        links_data = json.loads(raw)
+
+        # Spotify
+        if 'spotify' in links_data:
+            for key, val in links_data['spotify'].items():
+                if val.get('default'):
+                    spotify = f"https://open.spotify.com/{val.get('type', 'album')}/{key}"
+                    break
+
+        # YouTube
+        if 'youtube' in links_data:
+            for key, val in links_data['youtube'].items():
+                youtube = f"https://www.youtube.com/watch?v={key}"
+                break
+
+        # Apple Music
+        if 'applemusic' in links_data:
+            for key, val in links_data['applemusic'].items():
+                apple = f"https://music.apple.com/{val.get('loc', 'us')}/album/{val.get('album', '')}/{key}"
+                break
+
+    except Exception as e:
+        print(f"Error parsing links: {e}")
+
+    return spotify, youtube, apple
+
+def make_item(idx, artist, title, date, rating, num_ratings, primary_genres, secondary_genres, img_url, links):
+    spotify, youtube, apple = links
+    return {
+        'Rank': idx,
+        'Artist': artist,
+        'Album': title,
+        'Date': date,
+        'Rating': rating,
+        'Ratings Count': num_ratings,
+        'Primary Genres': primary_genres,
+        'Secondary Genres': secondary_genres,
+        'Genres': ", ".join(primary_genres + secondary_genres), # Keep for backward compat if needed
+        'Image URL': img_url,
+        'Spotify': spotify,
+        'YouTube': youtube,
+        'Apple Music': apple
+    }
+
+def parse_page_bs4(html, start_rank=1):
     soup = BeautifulSoup(html, 'html.parser')
     items = []
-    
+
     chart_items = soup.select('.page_section_charts_item_wrapper')
-    
+
     for idx, item in enumerate(chart_items, start_rank):
         try:
-            # ... (keep existing extraction logic)
             title_elem = item.select_one('.page_charts_section_charts_item_title a.release')
             title = title_elem.get_text(strip=True) if title_elem else None
-            
+
             artist_elem = item.select_one('.page_charts_section_charts_item_credited_links_primary .artist')
             artist = artist_elem.get_text(strip=True) if artist_elem else None
-            
+
             date_elem = item.select_one('.page_charts_section_charts_item_date span')
             date = date_elem.get_text(strip=True) if date_elem else None
-            
+
             rating_elem = item.select_one('.page_charts_section_charts_item_details_average_num')
             rating = rating_elem.get_text(strip=True) if rating_elem else None
-            
+
             num_ratings_elem = item.select_one('.page_charts_section_charts_item_details_ratings .abbr')
             num_ratings = num_ratings_elem.get_text(strip=True) if num_ratings_elem else None
-            
+
             # Genres
-            primary_genres = []
-            secondary_genres = []
-            
-            p_elems = item.select('.page_charts_section_charts_item_genres_primary .genre')
-            for g in p_elems:
-                primary_genres.append(g.get_text(strip=True))
-                
-            s_elems = item.select('.page_charts_section_charts_item_genres_secondary .genre')
-            for g in s_elems:
-                secondary_genres.append(g.get_text(strip=True))
-            
+            primary_genres = [g.get_text(strip=True) for g in item.select('.page_charts_section_charts_item_genres_primary .genre')]
+            secondary_genres = [g.get_text(strip=True) for g in item.select('.page_charts_section_charts_item_genres_secondary .genre')]
+
             # Image URL
             img_elem = item.select_one('.page_charts_section_charts_item_image img')
             img_url = None
             if img_elem:
-                if img_elem.get('data-src'):
-                    src = img_elem.get('data-src')
-                elif img_elem.get('src'):
-                    src = img_elem.get('src')
-                else:
-                    src = None
-                if src:
-                    if src.startswith('//'):
-                        img_url = f"https:{src}"
-                    else:
-                        img_url = src
+                img_url = normalize_image_url(img_elem.get('data-src') or img_elem.get('src'))
 
             # Streaming Links
-            spotify = None
-            youtube = None
-            apple = None
-            
             media_container = item.select_one('.media_link_container')
-            if media_container and media_container.get('data-links'):
-                try:
-                    links_data = json.loads(media_container.get('data-links'))
-                    
-                    # Spotify
-                    if 'spotify' in links_data:
-                        for key, val in links_data['spotify'].items():
-                            if val.get('default'): 
-                                spotify = f"https://open.spotify.com/{val.get('type', 'album')}/{key}"
-                                break
-                    
-                    # YouTube
-                    if 'youtube' in links_data:
-                        for key, val in links_data['youtube'].items():
-                             youtube = f"https://www.youtube.com/watch?v={key}"
-                             break
-
-                    # Apple Music
-                    if 'applemusic' in links_data:
-                         for key, val in links_data['applemusic'].items():
-                             apple = f"https://music.apple.com/{val.get('loc', 'us')}/album/{val.get('album', '')}/{key}"
-                             break
-                              
-                except Exception as e:
-                    print(f"Error parsing links: {e}")
-
-            items.append({
-                'Rank': idx,
-                'Artist': artist,
-                'Album': title,
-                'Date': date,
-                'Rating': rating,
-                'Ratings Count': num_ratings,
-                'Primary Genres': primary_genres,
-                'Secondary Genres': secondary_genres,
-                'Genres': ", ".join(primary_genres + secondary_genres), # Keep for backward compat if needed
-                'Image URL': img_url,
-                'Spotify': spotify,
-                'YouTube': youtube,
-                'Apple Music': apple
-            })
+            links = parse_media_links(media_container.get('data-links') if media_container else None)
+
+            items.append(make_item(
+                idx, artist, title, date, rating, num_ratings,
+                primary_genres, secondary_genres, img_url, links
+            ))
         except Exception as e:
             print(f"Error parsing item {idx}: {e}")
             continue
-            
+
     return items
 
-def download_images(items):
-    if not os.path.exists('covers'):
-    # The original 'covers' directory creation is now handled by the new logic
-    # if not os.path.exists('covers'):
-    #     os.makedirs('covers')
-    
-    print("Downloading covers...")
-    for item in items:
-        if item['Image URL']:
-            try:
-                # Download image
-                if item['Image URL']:
-                    safe_title = "".join([c for c in item['Album'] if c.isalpha() or c.isdigit() or c==' ']).strip()
-                    safe_artist = "".join([c for c in item['Artist'] if c.isalpha() or c.isdigit() or c==' ']).strip()
-                    filename_base = f"{item['Rank']}_{safe_artist}_{safe_title}.jpg".replace(" ", "_")
-                    
-                    # Save to web/public/covers
-                    # Assuming 'user_agent' is available in this scope or globally
-                    # If not, it needs to be passed or defined.
-                    # For this change, we assume it's accessible.
-                    covers_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "web", "public", "covers")
-                    os.makedirs(covers_dir, exist_ok=True)
-                    filepath = os.path.join(covers_dir, filename_base)
-                    
-                    # DB path should be relative to public/ (e.g. covers/foo.jpg) or just foo.jpg if we change get_album
-                    # Current get_album handles 'covers/' prefix.
-                    # Let's store 'covers/filename_base' to match existing data.
-                    db_image_path = f"covers/{filename_base}"
-                    
-                    try:
-                        # Check if file exists
-                        if not os.path.exists(filepath):
-                            img_data = requests.get(item['Image URL'], impersonate="chrome120", headers={"User-Agent": user_agent}).content
-                            with open(filepath, 'wb') as f:
-                                f.write(img_data)
-                            print(f"Downloaded cover for {item['Album']}")
-                        item['Local Image'] = db_image_path
-                    except Exception as e:
-                        print(f"Error downloading image for {item['Album']}: {e}")
-                        item['Local Image'] = None # Corrected 'Nonename' to 'None'
-            except Exception as e:
-                print(f"Error downloading image for {item['Album']}: {e}")
-        
-        # Small delay to be nice
-        time.sleep(0.1)
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+except ImportError:
+    lxml_html = None
+
+def _has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+if lxml_html is not None:
+    # Selector plan, compiled once at import time. Each chart item is walked once;
+    # when the walk reaches one of the section elements below, the matching
+    # handler pulls its field out of that (small) subtree.
+    _XP_WRAPPERS = etree.XPath(f"//*[{_has_class('page_section_charts_item_wrapper')}]")
+    # Same as BeautifulSoup's get_text(strip=True): skip comments and script/style bodies
+    _XP_TEXT = etree.XPath("descendant-or-self::text()[not(ancestor::script or ancestor::style or ancestor::template)]")
+    _XP_RELEASE_LINK = etree.XPath(f".//a[{_has_class('release')}]")
+    _XP_ARTIST = etree.XPath(f".//*[{_has_class('artist')}]")
+    _XP_SPAN = etree.XPath(".//span")
+    _XP_ABBR = etree.XPath(f".//*[{_has_class('abbr')}]")
+    _XP_GENRE = etree.XPath(f".//*[{_has_class('genre')}]")
+    _XP_IMG = etree.XPath(".//img")
+
+def _text(elem):
+    return "".join(s.strip() for s in _XP_TEXT(elem))
+
+def _first_text(elems):
+    return _text(elems[0]) if elems else None
+
+def _section_title(elem, fields):
+    fields.setdefault('title', _first_text(_XP_RELEASE_LINK(elem)))
+
+def _section_artist(elem, fields):
+    fields.setdefault('artist', _first_text(_XP_ARTIST(elem)))
+
+def _section_date(elem, fields):
+    fields.setdefault('date', _first_text(_XP_SPAN(elem)))
+
+def _section_rating(elem, fields):
+    fields.setdefault('rating', _text(elem))
+
+def _section_ratings_count(elem, fields):
+    fields.setdefault('num_ratings', _first_text(_XP_ABBR(elem)))
+
+def _section_primary_genres(elem, fields):
+    fields['primary_genres'].extend(_text(g) for g in _XP_GENRE(elem))
+
+def _section_secondary_genres(elem, fields):
+    fields['secondary_genres'].extend(_text(g) for g in _XP_GENRE(elem))
+
+def _section_image(elem, fields):
+    imgs = _XP_IMG(elem)
+    if imgs and 'img_url' not in fields:
+        fields['img_url'] = normalize_image_url(imgs[0].get('data-src') or imgs[0].get('src'))
+
+def _section_media(elem, fields):
+    fields.setdefault('links', elem.get('data-links'))
+
+_SECTION_HANDLERS = {
+    'page_charts_section_charts_item_title': _section_title,
+    'page_charts_section_charts_item_credited_links_primary': _section_artist,
+    'page_charts_section_charts_item_date': _section_date,
+    'page_charts_section_charts_item_details_average_num': _section_rating,
+    'page_charts_section_charts_item_details_ratings': _section_ratings_count,
+    'page_charts_section_charts_item_genres_primary': _section_primary_genres,
+    'page_charts_section_charts_item_genres_secondary': _section_secondary_genres,
+    'page_charts_section_charts_item_image': _section_image,
+    'media_link_container': _section_media,
+}
+
+def parse_page_lxml(html, start_rank=1):
+    root = lxml_html.fromstring(html)
+    items = []
+
+    for idx, item in enumerate(_XP_WRAPPERS(root), start_rank):
+        try:
+            fields = {'primary_genres': [], 'secondary_genres': []}
+            for elem in item.iter(tag=etree.Element):
+                classes = elem.get('class')
+                if not classes:
+                    continue
+                for cls in classes.split():
+                    handler = _SECTION_HANDLERS.get(cls)
+                    if handler:
+                        handler(elem, fields)
+
+            items.append(make_item(
+                idx, fields.get('artist'), fields.get('title'), fields.get('date'),
+                fields.get('rating'), fields.get('num_ratings'),
+                fields['primary_genres'], fields['secondary_genres'],
+                fields.get('img_url'), parse_media_links(fields.get('links'))
+            ))
+        except Exception as e:
+            print(f"Error parsing item {idx}: {e}")
+            continue
+
+    return items
+
+def parse_page(html, start_rank=1):
+    if lxml_html is not None:
+        return parse_page_lxml(html, start_rank)
+    return parse_page_bs4(html, start_rank)
+
+def load_cover_manifest():
+    conn = get_db_connection()
+    manifest = cover_store.load_manifest(conn)
+    conn.close()
+    return manifest
+
+def download_images(items, concurrency=16, manifest=None):
+    print(f"Downloading {len(items)} covers...")
+    with CoverDownloader(concurrency=concurrency, user_agent=load_file_content('user_agent.txt') or None) as downloader:
+        downloader.download_all(items, manifest)
+
+BASE_URL = "https://rateyourmusic.com/charts/top/album/all-time"
+ITEMS_PER_PAGE = 40
+CHECKPOINT_PATH = "scrape_checkpoint.json"
+
+def page_url(base_url, page):
+    return f"{base_url}/{page}" if page > 1 else base_url
+
+def run_pipeline(base_url, max_pages, checkpoint, fetch_workers=3, fetch_interval=2.0,
+                 cover_workers=16, queue_size=4, archive=None, known_hashes=None,
+                 cover_manifest=None, revalidate_covers=False):
+    """Scrape chart pages through fetch -> parse -> download -> persist stages.
+
+    Fetches run concurrently but never faster than one every `fetch_interval` seconds.
+    A page is only marked complete in the checkpoint after its items are committed.
+    Items whose content hash matches `known_hashes` are dropped before download.
+    Related artists are refreshed once at the end, even if the run stopped early
+    (see refresh_related_artists)."""
+    known_hashes = known_hashes or {}
+    limiter = RateLimiter(fetch_interval)
+    halt = threading.Event()
+    all_items = []
+    touched_artists = set()
+
+    pages_q = queue.Queue()
+    parse_q = bounded_queue(queue_size)
+    download_q = bounded_queue(queue_size)
+    persist_q = bounded_queue(queue_size)
+
+    def fetch(page, emit):
+        if halt.is_set():
+            return
+        limiter.wait()
+        html = get_html(page_url(base_url, page), archive=archive, key=page)
+        if html is None:
+            print(f"Failed to retrieve page {page}. Stopping.")
+            halt.set()
+            return
+        emit((page, html))
+
+    def parse(payload, emit):
+        page, html = payload
+        start_rank = (page - 1) * ITEMS_PER_PAGE + 1
+        items = parse_page(html, start_rank)
+        if not items:
+            print(f"No items found on page {page}. Possible captcha or end of list.")
+            halt.set()
+            return
+        pending = [
+            item for item in items
+            if not checkpoint.item_done(item['Rank']) and not is_unchanged(item, known_hashes)
+        ]
+        print(f"Found {len(items)} items on page {page}, {len(pending)} new or changed.")
+        emit((page, pending))
+
+    # One shared async session for every cover; this stage just hands it a page at a time
+    downloader = CoverDownloader(
+        concurrency=cover_workers,
+        user_agent=load_file_content('user_agent.txt') or None,
+    ).start()
+
+    def download(payload, emit):
+        page, items = payload
+        downloader.download_all(items, cover_manifest, revalidate_covers)
+        emit((page, items))
+
+    def persist(payload, emit):
+        page, items = payload
+        if items:
+            touched_artists.update(save_to_db(items)['touched_artists'])
+            checkpoint.mark_items([item['Rank'] for item in items])
+            all_items.extend(items)
+        checkpoint.mark_page(page)
+        print(f"--- Page {page}/{max_pages} done ---")
+
+    # A page lost to an exception (e.g. the DB is down) must not count as done
+    def stage_failed(e):
+        halt.set()
+
+    stages = [
+        Stage("fetch", fetch, pages_q, parse_q, workers=fetch_workers, on_error=stage_failed),
+        Stage("parse", parse, parse_q, download_q, on_error=stage_failed),
+        Stage("download", download, download_q, persist_q, on_error=stage_failed),
+        Stage("persist", persist, persist_q, on_error=stage_failed),
+    ]
+    for stage in stages:
+        stage.start()
+
+    for page in range(1, max_pages + 1):
+        if not checkpoint.page_done(page):
+            pages_q.put(page)
+    pages_q.put(STOP)
+
+    for stage in stages:
+        stage.join()
+    downloader.close()
+    refresh_related_artists(touched_artists)
+
+    return all_items, not halt.is_set() and not any(stage.failed for stage in stages)
+
+def _parse_archived(job):
+    root, page, sha = job
+    start_rank = (page - 1) * ITEMS_PER_PAGE + 1
+    return parse_page(read_object(root, sha), start_rank)
+
+def reparse_archive(archive, workers=None):
+    """Re-run parse_page over the latest archived copy of every chart page, without the network."""
+    rows = archive.latest('chart')
+    jobs = [(archive.root, int(key), sha) for url, key, sha in rows if key is not None]
+    print(f"Re-parsing {len(jobs)} archived chart pages...")
+
+    all_items = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for items in executor.map(_parse_archived, jobs, chunksize=4):
+            all_items.extend(items)
+    all_items.sort(key=lambda item: item['Rank'])
+
+    known_hashes = load_content_hashes()
+    all_items = [item for item in all_items if not is_unchanged(item, known_hashes)]
+    print(f"{len(all_items)} items new or changed.")
+
+    # No downloads in this mode: keep pointing at covers that are already stored
+    manifest = load_cover_manifest()
+    for item in all_items:
+        known = manifest.get(item['Image URL'])
+        if known:
+            apply_known_cover(item, known)
+
+    return all_items
 
 def main():
+    parser = argparse.ArgumentParser(description="Scrape the RYM all-time album chart.")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--pages", type=int, default=125, help="Number of chart pages (40 items each)")
+    parser.add_argument("--fetch-workers", type=int, default=3)
+    parser.add_argument("--fetch-interval", type=float, default=2.0, help="Minimum seconds between page fetches")
+    parser.add_argument("--cover-workers", type=int, default=16, help="Concurrent cover downloads")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--reset", action="store_true", help="Ignore any existing checkpoint")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--no-archive", action="store_true", help="Do not keep raw HTML of fetched pages")
+    parser.add_argument("--from-archive", action="store_true", help="Re-parse archived pages instead of fetching")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes for --from-archive")
+    parser.add_argument("--revalidate-covers", action="store_true", help="Re-check known covers by ETag")
+    args = parser.parse_args()
+
+    if args.from_archive:
+        archive = HtmlArchive(args.archive_dir)
+        all_items = reparse_archive(archive, args.workers)
+        archive.close()
+        if all_items:
+            refresh_related_artists(save_to_db(all_items)['touched_artists'])
+            print(f"Re-derived {len(all_items)} items from {args.archive_dir}.")
+        else:
+            print("No archived chart pages found.")
+        return
+
     # Check if cookie exists
     if not load_file_content('cookie.txt'):
         print("Error: cookie.txt is missing or empty. Please add your RYM cookie.")
         return
 
-    base_url = "https://rateyourmusic.com/charts/top/album/all-time"
-    
-    all_items = []
-    max_pages = 125 # 5000 items / 40 per page
-    
-    for page in range(1, max_pages + 1):
-        print(f"--- Processing Page {page}/{max_pages} ---")
-        url = f"{base_url}/{page}" if page > 1 else base_url
-        
-        html = get_html(url)
-        if html:
-            # Calculate start rank for this page
-            start_rank = (page - 1) * 40 + 1
-            items = parse_page(html, start_rank)
-            
-            if items:
-                print(f"Found {len(items)} items on page {page}.")
-                
-                # Process immediately to save progress
-                download_images(items)
-                save_to_db(items)
-                
-                all_items.extend(items)
-            else:
-                print(f"No items found on page {page}. Possible captcha or end of list.")
-                break
-                
-            if page < max_pages:
-                sleep_time = 5
-                print(f"Sleeping for {sleep_time} seconds...")
-                time.sleep(sleep_time)
-        else:
-            print("Failed to retrieve HTML. Stopping.")
-            break
-            
+    checkpoint = Checkpoint(args.checkpoint)
+    if args.reset:
+        checkpoint.clear()
+
+    archive = None if args.no_archive else HtmlArchive(args.archive_dir)
+
+    all_items, completed = run_pipeline(
+        args.base_url, args.pages, checkpoint,
+        fetch_workers=args.fetch_workers,
+        fetch_interval=args.fetch_interval,
+        cover_workers=args.cover_workers,
+        archive=archive,
+        known_hashes=load_content_hashes(),
+        cover_manifest=load_cover_manifest(),
+        revalidate_covers=args.revalidate_covers,
+    )
+    if archive is not None:
+        archive.close()
+
+    if completed:
+        # Every page is in the DB, the next run should start from scratch
+        checkpoint.clear()
+    else:
+        print(f"Run interrupted. Re-run to resume from {args.checkpoint}.")
+
     if all_items:
         # Optional: still save CSV for backup
         df = pd.DataFrame(all_items)
@@ -44,12 +44,78 @@ def update_schema():
                 year TEXT,
                 thumb_url TEXT,
                 notes TEXT,
-                added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                added_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                CONSTRAINT collection_items_user_discogs_key UNIQUE (user_id, discogs_id)
             );
         """)
         
-        # Create index for faster lookups
-        c.execute("CREATE INDEX IF NOT EXISTS idx_collection_user ON collection_items(user_id);")
+        # Keyset pagination index for the collection listing
+        c.execute("""
+            CREATE INDEX IF NOT EXISTS idx_collection_user_added
+            ON collection_items(user_id, added_at DESC, id DESC);
+        """)
+
+        print("Creating import_jobs table...")
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS import_jobs (
+                id SERIAL PRIMARY KEY,
+                user_id INTEGER NOT NULL REFERENCES users(id),
+                discogs_username TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                next_page INTEGER NOT NULL DEFAULT 1,
+                total_pages INTEGER,
+                total_items INTEGER,
+                items_imported INTEGER NOT NULL DEFAULT 0,
+                items_added INTEGER NOT NULL DEFAULT 0,
+                items_updated INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                worker_token TEXT,
+                heartbeat_at TIMESTAMP,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                finished_at TIMESTAMP
+            );
+        """)
+        c.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_import_jobs_active
+            ON import_jobs(user_id) WHERE status IN ('queued', 'running');
+        """)
+
+        print("Creating valuation tables...")
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS discogs_prices (
+                discogs_id INTEGER PRIMARY KEY,
+                value NUMERIC(10, 2),
+                suggested_price NUMERIC(10, 2),
+                lowest_price NUMERIC(10, 2),
+                num_for_sale INTEGER,
+                currency TEXT,
+                error TEXT,
+                fetched_at TIMESTAMP,
+                failed_at TIMESTAMP
+            );
+        """)
+        c.execute("CREATE INDEX IF NOT EXISTS idx_discogs_prices_fetched ON discogs_prices(fetched_at NULLS FIRST);")
+        # Failed lookups are retried after a short delay instead of the full TTL
+        c.execute("ALTER TABLE discogs_prices ADD COLUMN IF NOT EXISTS failed_at TIMESTAMP;")
+        # Shared Discogs request budget (see api/_valuation.py)
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS scrape_rate_limits (
+                name TEXT PRIMARY KEY,
+                next_slot TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            );
+        """)
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS collection_values (
+                user_id INTEGER PRIMARY KEY REFERENCES users(id),
+                total NUMERIC(12, 2) NOT NULL DEFAULT 0,
+                priced_items INTEGER NOT NULL DEFAULT 0,
+                item_count INTEGER NOT NULL DEFAULT 0,
+                currency TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        c.execute("CREATE INDEX IF NOT EXISTS idx_collection_discogs ON collection_items(discogs_id);")
         
         conn.commit()
         print("Schema updated successfully.")
@@ -6,6 +6,7 @@ import * as motion from 'framer-motion/client';
 
 import { Album } from '@/types';
 import AlbumDetailClient from '@/components/AlbumDetailClient';
+import AlbumGrid from '@/components/AlbumGrid';
 import { getApiBaseUrl } from '@/lib/api-config';
 
 async function getAlbum(id: string) {
@@ -18,9 +19,23 @@ async function getAlbum(id: string) {
     return res.json();
 }
 
+async function getSimilarAlbums(id: string): Promise<Album[]> {
+    const baseUrl = getApiBaseUrl();
+    try {
+        const res = await fetch(`${baseUrl}/api/albums/${id}/similar`, { cache: 'no-store' });
+        if (!res.ok) return [];
+        const data = await res.json();
+        return data.albums;
+    } catch (error) {
+        // "More like this" is optional: the page renders without it
+        console.error('Error fetching similar albums:', error);
+        return [];
+    }
+}
+
 export default async function AlbumDetail({ params }: { params: Promise<{ id: string }> }) {
     const { id } = await params;
-    const album = await getAlbum(id);
+    const [album, similarAlbums] = await Promise.all([getAlbum(id), getSimilarAlbums(id)]);
 
     if (!album) {
         notFound();
@@ -202,6 +217,19 @@ export default async function AlbumDetail({ params }: { params: Promise<{ id: st
                         ) : null}
                     </motion.div>
                 )}
+
+                {/* More Like This */}
+                {similarAlbums.length > 0 && (
+                    <motion.div
+                        initial={{ opacity: 0, y: 40 }}
+                        animate={{ opacity: 1, y: 0 }}
+                        transition={{ delay: 1.0, duration: 0.8 }}
+                        className="mt-16"
+                    >
+                        <h3 className="text-2xl font-bold mb-6 text-white">More Like This</h3>
+                        <AlbumGrid allAlbums={similarAlbums} disableInfiniteScroll />
+                    </motion.div>
+                )}
             </div>
         </main>
     );
@@ -8,7 +8,7 @@ import AlbumGrid from '@/components/AlbumGrid';
 import ArtistBio from '@/components/ArtistBio';
 import DiscographySection from '@/components/DiscographySection';
 import { getApiBaseUrl } from '@/lib/api-config';
-import { Artist } from '@/types';
+import { Artist, RelatedArtist } from '@/types';
 
 interface PageProps {
     params: Promise<{ id: string }>;
@@ -36,6 +36,22 @@ async function getArtist(id: string): Promise<Artist> {
     return res.json();
 }
 
+async function getRelatedArtists(id: string): Promise<RelatedArtist[]> {
+    const baseUrl = getApiBaseUrl();
+    try {
+        const res = await fetch(`${baseUrl}/api/artists/${id}/related`, {
+            next: { revalidate: 3600 },
+        });
+        if (!res.ok) return [];
+        const data = await res.json();
+        return data.artists;
+    } catch (error) {
+        // Related artists are optional: the page renders without them
+        console.error('Error fetching related artists:', error);
+        return [];
+    }
+}
+
 export async function generateMetadata({ params }: PageProps): Promise<Metadata> {
     try {
         const { id } = await params;
@@ -54,6 +70,7 @@ export async function generateMetadata({ params }: PageProps): Promise<Metadata>
 export default async function ArtistPage({ params }: PageProps) {
     const { id } = await params;
     let artist: Artist;
+    const relatedPromise = getRelatedArtists(id);
 
     try {
         artist = await getArtist(id);
@@ -70,6 +87,8 @@ export default async function ArtistPage({ params }: PageProps) {
         );
     }
 
+    const relatedArtists = await relatedPromise;
+
     return (
         <main className="min-h-screen bg-zinc-950 text-zinc-100 relative overflow-x-hidden">
             {/* Fixed Background Layer */}
@@ -171,6 +190,42 @@ export default async function ArtistPage({ params }: PageProps) {
                 >
                     <DiscographySection albums={artist.albums} />
                 </motion.div>
+
+                {/* Related Artists */}
+                {relatedArtists.length > 0 && (
+                    <motion.div
+                        initial={{ opacity: 0, y: 40 }}
+                        animate={{ opacity: 1, y: 0 }}
+                        transition={{ delay: 0.8, duration: 0.8 }}
+                        className="mt-8"
+                    >
+                        <h2 className="text-3xl font-bold tracking-tight text-white mb-8 border-b border-white/10 pb-4">Related Artists</h2>
+                        <div className="grid grid-cols-3 sm:grid-cols-4 md:grid-cols-6 gap-6">
+                            {relatedArtists.map((related) => (
+                                <Link key={related.id} href={`/artist/${related.id}`} className="group">
+                                    <div className="aspect-square relative rounded-full overflow-hidden ring-1 ring-white/10 mb-3 bg-zinc-900">
+                                        {related.image_path ? (
+                                            <Image
+                                                src={related.image_path}
+                                                alt={related.name}
+                                                fill
+                                                className="object-cover transition-transform duration-500 group-hover:scale-105"
+                                                sizes="(max-width: 768px) 33vw, 16vw"
+                                            />
+                                        ) : (
+                                            <div className="w-full h-full flex items-center justify-center text-zinc-500 text-2xl font-bold">
+                                                {related.name.charAt(0)}
+                                            </div>
+                                        )}
+                                    </div>
+                                    <p className="text-center text-sm text-zinc-300 group-hover:text-white transition-colors truncate">
+                                        {related.name}
+                                    </p>
+                                </Link>
+                            ))}
+                        </div>
+                    </motion.div>
+                )}
             </div>
         </main>
     );
@@ -7,12 +7,34 @@ import CollectionManager from '@/components/CollectionManager';
 import { Album } from '@/types';
 import { getApiBaseUrl } from '@/lib/api-config';
 
+type LikeSort = 'recent' | 'rank';
+
+interface LikesPage {
+    albums: Album[];
+    next_cursor: string | null;
+    total: number;
+}
+
 export default function ProfilePage() {
     const [user, setUser] = useState<{ id: number; username: string } | null>(null);
     const [likedAlbums, setLikedAlbums] = useState<Album[]>([]);
+    const [likeTotal, setLikeTotal] = useState(0);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
+    const [sort, setSort] = useState<LikeSort>('recent');
     const [loading, setLoading] = useState(true);
+    const [loadingMore, setLoadingMore] = useState(false);
     const router = useRouter();
 
+    const fetchLikes = async (userId: number, sortBy: LikeSort, cursor?: string | null) => {
+        const params = new URLSearchParams({ sort: sortBy });
+        if (cursor) params.set('cursor', cursor);
+        const res = await fetch(`${getApiBaseUrl()}/api/users/${userId}/likes?${params}`);
+        if (!res.ok) {
+            throw new Error('Failed to fetch liked albums');
+        }
+        return res.json() as Promise<LikesPage>;
+    };
+
     useEffect(() => {
         // Check if user is logged in
         const userStr = localStorage.getItem('user');
@@ -24,23 +46,13 @@ export default function ProfilePage() {
         const userData = JSON.parse(userStr);
         setUser(userData);
 
-        // Fetch liked albums
+        // Fetch the first page of liked albums
         const fetchLikedAlbums = async () => {
             try {
-                const baseUrl = getApiBaseUrl();
-                const res = await fetch(`${baseUrl}/api/users/${userData.id}/likes`);
-
-                if (!res.ok) {
-                    throw new Error('Failed to fetch liked albums');
-                }
-
-                const data = await res.json();
-                // Add is_liked property since these are all liked albums
-                const albumsWithLikedStatus = data.map((album: Album) => ({
-                    ...album,
-                    is_liked: true
-                }));
-                setLikedAlbums(albumsWithLikedStatus);
+                const data = await fetchLikes(userData.id, sort);
+                setLikedAlbums(data.albums);
+                setLikeTotal(data.total);
+                setNextCursor(data.next_cursor);
             } catch (error) {
                 console.error('Error fetching liked albums:', error);
             } finally {
@@ -49,7 +61,21 @@ export default function ProfilePage() {
         };
 
         fetchLikedAlbums();
-    }, [router]);
+    }, [router, sort]);
+
+    const loadMore = async () => {
+        if (!user || !nextCursor || loadingMore) return;
+        setLoadingMore(true);
+        try {
+            const data = await fetchLikes(user.id, sort, nextCursor);
+            setLikedAlbums(prev => [...prev, ...data.albums]);
+            setNextCursor(data.next_cursor);
+        } catch (error) {
+            console.error('Error fetching liked albums:', error);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
 
     if (loading) {
         return (
@@ -70,7 +96,7 @@ export default function ProfilePage() {
                         {user?.username}'s Profile
                     </h1>
                     <p className="text-gray-400">
-                        {likedAlbums.length} {likedAlbums.length === 1 ? 'album' : 'albums'} liked
+                        {likeTotal} {likeTotal === 1 ? 'album' : 'albums'} liked
                     </p>
                 </div>
 
@@ -79,12 +105,22 @@ export default function ProfilePage() {
                     <CollectionManager />
                 </div>
 
-                <h2 className="text-2xl font-bold mb-6 flex items-center gap-2">
-                    <svg className="w-6 h-6 text-red-500" fill="currentColor" viewBox="0 0 24 24">
-                        <path d="M12 21.35l-1.45-1.32C5.4 15.36 2 12.28 2 8.5 2 5.42 4.42 3 7.5 3c1.74 0 3.41.81 4.5 2.09C13.09 3.81 14.76 3 16.5 3 19.58 3 22 5.42 22 8.5c0 3.78-3.4 6.86-8.55 11.54L12 21.35z" />
-                    </svg>
-                    Liked Albums
-                </h2>
+                <div className="flex items-center justify-between mb-6">
+                    <h2 className="text-2xl font-bold flex items-center gap-2">
+                        <svg className="w-6 h-6 text-red-500" fill="currentColor" viewBox="0 0 24 24">
+                            <path d="M12 21.35l-1.45-1.32C5.4 15.36 2 12.28 2 8.5 2 5.42 4.42 3 7.5 3c1.74 0 3.41.81 4.5 2.09C13.09 3.81 14.76 3 16.5 3 19.58 3 22 5.42 22 8.5c0 3.78-3.4 6.86-8.55 11.54L12 21.35z" />
+                        </svg>
+                        Liked Albums
+                    </h2>
+                    <select
+                        value={sort}
+                        onChange={(e) => setSort(e.target.value as LikeSort)}
+                        className="bg-white/5 border border-white/10 rounded-lg px-3 py-1.5 text-sm text-white/80"
+                    >
+                        <option value="recent">Recently liked</option>
+                        <option value="rank">Chart rank</option>
+                    </select>
+                </div>
 
                 {/* Liked Albums Grid */}
                 {likedAlbums.length > 0 ? (
@@ -93,7 +129,21 @@ export default function ProfilePage() {
                             <AlbumCard key={album.id} album={album} />
                         ))}
                     </div>
-                ) : (
+                ) : null}
+
+                {nextCursor && (
+                    <div className="flex justify-center mt-8">
+                        <button
+                            onClick={loadMore}
+                            disabled={loadingMore}
+                            className="px-6 py-2 text-sm text-white/60 hover:text-white border border-white/10 rounded-full transition-colors disabled:opacity-50"
+                        >
+                            {loadingMore ? 'Loading...' : 'Load more'}
+                        </button>
+                    </div>
+                )}
+
+                {likedAlbums.length > 0 ? null : (
                     <div className="text-center py-20 bg-white/5 rounded-xl border border-white/10">
                         <svg
                             className="w-24 h-24 mx-auto mb-6 text-gray-700"
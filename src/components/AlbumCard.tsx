@@ -6,6 +6,7 @@ import Link from 'next/link';
 import { useRouter } from 'next/navigation';
 import { Album } from '@/types';
 import { getApiBaseUrl } from '@/lib/api-config';
+import { GRID_IMAGE_SIZES, toSrcSet } from '@/lib/cover-variants';
 
 export default function AlbumCard({ album }: { album: Album }) {
     const router = useRouter();
@@ -53,12 +54,21 @@ export default function AlbumCard({ album }: { album: Album }) {
             onMouseLeave={() => setIsHovered(false)}
         >
             {album.image_path ? (
-                <img
-                    src={album.image_path}
-                    alt={album.title}
-                    className="object-cover w-full h-full transition-transform duration-500 group-hover:scale-110"
-                    loading="lazy"
-                />
+                <picture>
+                    {album.image_variants?.avif && (
+                        <source type="image/avif" srcSet={toSrcSet(album.image_variants.avif)} sizes={GRID_IMAGE_SIZES} />
+                    )}
+                    {album.image_variants?.webp && (
+                        <source type="image/webp" srcSet={toSrcSet(album.image_variants.webp)} sizes={GRID_IMAGE_SIZES} />
+                    )}
+                    <img
+                        src={album.image_path}
+                        alt={album.title}
+                        className="object-cover w-full h-full transition-transform duration-500 group-hover:scale-110"
+                        style={album.dominant_color ? { backgroundColor: album.dominant_color } : undefined}
+                        loading="lazy"
+                    />
+                </picture>
             ) : (
                 <div className="w-full h-full flex items-center justify-center text-gray-700 text-xs">
                     No Cover
@@ -1,8 +1,9 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
 import Image from 'next/image';
 import DiscogsSearch from './DiscogsSearch';
-import { X, Plus, Trash2, Disc } from 'lucide-react';
+import { X, Plus, Trash2, Disc, Download } from 'lucide-react';
+import { Me, UserSettings } from '@/types';
 
 interface CollectionItem {
     id: number;
@@ -15,15 +16,44 @@ interface CollectionItem {
     added_at: string;
 }
 
+interface ImportJob {
+    id: number;
+    status: 'queued' | 'running' | 'completed' | 'failed';
+    items_imported: number;
+    total_items: number | null;
+    error: string | null;
+}
+
+interface CollectionValue {
+    total: number;
+    priced_items: number;
+    item_count: number;
+    currency: string;
+    refreshing: boolean;
+}
+
+interface CollectionPage {
+    items: CollectionItem[];
+    next_cursor: string | null;
+    total: number | null;
+}
+
 export default function CollectionManager() {
     const [items, setItems] = useState<CollectionItem[]>([]);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
+    const [total, setTotal] = useState(0);
     const [loading, setLoading] = useState(true);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [showAddModal, setShowAddModal] = useState(false);
     const [initialSearch, setInitialSearch] = useState('');
     const [errorMessage, setErrorMessage] = useState('');
     const [successMessage, setSuccessMessage] = useState('');
-    const [settings, setSettings] = useState({ collection_mode: true, valuation_mode: false, price_comparison_mode: false });
+    const [settings, setSettings] = useState<UserSettings>({ collection_mode: true, valuation_mode: false, price_comparison_mode: false });
     const [settingsLoaded, setSettingsLoaded] = useState(false);
+    const [importJob, setImportJob] = useState<ImportJob | null>(null);
+    const importTimer = useRef<ReturnType<typeof setTimeout> | null>(null);
+    const [collectionValue, setCollectionValue] = useState<CollectionValue | null>(null);
+    const valueTimer = useRef<ReturnType<typeof setTimeout> | null>(null);
 
     const fetchCollection = async () => {
         try {
@@ -31,9 +61,12 @@ export default function CollectionManager() {
                 credentials: 'include'
             });
             if (res.ok) {
-                const data = await res.json();
-                setItems(data);
+                const data: CollectionPage = await res.json();
+                setItems(data.items);
+                setNextCursor(data.next_cursor);
+                setTotal(data.total ?? data.items.length);
             }
+            if (settings.valuation_mode) fetchValue();
         } catch (error) {
             console.error('Failed to fetch collection', error);
         } finally {
@@ -41,24 +74,118 @@ export default function CollectionManager() {
         }
     };
 
+    const loadMore = async () => {
+        if (!nextCursor || loadingMore) return;
+        setLoadingMore(true);
+        try {
+            const params = new URLSearchParams({ cursor: nextCursor });
+            const res = await fetch(`${process.env.NEXT_PUBLIC_API_URL || ''}/api/collection?${params}`, {
+                credentials: 'include'
+            });
+            if (res.ok) {
+                const data: CollectionPage = await res.json();
+                setItems(prevItems => [...prevItems, ...data.items]);
+                setNextCursor(data.next_cursor);
+            }
+        } catch (error) {
+            console.error('Failed to load more of the collection', error);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
+    useEffect(() => () => {
+        if (importTimer.current) clearTimeout(importTimer.current);
+        if (valueTimer.current) clearTimeout(valueTimer.current);
+    }, []);
+
+    const fetchValue = async () => {
+        try {
+            const res = await fetch(`${process.env.NEXT_PUBLIC_API_URL || ''}/api/collection/value`, {
+                credentials: 'include'
+            });
+            if (!res.ok) return;
+            const data: CollectionValue = await res.json();
+            setCollectionValue(data);
+            // Prices are being fetched in the background: pick up the new total shortly
+            if (valueTimer.current) clearTimeout(valueTimer.current);
+            if (data.refreshing) {
+                valueTimer.current = setTimeout(fetchValue, 5000);
+            }
+        } catch (error) {
+            console.error('Failed to fetch collection value', error);
+        }
+    };
+
+    const pollImport = async (jobId: number) => {
+        try {
+            const res = await fetch(`${process.env.NEXT_PUBLIC_API_URL || ''}/api/collection/import/${jobId}`, {
+                credentials: 'include'
+            });
+            if (!res.ok) return;
+            const job: ImportJob = await res.json();
+            setImportJob(job);
+            if (job.status === 'queued' || job.status === 'running') {
+                importTimer.current = setTimeout(() => pollImport(jobId), 2000);
+            } else if (job.status === 'completed') {
+                fetchCollection();
+                setSuccessMessage(`Imported ${job.items_imported} items from Discogs`);
+                setTimeout(() => setSuccessMessage(''), 3000);
+                setImportJob(null);
+            } else {
+                setErrorMessage(job.error || 'Discogs import failed');
+                setTimeout(() => setErrorMessage(''), 3000);
+                setImportJob(null);
+            }
+        } catch (error) {
+            console.error('Failed to poll import', error);
+        }
+    };
+
+    const handleImport = async () => {
+        const username = window.prompt('Discogs username to import from:');
+        if (!username) return;
+
+        try {
+            const res = await fetch(`${process.env.NEXT_PUBLIC_API_URL || ''}/api/collection/import`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                credentials: 'include',
+                body: JSON.stringify({ username }),
+            });
+            const data = await res.json();
+            if (!res.ok) {
+                throw new Error(data.detail || 'Failed to start import');
+            }
+            setImportJob(data);
+            pollImport(data.id);
+        } catch (error) {
+            console.error('Failed to start import', error);
+            setErrorMessage(error instanceof Error ? error.message : 'Failed to start import');
+            setTimeout(() => setErrorMessage(''), 3000);
+        }
+    };
+
     useEffect(() => {
         const init = async () => {
             try {
                 const baseUrl = process.env.NEXT_PUBLIC_API_URL || '';
 
-                // Fetch settings first
-                const settingsRes = await fetch(`${baseUrl}/api/settings`, { credentials: 'include' });
-                if (settingsRes.ok) {
-                    const settingsData = await settingsRes.json();
-                    setSettings(settingsData);
+                // Settings and the first page in parallel; the page is dropped if collections are off
+                const [meRes, colRes] = await Promise.all([
+                    fetch(`${baseUrl}/api/me`, { credentials: 'include' }),
+                    fetch(`${baseUrl}/api/collection`, { credentials: 'include' }),
+                ]);
+                if (meRes.ok) {
+                    const me: Me = await meRes.json();
+                    setSettings(me.settings);
+                    setTotal(me.collection_count);
 
-                    // Only fetch collection if enabled
-                    if (settingsData.collection_mode) {
-                        const colRes = await fetch(`${baseUrl}/api/collection`, { credentials: 'include' });
-                        if (colRes.ok) {
-                            const colData = await colRes.json();
-                            setItems(colData);
-                        }
+                    if (me.settings.collection_mode && colRes.ok) {
+                        const colData: CollectionPage = await colRes.json();
+                        setItems(colData.items);
+                        setNextCursor(colData.next_cursor);
+                        if (me.settings.valuation_mode) fetchValue();
                     }
                 }
             } catch (error) {
@@ -116,6 +243,7 @@ export default function CollectionManager() {
         try {
             // Optimistically remove from UI first for smooth animation
             setItems(prevItems => prevItems.filter(item => item.id !== id));
+            setTotal(prevTotal => Math.max(0, prevTotal - 1));
 
             const res = await fetch(`${process.env.NEXT_PUBLIC_API_URL || ''}/api/collection/${id}`, {
                 method: 'DELETE',
@@ -127,6 +255,7 @@ export default function CollectionManager() {
                 fetchCollection();
                 throw new Error('Failed to remove item');
             } else {
+                if (settings.valuation_mode) fetchValue();
                 // Show success message
                 setSuccessMessage('Item removed from collection');
                 setTimeout(() => setSuccessMessage(''), 2000);
@@ -143,24 +272,41 @@ export default function CollectionManager() {
                     <h2 className="text-2xl font-bold flex items-center gap-3">
                         <Disc className="w-6 h-6 text-purple-400" />
                         My Collection
-                        <span className="text-sm font-normal text-gray-400 ml-2">({items.length} items)</span>
+                        <span className="text-sm font-normal text-gray-400 ml-2">({total} items)</span>
                     </h2>
-                    {settings.valuation_mode && (
+                    {settings.valuation_mode && collectionValue && (
                         <p className="text-green-400 font-mono mt-1 text-sm">
-                            Est. Value: ${items.reduce((acc, _) => acc + (Math.floor(Math.random() * 30) + 15), 0).toLocaleString()}
+                            Est. Value: {collectionValue.total.toLocaleString(undefined, { style: 'currency', currency: collectionValue.currency || 'USD' })}
+                            {collectionValue.priced_items < collectionValue.item_count && (
+                                <span className="text-white/40 ml-2">
+                                    ({collectionValue.priced_items} of {collectionValue.item_count} priced{collectionValue.refreshing ? ', updating...' : ''})
+                                </span>
+                            )}
                         </p>
                     )}
                 </div>
-                <button
-                    onClick={() => {
-                        setInitialSearch('');
-                        setShowAddModal(true);
-                    }}
-                    className="flex items-center gap-2 px-4 py-2 bg-white text-black rounded-full font-medium hover:bg-gray-200 transition-colors"
-                >
-                    <Plus className="w-4 h-4" />
-                    Add Item
-                </button>
+                <div className="flex items-center gap-3">
+                    <button
+                        onClick={handleImport}
+                        disabled={importJob !== null}
+                        className="flex items-center gap-2 px-4 py-2 border border-white/20 text-white rounded-full font-medium hover:bg-white/10 transition-colors disabled:opacity-60"
+                    >
+                        <Download className="w-4 h-4" />
+                        {importJob
+                            ? `Importing ${importJob.items_imported}${importJob.total_items ? ` / ${importJob.total_items}` : ''}...`
+                            : 'Import from Discogs'}
+                    </button>
+                    <button
+                        onClick={() => {
+                            setInitialSearch('');
+                            setShowAddModal(true);
+                        }}
+                        className="flex items-center gap-2 px-4 py-2 bg-white text-black rounded-full font-medium hover:bg-gray-200 transition-colors"
+                    >
+                        <Plus className="w-4 h-4" />
+                        Add Item
+                    </button>
+                </div>
             </div>
 
             {loading ? (
@@ -238,6 +384,18 @@ export default function CollectionManager() {
                 </div>
             )}
 
+            {nextCursor && !loading && (
+                <div className="flex justify-center">
+                    <button
+                        onClick={loadMore}
+                        disabled={loadingMore}
+                        className="px-4 py-2 text-sm text-white/60 hover:text-white border border-white/10 rounded-full transition-colors disabled:opacity-50"
+                    >
+                        {loadingMore ? 'Loading...' : 'Load more'}
+                    </button>
+                </div>
+            )}
+
             {/* Add Item Modal */}
             <AnimatePresence>
                 {showAddModal && (
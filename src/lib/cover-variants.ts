@@ -0,0 +1,15 @@
+/**
+ * Build a srcset string from one format of an album's image_variants
+ * e.g. { "96": "/covers/variants/ab_96.webp", "160": ... } -> "/covers/variants/ab_96.webp 96w, ..."
+ */
+export const toSrcSet = (variants?: Record<string, string> | null) => {
+    if (!variants) return undefined;
+    return Object.entries(variants)
+        .sort(([a], [b]) => Number(a) - Number(b))
+        .map(([width, url]) => `${encodeURI(url)} ${width}w`)
+        .join(', ');
+};
+
+/** Rendered width of a cell in AlbumGrid (3 to 10 columns across the viewport) */
+export const GRID_IMAGE_SIZES =
+    '(min-width: 1280px) 10vw, (min-width: 1024px) 12.5vw, (min-width: 768px) 17vw, (min-width: 640px) 25vw, 34vw';
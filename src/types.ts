@@ -13,6 +13,10 @@ export interface Album {
     artist_name: string;
     genres: string[];
     is_liked?: boolean;
+    blurhash?: string | null;
+    dominant_color?: string | null;
+    // format ("webp" | "avif") -> width -> URL
+    image_variants?: Record<string, Record<string, string>> | null;
 }
 
 export interface Artist {
@@ -24,3 +28,25 @@ export interface Artist {
     location?: string;
     albums: Album[];
 }
+
+export interface RelatedArtist {
+    id: number;
+    name: string;
+    image_path?: string;
+    location?: string;
+    weight: number;
+}
+
+export interface UserSettings {
+    collection_mode: boolean;
+    valuation_mode: boolean;
+    price_comparison_mode: boolean;
+}
+
+// GET /api/me
+export interface Me {
+    user: { id: number; username: string };
+    settings: UserSettings;
+    like_count: number;
+    collection_count: number;
+}
@@ -0,0 +1,92 @@
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# The scrapers import each other as top-level modules
+sys.path.append(os.path.join(ROOT, "scripts"))
+sys.path.append(os.path.join(ROOT, "api"))
+
+# 1x1 PNG, so covers pass verify_image
+PNG_1X1 = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000b49444154789c6360000200000500017a5eab3f0000000049454e44ae426082"
+)
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+class ChartServer:
+    """Local stand-in for the chart site, serving saved pages from tests/fixtures.
+
+    /charts is page 1 and /charts/<n> page n, as on RYM. Pages listed in
+    `failing` answer 503, pages in `captcha` serve the captcha page, and every
+    request path is recorded in `requests`."""
+
+    def __init__(self, pages=3):
+        self.pages = pages
+        self.failing = set()
+        self.captcha = set()
+        self.requests = []
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with server.lock:
+                    server.requests.append(self.path)
+                status, content_type, body = server.respond(self.path)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def respond(self, path):
+        if path.startswith("/covers/"):
+            return 200, "image/png", PNG_1X1
+        if path == "/charts":
+            page = 1
+        elif path.startswith("/charts/") and path[len("/charts/"):].isdigit():
+            page = int(path[len("/charts/"):])
+        else:
+            return 404, "text/plain", b"not found"
+
+        if page in self.failing:
+            return 503, "text/plain", b"unavailable"
+        if page in self.captcha or page > self.pages:
+            html = read_fixture("captcha.html")
+        else:
+            # Fixture pages cycle, so any number of pages can be served
+            html = read_fixture(f"chart_page_{(page - 1) % 3 + 1}.html")
+        return 200, "text/html; charset=utf-8", html.replace("{base}", self.base).encode("utf-8")
+
+    def fetched_pages(self):
+        """Chart pages requested so far, in request order."""
+        with self.lock:
+            paths = list(self.requests)
+        return [1 if p == "/charts" else int(p.rsplit("/", 1)[1]) for p in paths if p.startswith("/charts")]
+
+
+@pytest.fixture
+def chart_server():
+    server = ChartServer()
+    server.thread.start()
+    yield server
+    server.httpd.shutdown()
+    server.httpd.server_close()
@@ -0,0 +1,33 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+pytest.importorskip("psycopg2")
+
+from build_neighbors import like_vectors, similarity_rows
+
+
+def test_co_likes_are_cosines_between_liked_items():
+    # Item 30 is liked only by a user with a single like, so it connects nothing
+    likes = [(1, 10), (1, 20), (2, 10), (2, 20), (3, 20), (3, 40), (4, 30)]
+    item_ids = [10, 20, 30, 40]
+    vectors, liked_position = like_vectors(item_ids, likes)
+
+    assert liked_position.tolist() == [0, 1, -1, 2]
+    co_likes = (vectors.T @ vectors).toarray()
+    # 10 and 20 share two users; 10 has two likers and 20 three
+    assert co_likes[0, 1] == pytest.approx(2 / np.sqrt(2 * 3))
+    assert co_likes[0, 2] == 0
+    assert co_likes[1, 2] == pytest.approx(1 / np.sqrt(3 * 1))
+
+
+def test_similarity_rows_adds_co_likes_to_genre_scores():
+    likes = [(1, 10), (1, 20), (2, 10), (2, 20)]
+    item_ids = [10, 20, 30]
+    vectors, liked_position = like_vectors(item_ids, likes)
+    genres = np.eye(3, dtype=np.float32)
+
+    scores = similarity_rows(np.array([0, 2]), genres, vectors, liked_position, co_like_weight=0.5)
+
+    assert scores[0].tolist() == [-np.inf, pytest.approx(0.5), 0]
+    assert scores[1].tolist() == [0, 0, -np.inf]
@@ -0,0 +1,63 @@
+import math
+
+from _catalog_mmap import CatalogFile, write_catalog
+
+ALBUMS = [
+    {'id': 30, 'artist_id': 2, 'rank': None, 'rating': None, 'title': "Untitled", 'release_date': None,
+     'ratings_count': None, 'image_path': None, 'spotify_link': None, 'youtube_link': None,
+     'apple_music_link': None, 'blurhash': None, 'dominant_color': None, 'cover_variants': None},
+    {'id': 10, 'artist_id': 1, 'rank': 1, 'rating': 4.23, 'title': "OK Computer", 'release_date': "16 June 1997",
+     'ratings_count': "97,000", 'image_path': "covers/store/ab.jpg", 'spotify_link': "https://open.spotify.com/album/x",
+     'youtube_link': None, 'apple_music_link': None, 'blurhash': "LEHV6nWB2yk8", 'dominant_color': "#112233",
+     'cover_variants': {"webp": {"96": "covers/variants/ab_96.webp"}}},
+    {'id': 20, 'artist_id': 1, 'rank': 0, 'rating': 0.0, 'title': "Kid A — ünïcode", 'release_date': "2000",
+     'ratings_count': "0", 'image_path': None, 'spotify_link': None, 'youtube_link': None,
+     'apple_music_link': None, 'blurhash': None, 'dominant_color': None, 'cover_variants': '{"avif":{}}'},
+]
+ARTISTS = [
+    {'id': 2, 'name': "Nobody", 'slug': None, 'bio': None, 'image_path': None, 'location': None},
+    {'id': 1, 'name': "Radiohead", 'slug': "radiohead", 'bio': "", 'image_path': "x.jpg", 'location': "Abingdon"},
+]
+GENRES = [{'id': 5, 'name': "Art Rock"}, {'id': 3, 'name': "Electronic"}]
+ALBUM_GENRES = [
+    {'album_id': 10, 'genre_id': 5, 'is_primary': True},
+    {'album_id': 10, 'genre_id': 3, 'is_primary': False},
+    {'album_id': 20, 'genre_id': 3, 'is_primary': True},
+]
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "catalog.bin")
+    write_catalog(path, ALBUMS, ARTISTS, GENRES, ALBUM_GENRES)
+    catalog = CatalogFile(path)
+
+    assert (catalog.album_count, catalog.artist_count, catalog.genre_count) == (3, 2, 2)
+    assert list(catalog.album_id) == [10, 20, 30]
+    assert catalog.genre_names() == {3: "Electronic", 5: "Art Rock"}
+
+    for album in ALBUMS:
+        row = catalog.album_row(album['id'])
+        read = catalog.album(row)
+        expected = dict(album)
+        if isinstance(expected['cover_variants'], str):
+            expected['cover_variants'] = {"avif": {}}
+        expected['artist_name'] = next(a['name'] for a in ARTISTS if a['id'] == album['artist_id'])
+        # Floats go through a double column: compare them separately
+        rating = read.pop('rating')
+        assert (rating is None) == (expected.pop('rating') is None)
+        if rating is not None:
+            assert math.isclose(rating, album['rating'])
+        assert read == {k: v for k, v in expected.items() if k != 'rating'}
+
+    row = catalog.album_row(10)
+    assert catalog.genre_ids_of(row) == [3, 5]
+    assert list(catalog.album_genre_primary[catalog.album_genre_offsets[row]:catalog.album_genre_offsets[row + 1]]) \
+        == [0, 1]
+    assert catalog.album_genres(catalog.album_row(30)) == []
+    assert [a['id'] for a in catalog.albums("Electronic")] == [10, 20]
+    assert list(catalog.albums("No such genre")) == []
+
+    for artist in ARTISTS:
+        assert catalog.artist(artist['id']) == artist
+    assert catalog.artist(99) is None
+    assert catalog.album_row(99) is None
@@ -0,0 +1,22 @@
+import pytest
+
+pytest.importorskip("curl_cffi")
+pytest.importorskip("PIL")
+pytest.importorskip("psycopg2")
+
+from conftest import PNG_1X1
+from cover_downloader import CoverDownloadError, verify_image
+
+
+def test_accepts_an_image(tmp_path):
+    path = tmp_path / "cover"
+    path.write_bytes(PNG_1X1)
+    verify_image(str(path))
+
+
+@pytest.mark.parametrize("body", [b"", b"<html><body>Access denied</body></html>", PNG_1X1[:40]])
+def test_rejects_empty_html_and_truncated_bodies(tmp_path, body):
+    path = tmp_path / "cover"
+    path.write_bytes(body)
+    with pytest.raises(CoverDownloadError):
+        verify_image(str(path))
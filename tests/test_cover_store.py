@@ -0,0 +1,74 @@
+import os
+import time
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+import cover_store
+
+KEPT_HASH = "a" * 64
+DROPPED_HASH = "b" * 64
+
+
+class FakeConnection:
+    """Answers gc's two reads: cover_manifest hashes, then albums' image paths."""
+
+    def __init__(self, manifest_hashes, album_rows):
+        self.results = [[(h,) for h in manifest_hashes], album_rows]
+
+    def cursor(self):
+        return self
+
+    def execute(self, query, params=None):
+        pass
+
+    def fetchall(self):
+        return self.results.pop(0)
+
+
+@pytest.fixture
+def covers(monkeypatch, tmp_path):
+    covers_dir = tmp_path / "covers"
+    monkeypatch.setattr(cover_store, "COVERS_DIR", str(covers_dir))
+    monkeypatch.setattr(cover_store, "STORE_DIR", str(covers_dir / "store"))
+    monkeypatch.setattr(cover_store, "VARIANTS_DIR", str(covers_dir / "variants"))
+    old = time.time() - 2 * cover_store.GC_GRACE_SECONDS
+
+    def make(*names):
+        for name in names:
+            path = covers_dir / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b"x")
+            os.utime(path, (old, old))
+    return covers_dir, make
+
+
+def remaining(covers_dir):
+    return sorted(str(p.relative_to(covers_dir)) for p in covers_dir.rglob("*") if p.is_file())
+
+
+def test_gc_only_removes_unreferenced_files_it_owns(covers):
+    covers_dir, make = covers
+    make(f"store/{KEPT_HASH}.jpg", f"store/{DROPPED_HASH}.jpg", "store/notes.txt",
+         "12_Artist_Kept.jpg", "13_Artist_Dropped.jpg", "placeholder.jpg", ".gitkeep",
+         f"variants/{KEPT_HASH[:16]}_96.webp", f"variants/{DROPPED_HASH[:16]}_96.webp", "variants/README")
+    conn = FakeConnection([KEPT_HASH], [("covers/12_Artist_Kept.jpg", None)])
+
+    cover_store.gc(conn)
+
+    assert remaining(covers_dir) == sorted([
+        ".gitkeep", "12_Artist_Kept.jpg", "placeholder.jpg", f"store/{KEPT_HASH}.jpg", "store/notes.txt",
+        "variants/README", f"variants/{KEPT_HASH[:16]}_96.webp",
+    ])
+
+
+def test_gc_keeps_recent_files(covers):
+    covers_dir, make = covers
+    make("13_Artist_Dropped.jpg")
+    now = time.time()
+    os.utime(covers_dir / "13_Artist_Dropped.jpg", (now, now))
+
+    cover_store.gc(FakeConnection([], []))
+
+    assert remaining(covers_dir) == ["13_Artist_Dropped.jpg"]
@@ -0,0 +1,142 @@
+import random
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+from _facets import FacetIndex, ThresholdIndex, bitmap_from_rows, parse_count, parse_year, rows_from_bitmap
+
+# The bitmap index checked against a plain scan of the same albums.
+
+GENRES = {1: "Rock", 2: "Jazz", 3: "Ambient", 4: "Folk", 5: "Noise"}
+
+
+def make_albums(n, seed=7):
+    rng = random.Random(seed)
+    albums = []
+    for album_id in rng.sample(range(1, 10 * n), n):
+        genres = rng.sample(sorted(GENRES), rng.randint(0, 3))
+        albums.append({
+            'id': album_id,
+            'artist_id': rng.randint(1, 20),
+            'rank': rng.choice([None, rng.randint(1, 5 * n)]),
+            'rating': rng.choice([None, round(rng.uniform(0.5, 5.0), 2), 3.5, 4.0]),
+            'ratings_count': rng.choice([None, "", "12", "1,204", str(rng.randint(0, 5000))]),
+            'release_date': rng.choice([None, "", "Unknown", f"{rng.randint(1950, 2024)}",
+                                        f"12 March {rng.randint(1950, 2024)}"]),
+            'genres': [(g, i == 0) for i, g in enumerate(genres)],
+        })
+    return albums
+
+
+def brute_force(albums, genres=None, genre_mode="all", primary_only=False, year_min=None, year_max=None,
+                min_rating=None, min_ratings_count=None, artist_id=None):
+    names = {name: genre_id for genre_id, name in GENRES.items()}
+    matches = []
+    for album in albums:
+        tagged = {g for g, primary in album['genres'] if primary or not primary_only}
+        if genres:
+            wanted = [names.get(name) for name in genres]
+            hits = [g in tagged for g in wanted]
+            if not (any(hits) if genre_mode == "any" else all(hits)):
+                continue
+        year = parse_year(album['release_date'])
+        if (year_min is not None or year_max is not None) and year is None:
+            continue
+        if year_min is not None and year < year_min:
+            continue
+        if year_max is not None and year > year_max:
+            continue
+        if min_rating is not None and (album['rating'] is None or album['rating'] < min_rating):
+            continue
+        count = parse_count(album['ratings_count'])
+        if min_ratings_count is not None and (count is None or count < min_ratings_count):
+            continue
+        if artist_id is not None and album['artist_id'] != artist_id:
+            continue
+        matches.append(album)
+    return matches
+
+
+def random_filters(rng):
+    filters = {}
+    if rng.random() < 0.5:
+        filters['genres'] = rng.sample(list(GENRES.values()) + ["Unknown genre"], rng.randint(1, 3))
+        filters['genre_mode'] = rng.choice(["all", "any"])
+        filters['primary_only'] = rng.random() < 0.3
+    if rng.random() < 0.4:
+        filters['year_min'] = rng.randint(1940, 2030)
+    if rng.random() < 0.4:
+        filters['year_max'] = rng.randint(1940, 2030)
+    if rng.random() < 0.4:
+        filters['min_rating'] = rng.choice([0.0, 3.5, 4.0, 5.0, 5.5, round(rng.uniform(0, 5), 2)])
+    if rng.random() < 0.3:
+        filters['min_ratings_count'] = rng.choice([0, 12, 1204, rng.randint(0, 6000)])
+    if rng.random() < 0.2:
+        filters['artist_id'] = rng.randint(0, 21)
+    return filters
+
+
+def chart_order(album):
+    return (album['rank'] is None, album['rank'] or 0, album['id'])
+
+
+def test_bitmap_round_trip():
+    rows = [0, 1, 7, 8, 9, 63, 64, 65, 1000]
+    assert rows_from_bitmap(bitmap_from_rows(rows)) == rows
+    assert rows_from_bitmap(bitmap_from_rows(rows), limit=4) == rows[:4]
+    assert bitmap_from_rows([]) == 0
+    assert rows_from_bitmap(0) == []
+
+
+@pytest.mark.parametrize("buckets", [1, 3, 7, 256])
+def test_threshold_index_matches_a_scan_at_every_bucket_edge(buckets):
+    rng = random.Random(buckets)
+    values = [rng.choice([None, rng.randint(0, 30)]) for _ in range(200)]
+    index = ThresholdIndex(values, buckets)
+    # Every distinct value sits on or next to a bucket edge for some bucket count
+    for threshold in range(-1, 33):
+        expected = [row for row, value in enumerate(values) if value is not None and value >= threshold]
+        assert rows_from_bitmap(index.at_least(threshold)) == expected
+    assert rows_from_bitmap(index.between(5, 10)) == \
+        [row for row, value in enumerate(values) if value is not None and 5 <= value < 10]
+
+
+def test_threshold_index_without_values():
+    index = ThresholdIndex([None, None])
+    assert index.at_least(0) == 0
+    assert index.between(None, None) == 0
+
+
+def test_query_facets_and_pages_match_a_scan():
+    albums = make_albums(400)
+    index = FacetIndex(albums, GENRES, None)
+    rng = random.Random(300)
+
+    for _ in range(300):
+        filters = random_filters(rng)
+        expected = sorted(brute_force(albums, **filters), key=chart_order)
+        result = index.query(**filters)
+
+        assert [index.album_ids[row] for row in rows_from_bitmap(result)] == [a['id'] for a in expected]
+
+        primary_only = filters.get('primary_only', False)
+        counts = index.facet_counts(result, primary_only)
+        genre_counts = {}
+        for album in expected:
+            for g, primary in album['genres']:
+                if primary or not primary_only:
+                    genre_counts[GENRES[g]] = genre_counts.get(GENRES[g], 0) + 1
+        assert {c['name']: c['count'] for c in counts['genres']} == genre_counts
+
+        offset, limit = rng.choice([(0, 10), (5, 40), (len(expected) - 3, 10), (len(expected) + 5, 10)])
+        offset = max(0, offset)
+        for sort, key in (("rating", 'rating'), ("year", None)):
+            def value(album):
+                return album['rating'] if key else parse_year(album['release_date'])
+            ordered = sorted(expected, key=lambda a: (value(a) is None, -(value(a) or 0)))
+            ids, total = index.page(result, sort, offset, limit)
+            assert total == len(expected)
+            assert ids == [a['id'] for a in ordered[offset:offset + limit]]
+        ids, _ = index.page(result, "rank", offset, limit)
+        assert ids == [a['id'] for a in expected[offset:offset + limit]]
@@ -0,0 +1,129 @@
+from _minhash import (EMPTY, LSH_BANDS, NUM_HASHES, album_hashes, band_buckets, estimated_similarity,
+                      iter_signatures, pack, signature_of, unpack, update_user_signature)
+
+
+class FakeCursor:
+    """Enough of a RealDictCursor over likes, user_minhash and user_lsh_buckets
+    for update_user_signature, keeping the tables in memory."""
+
+    def __init__(self, likes):
+        self.likes = set(likes)
+        self.signatures = {}
+        self.buckets = set()
+        self.queries = []
+        self.result = []
+
+    def execute(self, query, params=()):
+        query = " ".join(query.split())
+        self.queries.append(query)
+        if query.startswith("SELECT signature FROM user_minhash"):
+            user_id, = params
+            self.result = [{'signature': self.signatures[user_id]}] if user_id in self.signatures else []
+        elif query.startswith("SELECT album_id FROM likes"):
+            user_id, = params
+            self.result = [{'album_id': a} for u, a in sorted(self.likes) if u == user_id]
+        elif query.startswith("INSERT INTO user_minhash"):
+            user_id, signature = params
+            self.signatures[user_id] = signature
+        elif query.startswith("DELETE FROM user_lsh_buckets"):
+            user_id, bands = params
+            self.buckets = {b for b in self.buckets if not (b[2] == user_id and b[0] in bands)}
+        else:
+            self.result = []
+
+    def executemany(self, query, rows):
+        assert query.startswith("INSERT INTO user_lsh_buckets")
+        self.buckets.update(rows)
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return self.result
+
+    def like(self, user_id, album_id):
+        self.likes.add((user_id, album_id))
+        update_user_signature(self, user_id, album_id, liked=True)
+
+    def unlike(self, user_id, album_id):
+        self.likes.discard((user_id, album_id))
+        update_user_signature(self, user_id, album_id, liked=False)
+
+    def signature(self, user_id):
+        return unpack(self.signatures[user_id])
+
+    def user_buckets(self, user_id):
+        return sorted((band, bucket) for band, bucket, u in self.buckets if u == user_id)
+
+
+def expected_buckets(signature):
+    return sorted((band, bucket) for band, bucket in enumerate(band_buckets(signature)) if bucket is not None)
+
+
+def test_signature_is_the_element_wise_minimum():
+    assert signature_of([]) == [EMPTY] * NUM_HASHES
+    assert signature_of([7]) == album_hashes(7)
+    assert signature_of([3, 7, 11]) == [min(h) for h in zip(album_hashes(3), album_hashes(7), album_hashes(11))]
+    assert unpack(pack(signature_of([3, 7]))) == signature_of([3, 7])
+
+
+def test_band_buckets():
+    assert band_buckets(signature_of([])) == [None] * LSH_BANDS
+    buckets = band_buckets(signature_of([1, 2, 3]))
+    assert len(buckets) == LSH_BANDS and None not in buckets
+    assert buckets == band_buckets(signature_of([3, 2, 1]))
+    # Sharing a band's rows means sharing its bucket
+    a, b = signature_of([1, 2, 3]), signature_of([1, 2, 4])
+    for band, (x, y) in enumerate(zip(band_buckets(a), band_buckets(b))):
+        rows = slice(band * NUM_HASHES // LSH_BANDS, (band + 1) * NUM_HASHES // LSH_BANDS)
+        assert (x == y) == (a[rows] == b[rows])
+
+
+def test_estimated_similarity_tracks_jaccard():
+    a, b = signature_of(range(0, 100)), signature_of(range(50, 150))
+    assert estimated_similarity(a, a) == 1
+    # True Jaccard is 1/3; 64 hashes keep the estimate well within this
+    assert 0.1 < estimated_similarity(a, b) < 0.6
+
+
+def test_iter_signatures_groups_by_user():
+    assert list(iter_signatures([(1, 5), (1, 6), (2, 5)])) == [(1, signature_of([5, 6])), (2, signature_of([5]))]
+
+
+def test_likes_and_unlikes_keep_the_signature_equal_to_a_rebuild():
+    c = FakeCursor([])
+    for album_id in (5, 9, 12, 40, 41):
+        c.like(1, album_id)
+        assert c.signature(1) == signature_of(a for u, a in c.likes if u == 1)
+
+    for album_id in (9, 41, 5, 12, 40):
+        c.unlike(1, album_id)
+        assert c.signature(1) == signature_of(a for u, a in c.likes if u == 1)
+        assert c.user_buckets(1) == expected_buckets(c.signature(1))
+    # Back to empty: no buckets, so the user matches nobody
+    assert c.user_buckets(1) == []
+
+
+def test_unlike_of_a_non_minimum_does_not_rebuild():
+    c = FakeCursor([])
+    for album_id in range(1, 60):
+        c.like(1, album_id)
+    signature = c.signature(1)
+    # An album holding none of the minimums
+    spare = next(a for a in range(1, 60) if not any(s == h for s, h in zip(signature, album_hashes(a))))
+
+    c.queries.clear()
+    c.unlike(1, spare)
+
+    assert c.signature(1) == signature
+    assert not any(q.startswith("SELECT album_id FROM likes") for q in c.queries)
+
+
+def test_first_update_without_a_row_rebuilds_from_likes():
+    # Likes made before the user was backfilled
+    c = FakeCursor([(1, 3), (1, 4)])
+    c.like(1, 8)
+
+    assert c.signature(1) == signature_of([3, 4, 8])
+    assert c.user_buckets(1) == expected_buckets(signature_of([3, 4, 8]))
+    assert c.queries[0].startswith("SELECT pg_advisory_xact_lock")
@@ -0,0 +1,89 @@
+import threading
+import time
+
+from pipeline import STOP, Checkpoint, RateLimiter, Stage, bounded_queue
+
+
+def test_rate_limiter_spaces_calls_across_threads():
+    limiter = RateLimiter(0.05)
+    started = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(3):
+            limiter.wait()
+            with lock:
+                started.append(time.monotonic())
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    started.sort()
+    gaps = [b - a for a, b in zip(started, started[1:])]
+    assert len(started) == 9
+    # Scheduling jitter can only delay a call, never start it early
+    assert min(gaps) >= 0.05 - 0.005
+
+
+def test_checkpoint_survives_reload(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    checkpoint = Checkpoint(path)
+    checkpoint.mark_items([1, 2, 3])
+    checkpoint.mark_page(1)
+
+    resumed = Checkpoint(path)
+    assert resumed.page_done(1)
+    assert not resumed.page_done(2)
+    assert resumed.item_done(2)
+    assert not resumed.item_done(4)
+
+    resumed.clear()
+    assert not Checkpoint(path).page_done(1)
+
+
+def test_stop_reaches_every_worker_and_the_next_stage_once():
+    inbox, middle, outbox = bounded_queue(2), bounded_queue(2), bounded_queue(0)
+    doubled = Stage("double", lambda x, emit: emit(x * 2), inbox, middle, workers=4)
+    collected = Stage("collect", lambda x, emit: emit(x), middle, outbox, workers=2)
+    doubled.start()
+    collected.start()
+
+    for i in range(10):
+        inbox.put(i)
+    inbox.put(STOP)
+    doubled.join()
+    collected.join()
+
+    results = []
+    while True:
+        payload = outbox.get_nowait()
+        if payload is STOP:
+            break
+        results.append(payload)
+    assert sorted(results) == [i * 2 for i in range(10)]
+    # Exactly one STOP is forwarded, after the last result
+    assert outbox.empty()
+
+
+def test_stage_keeps_going_after_a_failed_payload_but_records_it():
+    inbox, outbox = bounded_queue(0), bounded_queue(0)
+    errors = []
+
+    def func(x, emit):
+        if x == 2:
+            raise ValueError("bad payload")
+        emit(x)
+
+    stage = Stage("flaky", func, inbox, outbox, on_error=errors.append)
+    stage.start()
+    for i in range(4):
+        inbox.put(i)
+    inbox.put(STOP)
+    stage.join()
+
+    assert [outbox.get_nowait() for _ in range(4)] == [0, 1, 3, STOP]
+    assert stage.failed
+    assert [str(e) for e in errors] == ["bad payload"]
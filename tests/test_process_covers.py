@@ -0,0 +1,16 @@
+import pytest
+
+pytest.importorskip("PIL")
+pytest.importorskip("psycopg2")
+
+from process_covers import VARIANT_WIDTHS, variant_widths
+
+
+def test_never_upscales():
+    assert variant_widths(200) == [96, 160]
+    assert variant_widths(1200) == list(VARIANT_WIDTHS)
+
+
+def test_narrow_source_gets_one_variant_at_its_own_width():
+    # Named and listed in srcset as 64w, not 96w
+    assert variant_widths(64) == [64]
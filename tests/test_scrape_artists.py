@@ -0,0 +1,28 @@
+import pytest
+
+pytest.importorskip("bs4")
+pytest.importorskip("curl_cffi")
+pytest.importorskip("psycopg2")
+
+from conftest import read_fixture
+from scrape_artists import parse_artist_page, scraped_row
+
+
+def test_parses_bio_and_image():
+    info = parse_artist_page(read_fixture("artist_page.html"))
+
+    assert info == {
+        'bio': "English rock band formed in Abingdon, Oxfordshire.",
+        'image_url': "https://e.snmc.io/i/300/radiohead.jpg",
+    }
+
+
+def test_artist_page_without_bio_is_scraped_with_an_empty_bio():
+    info = parse_artist_page(read_fixture("artist_page_no_bio.html"))
+
+    assert scraped_row(7, info) == (7, '', None)
+
+
+def test_captcha_page_is_a_failed_fetch():
+    # Served with a 200, but not an artist page: the artist must stay queued
+    assert parse_artist_page(read_fixture("captcha.html")) is None
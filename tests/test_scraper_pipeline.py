@@ -0,0 +1,140 @@
+import pytest
+
+pytest.importorskip("bs4")
+pytest.importorskip("curl_cffi")
+pytest.importorskip("pandas")
+pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+
+import cover_store
+import scraper
+from pipeline import Checkpoint
+
+# run_pipeline end to end against the local chart stand-in (see conftest.py).
+# Only the database is swapped out: save_to_db records what it was given, and
+# related-artist refreshes are recorded in `refreshed`.
+
+
+@pytest.fixture
+def refreshed(monkeypatch):
+    calls = []
+    monkeypatch.setattr(scraper, "refresh_related_artists", lambda artist_ids: calls.append(set(artist_ids)))
+    return calls
+
+
+@pytest.fixture
+def saved(monkeypatch, tmp_path, refreshed):
+    batches = []
+
+    def save_to_db(items):
+        batches.append([dict(item) for item in items])
+        return {'inserted': len(items), 'updated': 0, 'unchanged': 0, 'failed': 0,
+                'touched_artists': {item['Artist'] for item in items}}
+
+    monkeypatch.setattr(scraper, "save_to_db", save_to_db)
+    monkeypatch.setattr(cover_store, "STORE_DIR", str(tmp_path / "store"))
+    # cookie.txt / user_agent.txt are read from the working directory
+    monkeypatch.chdir(tmp_path)
+    return batches
+
+
+def run(server, checkpoint, pages, **kwargs):
+    kwargs.setdefault("fetch_interval", 0.01)
+    return scraper.run_pipeline(f"{server.base}/charts", pages, checkpoint, **kwargs)
+
+
+def saved_ranks(batches):
+    return sorted(item['Rank'] for batch in batches for item in batch)
+
+
+def test_scrapes_every_page(chart_server, saved, refreshed, tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.json"))
+
+    items, completed = run(chart_server, checkpoint, 3)
+
+    assert completed
+    assert sorted(chart_server.fetched_pages()) == [1, 2, 3]
+    assert [item['Rank'] for item in sorted(items, key=lambda i: i['Rank'])] == [1, 2, 3, 41, 42, 43, 81, 82]
+    assert saved_ranks(saved) == [1, 2, 3, 41, 42, 43, 81, 82]
+    first = min(items, key=lambda i: i['Rank'])
+    assert (first['Artist'], first['Album'], first['Primary Genres']) == \
+        ("Radiohead", "OK Computer", ["Alternative Rock", "Art Rock"])
+    assert first['Local Image'] == cover_store.db_image_path(first['Cover Hash'])
+    assert all(checkpoint.page_done(page) for page in (1, 2, 3))
+    # Once for the whole run, not once per page
+    assert refreshed == [{item['Artist'] for item in items}]
+
+
+def test_interrupted_run_resumes_from_checkpoint(chart_server, saved, refreshed, tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    chart_server.failing.add(2)
+
+    _, completed = run(chart_server, Checkpoint(path), 3, fetch_workers=1)
+
+    assert not completed
+    assert saved_ranks(saved) == [1, 2, 3]
+    assert chart_server.fetched_pages() == [1, 2]
+    # Artists saved before the interruption are still refreshed
+    assert refreshed == [{item['Artist'] for item in saved[0]}]
+
+    # Second run: a fresh process reading the same checkpoint file
+    chart_server.failing.clear()
+    chart_server.requests.clear()
+    saved.clear()
+    checkpoint = Checkpoint(path)
+    assert checkpoint.page_done(1) and not checkpoint.page_done(2)
+
+    _, completed = run(chart_server, checkpoint, 3)
+
+    assert completed
+    assert sorted(chart_server.fetched_pages()) == [2, 3]
+    assert saved_ranks(saved) == [41, 42, 43, 81, 82]
+
+
+def test_items_done_before_an_interruption_are_not_saved_again(chart_server, saved, tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.json"))
+    # A crash after the items of page 1 were committed but before the page was marked
+    checkpoint.mark_items([1, 2])
+
+    _, completed = run(chart_server, checkpoint, 1)
+
+    assert completed
+    assert chart_server.fetched_pages() == [1]
+    assert saved_ranks(saved) == [3]
+
+
+def test_failed_save_leaves_the_run_incomplete(chart_server, saved, tmp_path, monkeypatch):
+    save = scraper.save_to_db
+
+    def save_to_db(items):
+        if items[0]['Rank'] > 40:
+            raise RuntimeError("could not connect to server")
+        return save(items)
+
+    monkeypatch.setattr(scraper, "save_to_db", save_to_db)
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.json"))
+
+    _, completed = run(chart_server, checkpoint, 3, fetch_workers=1)
+
+    # The checkpoint must survive for the next run to redo page 2
+    assert not completed
+    assert checkpoint.page_done(1)
+    assert not checkpoint.page_done(2)
+
+
+def test_parse_halt_stops_the_fetch_stage(chart_server, saved, tmp_path):
+    chart_server.pages = 30
+    chart_server.captcha.update(range(2, 31))
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.json"))
+
+    _, completed = run(chart_server, checkpoint, 30, fetch_workers=1, queue_size=1)
+
+    assert not completed
+    # Page 2 halts the run; at most the page waiting in parse_q and the one
+    # blocked on putting into it were fetched after it
+    fetched = chart_server.fetched_pages()
+    assert fetched[:2] == [1, 2]
+    assert len(fetched) <= 4
+    assert saved_ranks(saved) == [1, 2, 3]
+    assert checkpoint.page_done(1)
+    assert not checkpoint.page_done(2)